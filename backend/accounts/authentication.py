@@ -0,0 +1,172 @@
+"""
+JWT authentication that usually serves request.user without a database query.
+
+A user is taken, in order, from:
+
+1. a per-process LRU cache with a short TTL;
+2. the role/name claims in the access token (see accounts.tokens), as long as
+   the token was issued after the user's claims were last invalidated and,
+   if CLAIMS_MAX_AGE is set, is younger than that;
+3. the database, like simplejwt's JWTAuthentication.
+
+Tokens revoked through logout or refresh rotation (see accounts.revocation)
+are rejected before any of this.
+
+Users built from claims are real ``User`` instances with every other field
+deferred, so FK filters and assignments work and reading e.g. ``email``
+loads the row lazily.
+
+Changing a user's role, name or active flag, or deleting the user,
+invalidates their claims through the revocation store (see
+accounts.signals). The saving process stops using them at once. Every other
+process stops at its next revocation sync, within
+TOKEN_REVOCATION['SYNC_INTERVAL'], and then also drops the user from its
+cache. Claims can therefore be trusted for the whole token lifetime, and a
+change reaches every process within seconds rather than within a claims
+age. Changes made with QuerySet.update() skip the signal. Tokens issued
+before such a change keep their claims until they expire, or for
+CLAIMS_MAX_AGE if it is set, so call invalidate_user_claims() after one.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models.base import DEFERRED
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import ais_token_revoked, is_token_revoked, user_claims_invalidated_at
+from .tokens import USER_CLAIMS
+
+DEFAULTS = {
+    'TTL': 60,
+    'MAX_SIZE': 1024,
+    'CLAIMS_MAX_AGE': None,
+}
+
+
+def get_cache_setting(name):
+    return getattr(settings, 'JWT_USER_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class UserCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._invalidated = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, not_before=0):
+        """The cached user, unless it expired or was cached at or before the wall-clock time ``not_before``."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires, cached_at = entry
+            if expires < time.monotonic() or cached_at <= not_before:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        # Each request gets its own copy so lazily loaded fields don't leak across threads
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (copy.copy(user), time.monotonic() + get_cache_setting('TTL'), time.time())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > get_cache_setting('MAX_SIZE'):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._invalidated[user_id] = time.time()
+
+    def invalidated_at(self, user_id):
+        return self._invalidated.get(user_id, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidated.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_token_revoked(validated_token):
+            raise InvalidToken({'detail': 'Token has been revoked', 'code': 'token_revoked'})
+        return validated_token
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = self.get_cached_user(user_id, validated_token)
+        if user is None:
+            # The regular path: one query plus simplejwt's own checks
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        return self.check_active(user)
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views; only a cache miss or a revocation hit leaves the event loop."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = JWTAuthentication.get_validated_token(self, raw_token)
+        if await ais_token_revoked(validated_token):
+            raise InvalidToken({'detail': 'Token has been revoked', 'code': 'token_revoked'})
+
+        user_id = self.get_user_id(validated_token)
+        user = self.get_cached_user(user_id, validated_token)
+        if user is None:
+            user = await sync_to_async(JWTAuthentication.get_user)(self, validated_token)
+            user_cache.set(user_id, user)
+        return self.check_active(user), validated_token
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+    def get_cached_user(self, user_id, validated_token):
+        # Invalidations from other processes, as of the revocation check that just ran
+        invalidated_at = user_claims_invalidated_at(user_id)
+        user = user_cache.get(user_id, not_before=invalidated_at)
+        if user is None:
+            user = self.get_user_from_claims(user_id, validated_token, invalidated_at)
+            if user is not None:
+                user_cache.set(user_id, user)
+        return user
+
+    def check_active(self, user):
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+    def get_user_from_claims(self, user_id, validated_token, invalidated_at=0):
+        if api_settings.CHECK_REVOKE_TOKEN or any(claim not in validated_token for claim in USER_CLAIMS):
+            return None
+        issued_at = validated_token.get('iat', 0)
+        max_age = get_cache_setting('CLAIMS_MAX_AGE')
+        if max_age is not None and time.time() - issued_at > max_age:
+            return None
+        if issued_at <= max(invalidated_at, user_cache.invalidated_at(user_id)):
+            return None
+
+        values = {api_settings.USER_ID_FIELD: user_id}
+        values.update({claim: validated_token[claim] for claim in USER_CLAIMS if claim != 'full_name'})
+        fields = [field.attname for field in self.user_model._meta.concrete_fields]
+        return self.user_model.from_db(
+            None, fields, [values.get(field, DEFERRED) for field in fields]
+        )
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    Authenticates against either the email or the username with a single
+    indexed, case-insensitive lookup and exactly one password hash.
+
+    When no user matches, a dummy hash of the same cost is still computed so
+    response times do not reveal which accounts exist.
+    """
+
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        login = email or username or kwargs.get(get_user_model().USERNAME_FIELD)
+        if not login or password is None:
+            return None
+
+        UserModel = get_user_model()
+        field = 'email' if '@' in login else UserModel.USERNAME_FIELD
+        try:
+            user = UserModel._default_manager.get(**{f'{field}__iexact': login})
+        except (UserModel.DoesNotExist, UserModel.MultipleObjectsReturned):
+            UserModel().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
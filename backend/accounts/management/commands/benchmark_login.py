@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import override_settings
+from accounts.serializers import LoginSerializer
+
+class Command(BaseCommand):
+    help = 'Measure LoginSerializer throughput for a valid login, a wrong password and an unknown email'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument('password')
+        parser.add_argument('--iterations', type=int, default=20)
+    
+    def handle(self, *args, **options):
+        scenarios = [
+            ('valid login', options['email'], options['password']),
+            ('wrong password', options['email'], options['password'] + '-wrong'),
+            ('unknown email', 'nobody-' + options['email'], options['password']),
+        ]
+        
+        with override_settings(DEBUG=True):
+            for label, email, password in scenarios:
+                reset_queries()
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    LoginSerializer(data={'email': email, 'password': password}).is_valid()
+                elapsed = time.perf_counter() - started
+                queries = len(connection.queries) / options['iterations']
+                self.stdout.write(
+                    f'{label}: {options["iterations"] / elapsed:.1f} logins/s, '
+                    f'{elapsed / options["iterations"] * 1000:.1f} ms each, {queries:.1f} queries each'
+                )
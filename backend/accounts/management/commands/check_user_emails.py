@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+# Reserved top-level domain (RFC 2606), so a placeholder can never reach a real mailbox
+PLACEHOLDER_DOMAIN = 'users.invalid'
+
+
+class Command(BaseCommand):
+    help = ('Report users with a blank email or one that differs from another user\'s only in case. '
+            'Run before migrating to the unique User.email; --fix gives each of them a unique email')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Give blank emails a placeholder and every duplicate but the oldest account '
+                                 'a +user<id> suffix')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if User._meta.db_table not in connection.introspection.table_names():
+            self.stdout.write('No users table yet: nothing to check')
+            return
+
+        # Only columns that predate the constraint, so this runs against the unmigrated table
+        users = User.objects.order_by('pk').values_list('pk', 'username', 'email')
+        by_email = defaultdict(list)
+        blank = []
+        for pk, username, email in users.iterator():
+            if email and email.strip():
+                by_email[email.strip().lower()].append((pk, username, email))
+            else:
+                blank.append((pk, username, email))
+        # Logins look emails up case-insensitively, so case variants lock each other out
+        duplicates = {email: rows for email, rows in by_email.items() if len(rows) > 1}
+
+        for pk, username, email in blank:
+            self.stdout.write(f'blank: user {pk} ({username})')
+        for email, rows in duplicates.items():
+            self.stdout.write(f'duplicate: {email} is used by ' + ', '.join(f'user {pk} ({username})'
+                                                                             for pk, username, _ in rows))
+        problems = len(blank) + sum(len(rows) - 1 for rows in duplicates.values())
+        if not problems:
+            self.stdout.write(self.style.SUCCESS('Every user has a unique email'))
+            return
+        if not options['fix']:
+            raise CommandError(f'{problems} users need a unique email before the constraint can be applied: '
+                               f'correct them by hand or rerun with --fix')
+
+        taken = set(by_email)
+        changes = [(pk, f'user{pk}@{PLACEHOLDER_DOMAIN}') for pk, username, email in blank]
+        for rows in duplicates.values():
+            # The oldest account keeps the address
+            for pk, username, email in rows[1:]:
+                local, _, domain = email.strip().rpartition('@')
+                changes.append((pk, f'{local}+user{pk}@{domain}'))
+        for pk, email in changes:
+            if email.lower() in taken:
+                raise CommandError(f'Cannot give user {pk} the email {email}: it is taken. Correct it by hand')
+            taken.add(email.lower())
+        with transaction.atomic():
+            for pk, email in changes:
+                User.objects.filter(pk=pk).update(email=email)
+                self.stdout.write(f'user {pk}: email set to {email}')
+        self.stdout.write(self.style.SUCCESS(f'Gave {len(changes)} users a unique email'))
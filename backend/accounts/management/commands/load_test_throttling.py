@@ -0,0 +1,96 @@
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+
+class Command(BaseCommand):
+    help = ('Measure a legitimate user\'s latency before and during a password-guessing burst '
+            'against the login endpoint, to check that throttling keeps it flat and never locks them out')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Login of the legitimate user')
+        parser.add_argument('password')
+        parser.add_argument('--attackers', type=int, default=8, help='Concurrent attacking threads')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per phase')
+        parser.add_argument('--target', default=None,
+                            help='Account the attackers guess passwords for (default: the legitimate user\'s, '
+                                 'which checks that failed guesses cannot lock them out)')
+        parser.add_argument('--random-targets', action='store_true',
+                            help='Guess a random email per attempt instead, like credential stuffing')
+        parser.add_argument('--attacker-ip', default='203.0.113.7')
+        parser.add_argument('--user-ip', default='198.51.100.20')
+    
+    def handle(self, *args, **options):
+        baseline = self._phase(options, attackers=0)
+        attack = self._phase(options, attackers=options['attackers'])
+        
+        for label, result in (('baseline', baseline), ('under attack', attack)):
+            self.stdout.write(f'{label}:')
+            for name in ('login', 'read'):
+                self.stdout.write(f'  user {name}: {self._summary(result[name])}')
+            if result['attack']:
+                statuses = ', '.join(f'{code}: {count}' for code, count in sorted(result['attack'].items()))
+                self.stdout.write(f'  attacker responses: {statuses}')
+    
+    def _phase(self, options, attackers):
+        stop = threading.Event()
+        result = {'login': [], 'read': [], 'attack': Counter()}
+        lock = threading.Lock()
+        
+        def attack():
+            client = Client(HTTP_HOST='localhost', REMOTE_ADDR=options['attacker_ip'])
+            try:
+                while not stop.is_set():
+                    if options['random_targets']:
+                        email = f'{uuid.uuid4().hex[:12]}@example.com'
+                    else:
+                        email = options['target'] or options['email']
+                    response = client.post('/api/auth/login/', {'email': email, 'password': 'guess'},
+                                           content_type='application/json')
+                    with lock:
+                        result['attack'][response.status_code] += 1
+            finally:
+                connections.close_all()
+        
+        threads = [threading.Thread(target=attack) for _ in range(attackers)]
+        for thread in threads:
+            thread.start()
+        
+        client = Client(HTTP_HOST='localhost', REMOTE_ADDR=options['user_ip'])
+        deadline = time.monotonic() + options['duration']
+        try:
+            while time.monotonic() < deadline:
+                # One login every 10 seconds stays under the per-IP login limit
+                started = time.perf_counter()
+                response = client.post('/api/auth/login/', {'email': options['email'], 'password': options['password']},
+                                       content_type='application/json')
+                result['login'].append((time.perf_counter() - started, response.status_code))
+                if response.status_code != 200:
+                    self.stderr.write(f'Login failed with {response.status_code}: {response.content[:200]!r}')
+                    break
+                
+                auth = {'HTTP_AUTHORIZATION': f'Bearer {response.json()["token"]}'}
+                next_login = time.monotonic() + 10
+                while time.monotonic() < min(next_login, deadline):
+                    started = time.perf_counter()
+                    response = client.get('/api/auth/me/', **auth)
+                    result['read'].append((time.perf_counter() - started, response.status_code))
+                    time.sleep(0.05)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        return result
+    
+    def _summary(self, samples):
+        if not samples:
+            return 'no requests'
+        latencies = sorted(latency * 1000 for latency, code in samples)
+        failed = sum(1 for latency, code in samples if code >= 400)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return (f'{len(samples)} requests, {failed} failed, p50 {statistics.median(latencies):.1f} ms, '
+                f'p95 {p95:.1f} ms, max {latencies[-1]:.1f} ms')
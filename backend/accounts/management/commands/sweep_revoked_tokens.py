@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from accounts.revocation import get_revocation_backend
+
+class Command(BaseCommand):
+    help = 'Delete revoked-token records whose tokens have expired (run periodically, e.g. from cron)'
+    
+    def handle(self, *args, **options):
+        deleted = get_revocation_backend().sweep()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} expired revoked tokens'))
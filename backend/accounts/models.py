@@ -8,12 +8,15 @@ class User(AbstractUser):
         ('employee', 'Employee'),
     ]
     
+    # Unique (and therefore indexed) so EmailOrUsernameBackend resolves logins in one lookup
+    email = models.EmailField('email address', unique=True)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='employee')
     phone = models.CharField(max_length=15, blank=True, null=True)
     department = models.CharField(max_length=50, blank=True, null=True)
     join_date = models.DateField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.role})"
@@ -21,3 +24,12 @@ class User(AbstractUser):
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip() or self.username
+
+class RevokedToken(models.Model):
+    """JTIs of revoked access/refresh tokens, swept once the token would have expired anyway."""
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,265 @@
+"""
+Revocation of JWT access and refresh tokens by JTI.
+
+Every authenticated request has to ask "is this token revoked?", so the
+check must not hit the database. DatabaseRevocationBackend keeps all
+unexpired revoked JTIs in an in-memory Bloom filter. It is refreshed from the
+RevokedToken table every SYNC_INTERVAL seconds through the indexed
+``created_at`` column, which is how workers share state. A negative answer,
+the common case, is O(1) in memory. A positive answer is confirmed against the
+table, so false positives never reject a valid token.
+
+The same store invalidates a user's claims (see accounts.authentication).
+When a user's role, name or active flag changes, a ``claims:<id>:<time>``
+row is recorded. Each process picks it up at its next sync and stops
+trusting the claims in that user's tokens issued before then. Those
+tokens stay valid but are checked against the database again. The row
+expires once every such token has.
+
+LocalRevocationBackend keeps everything in process memory. It is meant for
+tests and single-process development servers.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Rows committed around the previous sync are read again so none are missed
+SYNC_OVERLAP = timedelta(seconds=1)
+CLAIMS_PREFIX = 'claims:'
+
+DEFAULTS = {
+    'BACKEND': 'accounts.revocation.DatabaseRevocationBackend',
+    'SYNC_INTERVAL': 5,
+    'BLOOM_CAPACITY': 100000,
+    'BLOOM_ERROR_RATE': 0.01,
+}
+
+
+def get_revocation_setting(name):
+    return getattr(settings, 'TOKEN_REVOCATION', {}).get(name, DEFAULTS[name])
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Kirsch-Mitzenmacher: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class BaseRevocationBackend:
+    def revoke(self, jti, expires_at):
+        raise NotImplementedError
+
+    def is_revoked(self, jti):
+        raise NotImplementedError
+
+    async def ais_revoked(self, jti):
+        return await sync_to_async(self.is_revoked)(jti)
+
+    def sweep(self):
+        """Forget revocations whose tokens have expired anyway; returns how many."""
+        raise NotImplementedError
+
+    def invalidate_claims(self, user_id, at, expires_at):
+        raise NotImplementedError
+
+    def claims_invalidated_at(self, user_id):
+        """When the user's claims were last invalidated, as of the last sync (0 if never)."""
+        raise NotImplementedError
+
+
+class LocalRevocationBackend(BaseRevocationBackend):
+    def __init__(self):
+        self._revoked = {}
+        self._claims_invalidated = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        return jti in self._revoked
+
+    async def ais_revoked(self, jti):
+        return self.is_revoked(jti)
+
+    def sweep(self):
+        now = timezone.now()
+        with self._lock:
+            expired = [jti for jti, expires_at in self._revoked.items() if expires_at <= now]
+            for jti in expired:
+                del self._revoked[jti]
+        return len(expired)
+
+    def invalidate_claims(self, user_id, at, expires_at):
+        with self._lock:
+            self._claims_invalidated[user_id] = max(at, self._claims_invalidated.get(user_id, 0))
+
+    def claims_invalidated_at(self, user_id):
+        return self._claims_invalidated.get(user_id, 0)
+
+
+class DatabaseRevocationBackend(BaseRevocationBackend):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._claims_invalidated = {}
+        self._synced_until = None
+        self._next_sync = 0
+
+    def revoke(self, jti, expires_at):
+        from .models import RevokedToken
+
+        RevokedToken.objects.get_or_create(jti=jti, defaults={'expires_at': expires_at})
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def is_revoked(self, jti):
+        from .models import RevokedToken
+
+        if jti not in self._sync():
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    async def ais_revoked(self, jti):
+        bloom = self._bloom
+        if bloom is not None and time.monotonic() < self._next_sync and jti not in bloom:
+            # The common case needs neither a query nor a thread
+            return False
+        return await sync_to_async(self.is_revoked)(jti)
+
+    def sweep(self):
+        from .models import RevokedToken
+
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        with self._lock:
+            # Rebuild on next use so expired JTIs stop occupying the filter
+            self._bloom = None
+            self._next_sync = 0
+        return deleted
+
+    def invalidate_claims(self, user_id, at, expires_at):
+        from .models import RevokedToken
+
+        RevokedToken.objects.get_or_create(jti=f'{CLAIMS_PREFIX}{user_id}:{at:.6f}',
+                                           defaults={'expires_at': expires_at})
+        with self._lock:
+            self._note_claims_invalidated(self._claims_invalidated, user_id, at)
+
+    def claims_invalidated_at(self, user_id):
+        # No sync here: the revocation check that runs first on every request keeps the state fresh
+        return self._claims_invalidated.get(user_id, 0)
+
+    def _note_claims_invalidated(self, invalidated, user_id, at):
+        invalidated[user_id] = max(at, invalidated.get(user_id, 0))
+
+    def _sync(self):
+        bloom = self._bloom
+        if time.monotonic() < self._next_sync and bloom is not None:
+            return bloom
+        from .models import RevokedToken
+
+        with self._lock:
+            if time.monotonic() < self._next_sync and self._bloom is not None:
+                return self._bloom
+            started = timezone.now()
+            if self._bloom is None:
+                rows = RevokedToken.objects.filter(expires_at__gt=started)
+                capacity = max(get_revocation_setting('BLOOM_CAPACITY'), rows.count() * 2)
+                bloom = BloomFilter(capacity, get_revocation_setting('BLOOM_ERROR_RATE'))
+                claims_invalidated = {}
+            else:
+                rows = RevokedToken.objects.filter(created_at__gte=self._synced_until - SYNC_OVERLAP)
+                bloom = self._bloom
+                claims_invalidated = dict(self._claims_invalidated)
+            for jti in rows.values_list('jti', flat=True).iterator():
+                if jti.startswith(CLAIMS_PREFIX):
+                    user_id, _, at = jti[len(CLAIMS_PREFIX):].rpartition(':')
+                    self._note_claims_invalidated(claims_invalidated, int(user_id), float(at))
+                else:
+                    bloom.add(jti)
+            if bloom.count > bloom.capacity:
+                bloom = None
+            self._bloom = bloom
+            self._claims_invalidated = claims_invalidated
+            self._synced_until = started
+            self._next_sync = time.monotonic() + get_revocation_setting('SYNC_INTERVAL')
+        if bloom is None:
+            # Over capacity: rebuild at a larger size straight away
+            return self._sync()
+        return bloom
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_revocation_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(get_revocation_setting('BACKEND'))()
+    return _backend
+
+
+def reset_revocation_backend():
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def token_expiry(token):
+    return datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+
+
+def revoke_token(token):
+    get_revocation_backend().revoke(token['jti'], token_expiry(token))
+
+
+def is_token_revoked(token):
+    jti = token.get('jti')
+    return jti is not None and get_revocation_backend().is_revoked(jti)
+
+
+async def ais_token_revoked(token):
+    jti = token.get('jti')
+    return jti is not None and await get_revocation_backend().ais_revoked(jti)
+
+
+def invalidate_user_claims(user_id):
+    """Stop trusting the claims of the user's existing tokens, in every process within SYNC_INTERVAL."""
+    from rest_framework_simplejwt.settings import api_settings
+
+    now = timezone.now()
+    get_revocation_backend().invalidate_claims(user_id, now.timestamp(), now + api_settings.ACCESS_TOKEN_LIFETIME)
+
+
+def user_claims_invalidated_at(user_id):
+    return get_revocation_backend().claims_invalidated_at(user_id)
@@ -1,13 +1,22 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from django.contrib.auth import authenticate
 from .models import User
 
 class UserSerializer(serializers.ModelSerializer):
+    # Avatars are only served through the permission-checked avatar endpoint
+    avatar_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 
-                 'role', 'phone', 'department', 'join_date', 'is_active', 'full_name']
+                 'role', 'phone', 'department', 'join_date', 'is_active', 'full_name', 'avatar_url']
         read_only_fields = ['id', 'join_date', 'full_name']
+    
+    def get_avatar_url(self, obj):
+        if not obj.avatar:
+            return None
+        return reverse('user_avatar', kwargs={'pk': obj.pk}, request=self.context.get('request'))
 
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -18,15 +27,9 @@ class LoginSerializer(serializers.Serializer):
         password = attrs.get('password')
 
         if email and password:
-            user = authenticate(username=email, password=password)
-            if not user:
-                # Try authenticating with email field
-                try:
-                    user_obj = User.objects.get(email=email)
-                    user = authenticate(username=user_obj.username, password=password)
-                except User.DoesNotExist:
-                    pass
-                
+            # EmailOrUsernameBackend: one indexed lookup, one password hash
+            user = authenticate(self.context.get('request'), email=email, password=password)
+            
             if not user:
                 raise serializers.ValidationError('Invalid credentials')
             
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import user_cache
+from .models import User
+from .revocation import invalidate_user_claims
+from .tokens import USER_CLAIMS
+
+# The model fields behind the token claims; full_name is derived from the names
+CLAIM_FIELDS = set(USER_CLAIMS) - {'full_name'}
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+@receiver(post_save, sender=User)
+def invalidate_changed_claims(sender, instance, created, update_fields=None, **kwargs):
+    # e.g. login only saves last_login, which leaves the claims as they are
+    if created or (update_fields is not None and not CLAIM_FIELDS & set(update_fields)):
+        return
+    invalidate_user_claims(instance.pk)
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_claims(sender, instance, **kwargs):
+    invalidate_user_claims(instance.pk)
@@ -0,0 +1,210 @@
+import io
+import time
+from datetime import timedelta
+from unittest import mock, skipIf
+
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from study_abroad_crm.throttling import THROTTLE_CACHE_ALIAS, SlidingWindowRateThrottle
+
+from . import revocation
+from .authentication import user_cache
+from .models import RevokedToken, User
+from .revocation import DatabaseRevocationBackend, reset_revocation_backend
+from .tokens import UserClaimsRefreshToken
+
+
+@override_settings(TOKEN_REVOCATION={'BACKEND': 'accounts.revocation.DatabaseRevocationBackend'})
+class TokenRevocationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='counselor', email='counselor@example.com', password='pw',
+                                            role='counselor')
+
+    def setUp(self):
+        # Each test starts with an empty filter, synced from its own database state
+        reset_revocation_backend()
+        self.addCleanup(reset_revocation_backend)
+        user_cache.clear()
+        self.refresh = UserClaimsRefreshToken.for_user(self.user)
+
+    def authorize(self, refresh):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        self.authorize(self.refresh)
+        self.assertEqual(self.client.get('/api/auth/verify/').status_code, 200)
+
+        response = self.client.post('/api/auth/logout/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get('/api/auth/verify/').status_code, 401)
+        self.client.credentials()
+        response = self.client.post('/api/auth/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['error'], 'Token has been revoked')
+
+    def test_refresh_token_can_be_used_once(self):
+        response = self.client.post('/api/auth/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["token"]}')
+        self.assertEqual(self.client.get('/api/auth/verify/').status_code, 200)
+        self.client.credentials()
+        response = self.client.post('/api/auth/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_other_tokens_of_the_user_stay_valid(self):
+        other = UserClaimsRefreshToken.for_user(self.user)
+        self.authorize(self.refresh)
+        self.client.post('/api/auth/logout/', {'refresh': str(self.refresh)}, format='json')
+
+        self.authorize(other)
+        self.assertEqual(self.client.get('/api/auth/verify/').status_code, 200)
+
+
+@override_settings(TOKEN_REVOCATION={'SYNC_INTERVAL': 5, 'BLOOM_CAPACITY': 100})
+class DatabaseRevocationBackendTests(APITestCase):
+    """Two backends on one table stand in for two worker processes."""
+
+    def setUp(self):
+        self.expires_at = timezone.now() + timedelta(hours=1)
+        self.writer = DatabaseRevocationBackend()
+        self.reader = DatabaseRevocationBackend()
+
+    def later(self, seconds):
+        return mock.patch.object(revocation.time, 'monotonic', return_value=time.monotonic() + seconds)
+
+    def test_revocation_by_another_process_is_seen_after_the_sync_interval(self):
+        self.assertFalse(self.reader.is_revoked('jti-1'))
+        self.writer.revoke('jti-1', self.expires_at)
+
+        # Until its next sync the reader's filter does not know the JTI yet
+        self.assertFalse(self.reader.is_revoked('jti-1'))
+        with self.later(6):
+            self.assertTrue(self.reader.is_revoked('jti-1'))
+        self.assertTrue(self.writer.is_revoked('jti-1'))
+
+    def test_revocation_in_this_process_is_seen_at_once(self):
+        self.assertFalse(self.writer.is_revoked('jti-1'))
+        self.writer.revoke('jti-1', self.expires_at)
+        self.assertTrue(self.writer.is_revoked('jti-1'))
+
+    def test_filter_false_positive_is_confirmed_against_the_table(self):
+        self.reader.is_revoked('jti-1')
+        self.reader._bloom.add('jti-2')
+        with self.assertNumQueries(1):
+            self.assertFalse(self.reader.is_revoked('jti-2'))
+
+    def test_negative_answer_needs_no_query(self):
+        self.reader.is_revoked('jti-1')
+        with self.assertNumQueries(0):
+            self.assertFalse(self.reader.is_revoked('jti-2'))
+
+    def test_filter_over_capacity_is_rebuilt_larger(self):
+        self.reader.is_revoked('jti-0')
+        RevokedToken.objects.bulk_create([RevokedToken(jti=f'jti-{index}', expires_at=self.expires_at)
+                                          for index in range(150)])
+        with self.later(6):
+            self.assertTrue(all(self.reader.is_revoked(f'jti-{index}') for index in range(150)))
+        self.assertGreaterEqual(self.reader._bloom.capacity, 300)
+
+    def test_sweep_forgets_expired_tokens_and_rebuilds_the_filter(self):
+        self.writer.revoke('expired', timezone.now() - timedelta(seconds=1))
+        self.writer.revoke('live', self.expires_at)
+
+        self.assertEqual(self.writer.sweep(), 1)
+        self.assertFalse(RevokedToken.objects.filter(jti='expired').exists())
+        self.assertFalse(self.writer.is_revoked('expired'))
+        self.assertTrue(self.writer.is_revoked('live'))
+        self.assertNotIn('expired', self.writer._bloom)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginThrottleTests(APITestCase):
+    """login_account allows 10 failed logins a minute per account and client IP."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='counselor', email='counselor@example.com', password='pw',
+                                            role='counselor')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='pw',
+                                             role='counselor')
+
+    def setUp(self):
+        caches[THROTTLE_CACHE_ALIAS].clear()
+        # Half way through a window, so the counts do not slide between windows mid-test
+        patcher = mock.patch.object(SlidingWindowRateThrottle, 'timer', return_value=6030.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self, password, email='counselor@example.com', ip='10.0.0.1'):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password}, format='json',
+                                REMOTE_ADDR=ip)
+
+    def test_failed_logins_are_limited(self):
+        for attempt in range(10):
+            self.assertEqual(self.login('wrong').status_code, 400)
+
+        response = self.login('wrong')
+        self.assertEqual(response.status_code, 429)
+        # 30 seconds left in this window, then the previous window's 10 failures slide out to 9
+        self.assertEqual(response['Retry-After'], '36')
+        # The right password is refused too until then
+        self.assertEqual(self.login('pw').status_code, 429)
+
+    def test_successful_logins_are_not_counted(self):
+        for attempt in range(9):
+            self.assertEqual(self.login('wrong').status_code, 400)
+        for attempt in range(10):
+            self.assertEqual(self.login('pw').status_code, 200)
+
+        self.assertEqual(self.login('wrong').status_code, 400)
+        self.assertEqual(self.login('wrong').status_code, 429)
+
+    def test_other_accounts_are_not_limited(self):
+        for attempt in range(10):
+            self.login('wrong')
+        self.assertEqual(self.login('wrong').status_code, 429)
+
+        self.assertEqual(self.login('pw', email='other@example.com').status_code, 200)
+
+    def test_failed_logins_from_many_ips_are_limited_per_account(self):
+        with mock.patch.dict(SlidingWindowRateThrottle.THROTTLE_RATES, {'login_account_global': '15/min'}):
+            for attempt in range(15):
+                self.assertEqual(self.login('wrong', ip=f'10.0.0.{attempt}').status_code, 400)
+
+            self.assertEqual(self.login('wrong', ip='10.0.1.1').status_code, 429)
+            self.assertEqual(self.login('pw', email='other@example.com', ip='10.0.1.1').status_code, 200)
+
+
+class CheckUserEmailsTests(APITestCase):
+    def check_emails(self, **options):
+        out = io.StringIO()
+        call_command('check_user_emails', stdout=out, **options)
+        return out.getvalue()
+
+    def test_unique_emails_pass(self):
+        User.objects.create_user(username='first', email='first@example.com', password='pw')
+        self.assertIn('Every user has a unique email', self.check_emails())
+
+    @skipIf(connection.vendor == 'mysql', 'MySQL collations already reject emails that differ only in case')
+    def test_blank_and_case_duplicate_emails_are_reported_and_fixed(self):
+        oldest = User.objects.create_user(username='oldest', email='Dup@example.com', password='pw')
+        newer = User.objects.create_user(username='newer', email='dup@example.com', password='pw')
+        blank = User.objects.create_user(username='blank', email='', password='pw')
+
+        with self.assertRaisesMessage(CommandError, '2 users need a unique email'):
+            self.check_emails()
+        self.assertEqual(User.objects.get(pk=newer.pk).email, 'dup@example.com')
+
+        self.check_emails(fix=True)
+        self.assertEqual(User.objects.get(pk=oldest.pk).email, 'Dup@example.com')
+        self.assertEqual(User.objects.get(pk=newer.pk).email, f'dup+user{newer.pk}@example.com')
+        self.assertEqual(User.objects.get(pk=blank.pk).email, f'user{blank.pk}@users.invalid')
+        self.assertIn('Every user has a unique email', self.check_emails())
@@ -0,0 +1,13 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# Copied into every access token so authentication can skip the user query
+USER_CLAIMS = ['role', 'is_active', 'username', 'first_name', 'last_name', 'full_name']
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
@@ -5,7 +5,9 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('verify/', views.verify_token, name='verify_token'),
     path('logout/', views.logout_view, name='logout'),
+    path('refresh/', views.refresh_token_view, name='refresh_token'),
     path('users/', views.UserListCreateView.as_view(), name='user_list_create'),
     path('users/<int:pk>/', views.UserDetailView.as_view(), name='user_detail'),
+    path('users/<int:pk>/avatar/', views.user_avatar, name='user_avatar'),
     path('me/', views.current_user, name='current_user'),
 ]
@@ -1,19 +1,30 @@
+import os
 from rest_framework import status, generics
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import authenticate
+from django.shortcuts import get_object_or_404
+from study_abroad_crm.conditional import ConditionalGetMixin
+from study_abroad_crm.downloads import DownloadRenderer, file_response
+from study_abroad_crm.pagination import KeysetPagination
+from study_abroad_crm.throttling import (LoginAccountGlobalRateThrottle, LoginAccountRateThrottle, LoginRateThrottle,
+                                        RefreshRateThrottle, record_login_failure)
 from .models import User
+from .revocation import is_token_revoked, revoke_token
+from .tokens import UserClaimsRefreshToken
 from .serializers import UserSerializer, LoginSerializer, UserCreateSerializer
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginRateThrottle, LoginAccountRateThrottle, LoginAccountGlobalRateThrottle])
 def login_view(request):
-    serializer = LoginSerializer(data=request.data)
+    serializer = LoginSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
         user = serializer.validated_data['user']
-        refresh = RefreshToken.for_user(user)
+        refresh = UserClaimsRefreshToken.for_user(user)
         
         return Response({
             'user': UserSerializer(user).data,
@@ -21,31 +32,74 @@ def login_view(request):
             'refresh': str(refresh),
             'message': 'Login successful'
         })
+    # The per-account limits count only failures, so others cannot lock the account out
+    record_login_failure(request)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def load_full_user(user):
+    # request.user may be built from token claims with the profile fields deferred;
+    # load them in one query instead of one per field
+    if user.get_deferred_fields():
+        return User.objects.get(pk=user.pk)
+    return user
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def verify_token(request):
     return Response({
-        'user': UserSerializer(request.user).data,
+        'user': UserSerializer(load_full_user(request.user)).data,
         'message': 'Token valid'
     })
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_view(request):
+    # The access token is revoked too, so it stops working before it expires
+    revoke_token(request.auth)
+    refresh_token = request.data.get('refresh')
+    if refresh_token:
+        try:
+            revoke_token(UserClaimsRefreshToken(refresh_token))
+        except TokenError:
+            # Already expired or malformed: nothing left to revoke
+            pass
+    return Response({'message': 'Logout successful'})
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@throttle_classes([RefreshRateThrottle])
+def refresh_token_view(request):
     try:
-        refresh_token = request.data.get('refresh')
-        if refresh_token:
-            token = RefreshToken(refresh_token)
-            token.blacklist()
-        return Response({'message': 'Logout successful'})
-    except Exception as e:
-        return Response({'message': 'Logout successful'})
+        refresh = UserClaimsRefreshToken(request.data.get('refresh') or '')
+    except TokenError as e:
+        return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    if is_token_revoked(refresh):
+        return Response({'error': 'Token has been revoked'}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    user = User.objects.filter(pk=refresh.get(api_settings.USER_ID_CLAIM), is_active=True).first()
+    if user is None:
+        return Response({'error': 'User not found or inactive'}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    # Rotate: the old refresh token can be used only once
+    revoke_token(refresh)
+    new_refresh = UserClaimsRefreshToken.for_user(user)
+    return Response({
+        'token': str(new_refresh.access_token),
+        'refresh': str(new_refresh),
+    })
+
+def scoped_users(user):
+    # Only admins can view/edit other users
+    if user.role == 'admin':
+        return User.objects.all()
+    return User.objects.filter(id=user.id)
 
-class UserListCreateView(generics.ListCreateAPIView):
+class UserListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = User.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering_fields = ['date_joined', 'username', 'last_name']
+    ordering = ['-date_joined']
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -53,23 +107,24 @@ class UserListCreateView(generics.ListCreateAPIView):
         return UserSerializer
     
     def get_queryset(self):
-        # Filter based on user role
-        if self.request.user.role == 'admin':
-            return User.objects.all()
-        return User.objects.filter(id=self.request.user.id)
+        return scoped_users(self.request.user)
 
-class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
+class UserDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        # Only admins can view/edit other users
-        if self.request.user.role == 'admin':
-            return User.objects.all()
-        return User.objects.filter(id=self.request.user.id)
+        return scoped_users(self.request.user)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def current_user(request):
-    return Response(UserSerializer(request.user).data)
+    return Response(UserSerializer(load_full_user(request.user), context={'request': request}).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([DownloadRenderer])
+def user_avatar(request, pk):
+    user = get_object_or_404(scoped_users(request.user).only('id', 'avatar'), pk=pk)
+    return file_response(request, user.avatar, os.path.basename(user.avatar.name), as_attachment=False)
@@ -0,0 +1,11 @@
+import django_filters
+from .models import Application
+
+class ApplicationFilter(django_filters.FilterSet):
+    """``progress_min`` / ``progress_max`` filter on the SQL ``progress`` annotation (see views.with_progress)."""
+    progress_min = django_filters.NumberFilter(field_name='progress', lookup_expr='gte')
+    progress_max = django_filters.NumberFilter(field_name='progress', lookup_expr='lte')
+    
+    class Meta:
+        model = Application
+        fields = ['status', 'priority', 'student', 'university', 'level', 'intake']
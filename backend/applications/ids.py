@@ -0,0 +1,156 @@
+"""
+Allocation of ``Application.application_id``.
+
+IDs are a prefix and a zero-padded sequence number, "APP-0000123", so they
+are short, readable and sort in allocation order. Numbers come from the
+ApplicationIdSequence row of the prefix. Each process reserves BLOCK_SIZE
+numbers at a time with one UPDATE and hands them out from memory, so only
+one allocation in BLOCK_SIZE touches the database and no two processes or
+threads ever get the same number. Numbers are therefore ordered within a
+process but only roughly across processes, and a restarted process leaves
+the rest of its block unused.
+
+Blocks are reserved on a private connection that commits at once. A block
+reserved inside the caller's transaction would be returned to the sequence
+by a rollback while this process still held it, and handed out twice. SQLite
+cannot open a second writer during the caller's transaction, so there just
+the numbers needed are reserved inside it, and none are kept.
+"""
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+DEFAULTS = {
+    'PREFIX': 'APP',
+    'WIDTH': 7,
+    'BLOCK_SIZE': 50,
+}
+MAX_LENGTH = 20
+
+
+def get_application_id_setting(name):
+    return getattr(settings, 'APPLICATION_IDS', {}).get(name, DEFAULTS[name])
+
+
+class ApplicationIdAllocator:
+    def __init__(self, prefix=None, block_size=None, width=None, using=DEFAULT_DB_ALIAS):
+        self.prefix = prefix or get_application_id_setting('PREFIX')
+        self.block_size = block_size or get_application_id_setting('BLOCK_SIZE')
+        self.width = width or get_application_id_setting('WIDTH')
+        self.using = using
+        if len(self.prefix) + 1 + self.width > MAX_LENGTH:
+            raise ValueError(f'Application ids of prefix "{self.prefix}" and width {self.width} exceed '
+                             f'{MAX_LENGTH} characters')
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._pid = None
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        """``count`` new ids in ascending order, reserving as few blocks as possible."""
+        if self._in_writing_transaction():
+            return [self.format(number) for number in range(*self._reserve_in_transaction(count))]
+        numbers = []
+        with self._lock:
+            if self._pid != os.getpid():
+                # A block reserved before a fork is shared with the parent and its other children
+                self._next = self._end = 0
+            while len(numbers) < count:
+                if self._next >= self._end:
+                    self._next, self._end = self.reserve(max(self.block_size, count - len(numbers)))
+                    self._pid = os.getpid()
+                taken = min(count - len(numbers), self._end - self._next)
+                numbers.extend(range(self._next, self._next + taken))
+                self._next += taken
+        return [self.format(number) for number in numbers]
+
+    def format(self, number):
+        return f'{self.prefix}-{number:0{self.width}d}'
+
+    def reserve(self, size):
+        """Reserve ``size`` numbers on a private connection and return their range as (start, end)."""
+        connection = connections.create_connection(self.using)
+        try:
+            connection.set_autocommit(False)
+            for attempt in range(2):
+                try:
+                    with connection.cursor() as cursor:
+                        numbers = self._reserve(connection, cursor, size)
+                    connection.commit()
+                    return numbers
+                except IntegrityError:
+                    # Another process created the sequence row first; reserve from it
+                    connection.rollback()
+                    if attempt:
+                        raise
+        finally:
+            connection.close()
+
+    def _in_writing_transaction(self):
+        # SQLite has a single writer: a second connection would wait for the caller's transaction forever
+        connection = connections[self.using]
+        return connection.vendor == 'sqlite' and connection.in_atomic_block
+
+    def _reserve_in_transaction(self, size):
+        # Nothing is kept for later, so a rollback cannot hand these numbers out twice
+        connection = connections[self.using]
+        for attempt in range(2):
+            try:
+                # A savepoint, so losing the race to create the sequence row only undoes this attempt
+                with transaction.atomic(using=self.using), connection.cursor() as cursor:
+                    return self._reserve(connection, cursor, size)
+            except IntegrityError:
+                if attempt:
+                    raise
+
+    def _reserve(self, connection, cursor, size):
+        from .models import ApplicationIdSequence
+
+        table = connection.ops.quote_name(ApplicationIdSequence._meta.db_table)
+        # The UPDATE locks the row until commit, so concurrent reservations queue on it
+        cursor.execute(f'UPDATE {table} SET next_value = next_value + %s WHERE prefix = %s', [size, self.prefix])
+        if not cursor.rowcount:
+            # Raises IntegrityError if another process creates the row first; the caller retries the UPDATE
+            cursor.execute(f'INSERT INTO {table} (prefix, next_value) VALUES (%s, %s)',
+                           [self.prefix, self._first_number() + size])
+        cursor.execute(f'SELECT next_value FROM {table} WHERE prefix = %s', [self.prefix])
+        end = cursor.fetchone()[0]
+        return end - size, end
+
+    def _first_number(self):
+        # Continue after ids already in the table, e.g. entered by hand before the allocator existed.
+        # Ids are zero-padded to a fixed width, so the greatest one sorts last in the unique index
+        from .models import Application
+
+        last = Application.objects.using(self.using).filter(
+            application_id__startswith=f'{self.prefix}-',
+            application_id__regex=rf'^{re.escape(self.prefix)}-[0-9]{{{self.width}}}$',
+        ).order_by('-application_id').values_list('application_id', flat=True).first()
+        return int(last[len(self.prefix) + 1:]) + 1 if last else 1
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                _allocator = ApplicationIdAllocator()
+    return _allocator
+
+
+def allocate_application_id():
+    return get_allocator().allocate()
+
+
+def allocate_application_ids(count):
+    return get_allocator().allocate_many(count)
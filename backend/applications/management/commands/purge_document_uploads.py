@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from applications.uploads import expire_uploads, purge_stored_files
+
+class Command(BaseCommand):
+    help = ('Delete document uploads left unfinished for longer than DOCUMENT_UPLOADS["EXPIRE_AFTER"], with their '
+            'partial files, and stored document content that no document references any more')
+    
+    def handle(self, *args, **options):
+        expired = expire_uploads()
+        removed = purge_stored_files()
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {expired} abandoned uploads and {removed} unreferenced stored files'
+        ))
@@ -0,0 +1,111 @@
+import threading
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from applications.ids import ApplicationIdAllocator, get_application_id_setting
+from applications.models import Application
+from students.models import Student
+from universities.models import University
+
+class CountingAllocator(ApplicationIdAllocator):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reservations = 0
+
+    def reserve(self, size):
+        self.reservations += 1
+        return super().reserve(size)
+
+class Command(BaseCommand):
+    help = ('Optional load test against the configured database (the test suite covers correctness): create '
+            'applications from many threads at once, each thread acting as a separate worker with its own id '
+            'allocator, and fail on any duplicate id or insert error. The rows are deleted afterwards')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent threads')
+        parser.add_argument('--per-worker', type=int, default=250, help='Applications each worker creates')
+        parser.add_argument('--block-size', type=int, default=get_application_id_setting('BLOCK_SIZE'))
+        parser.add_argument('--shared', action='store_true',
+                            help='Share one allocator between the threads, like the threads of one process')
+        parser.add_argument('--keep', action='store_true', help='Keep the created rows')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['per_worker'] < 1:
+            raise CommandError('--workers and --per-worker must be at least 1')
+        student, university = self._fixtures()
+        shared = CountingAllocator(block_size=options['block_size'])
+        allocators = [shared if options['shared'] else CountingAllocator(block_size=options['block_size'])
+                      for _ in range(options['workers'])]
+        results = [None] * options['workers']
+        barrier = threading.Barrier(options['workers'])
+
+        def work(index):
+            created, errors = [], []
+            barrier.wait()
+            try:
+                for _ in range(options['per_worker']):
+                    application = Application(
+                        application_id=allocators[index].allocate(), student=student, university=university,
+                        program='Allocator stress test', level='master', intake='Fall',
+                        application_date=date.today(), application_fee='$0',
+                    )
+                    try:
+                        application.save()
+                        created.append(application.application_id)
+                    except DatabaseError as exc:
+                        errors.append(f'{application.application_id}: {exc}')
+            finally:
+                connection.close()
+            results[index] = (created, errors)
+
+        threads = [threading.Thread(target=work, args=(index,)) for index in range(options['workers'])]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            self._report(results, allocators, elapsed, options)
+        finally:
+            if not options['keep']:
+                student.delete()
+                university.delete()
+
+    def _report(self, results, allocators, elapsed, options):
+        ids = [application_id for created, errors in results for application_id in created]
+        errors = [error for created, worker_errors in results for error in worker_errors]
+        expected = options['workers'] * options['per_worker']
+        reservations = sum(allocator.reservations for allocator in set(allocators))
+        self.stdout.write(f'{len(ids)} of {expected} applications created by {options["workers"]} workers in '
+                          f'{elapsed:.2f}s ({len(ids) / elapsed:.0f}/s)')
+        self.stdout.write(f'{reservations} block reservations for {len(ids)} ids '
+                          f'({len(ids) / max(reservations, 1):.1f} ids per round trip)')
+
+        problems = errors[:20]
+        if len(set(ids)) != len(ids):
+            problems.append(f'{len(ids) - len(set(ids))} duplicate ids handed out')
+        if any(created != sorted(created) for created, _ in results):
+            problems.append('ids allocated out of order within a worker')
+        if len(ids) != expected:
+            problems.append(f'{expected - len(ids)} applications were not created')
+        if problems:
+            raise CommandError('Allocator problems:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('Every id was unique and every insert succeeded'))
+
+    def _fixtures(self):
+        suffix = time.strftime('%Y%m%d%H%M%S')
+        university = University.objects.create(
+            name=f'Allocator Stress University {suffix}', country='Canada', city='Toronto',
+            website='https://example.com', type='public', established_year=1900, ranking=1, world_ranking=1,
+            acceptance_rate=50, tuition_fee_range='$0', application_fee='$0',
+        )
+        student = Student.objects.create(
+            first_name='Allocator', last_name='Stress', email=f'allocator-stress-{suffix}@example.com',
+            phone='0000000000', date_of_birth=date(2000, 1, 1), gender='other', address='Allocator stress test',
+            current_education='bachelor', field_of_study='Computer Science', institution='Allocator Stress College',
+            gpa='3.5/4', graduation_year=2022, preferred_country='Canada', intended_program='master',
+            preferred_field='Computer Science', intake_year='2025',
+        )
+        return student, university
@@ -1,9 +1,12 @@
+import uuid
 from django.db import models
 from django.conf import settings
 from students.models import Student
 from universities.models import University
+from study_abroad_crm.numeric import MoneyColumns, NumericColumnsMixin
+from .ids import allocate_application_id
 
-class Application(models.Model):
+class Application(NumericColumnsMixin, models.Model):
     STATUS_CHOICES = [
         ('inquiry_received', 'Inquiry Received'),
         ('document_review', 'Document Review'),
@@ -24,7 +27,7 @@ class Application(models.Model):
     ]
     
     # Basic Information
-    application_id = models.CharField(max_length=20, unique=True)
+    application_id = models.CharField(max_length=20, unique=True, editable=False)
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='applications')
     university = models.ForeignKey(University, on_delete=models.CASCADE)
     program = models.CharField(max_length=200)
@@ -45,20 +48,57 @@ class Application(models.Model):
     # Financial
     application_fee = models.CharField(max_length=50)
     
+    application_fee_min = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                              editable=False, db_index=True)
+    application_fee_max = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                              editable=False, db_index=True)
+    application_fee_currency = models.CharField(max_length=3, blank=True, null=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='app_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='app_status_created_idx'),
+            models.Index(fields=['student', 'created_at'], name='app_student_created_idx'),
+        ]
+    
+    numeric_columns = [MoneyColumns('application_fee', 'application_fee')]
     
     def __str__(self):
         return f"{self.application_id} - {self.student.full_name} to {self.university.name}"
     
+    def save(self, *args, **kwargs):
+        # bulk_create skips save(); callers using it fill in applications.ids.allocate_application_ids()
+        if not self.application_id:
+            self.application_id = allocate_application_id()
+        super().save(*args, **kwargs)
+    
     @property
     def progress_percentage(self):
         return round((self.current_step / self.total_steps) * 100, 2)
 
+class ApplicationIdSequence(models.Model):
+    """Next unreserved application_id number of each prefix, handed out in blocks by applications.ids."""
+    prefix = models.CharField(max_length=10, unique=True)
+    next_value = models.BigIntegerField(default=1)
+    
+    def __str__(self):
+        return f"{self.prefix}: {self.next_value}"
+
+class StoredFile(models.Model):
+    """Document content stored once under its SHA-256 and shared by every document with it (see applications.uploads)."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    file = models.FileField(upload_to='application_documents/')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.sha256} ({self.size} bytes)"
+
 class ApplicationDocument(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -83,6 +123,10 @@ class ApplicationDocument(models.Model):
     upload_date = models.DateTimeField(blank=True, null=True)
     comments = models.TextField(blank=True, null=True)
     file = models.FileField(upload_to='application_documents/', blank=True, null=True)
+    # Set for files uploaded through DocumentUpload; ``file`` then names the shared content
+    stored_file = models.ForeignKey(StoredFile, on_delete=models.PROTECT, null=True, blank=True,
+                                    related_name='documents')
+    filename = models.CharField(max_length=255, blank=True, null=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -93,6 +137,38 @@ class ApplicationDocument(models.Model):
     def __str__(self):
         return f"{self.name} - {self.application.application_id}"
 
+class DocumentUpload(models.Model):
+    """A chunked, resumable upload of an application document in progress (see applications.uploads)."""
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='uploads')
+    # The document the upload replaces, or the one it created once complete
+    document = models.ForeignKey(ApplicationDocument, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='uploads')
+    name = models.CharField(max_length=200)
+    document_type = models.CharField(max_length=20, choices=ApplicationDocument.TYPE_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Expected SHA-256, checked on completion")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size}) - {self.application.application_id}"
+
 class ApplicationTimeline(models.Model):
     application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='timeline')
     status = models.CharField(max_length=50)
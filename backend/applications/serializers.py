@@ -0,0 +1,96 @@
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+from students.views import scoped_students
+from .models import Application, ApplicationDocument, ApplicationTimeline, DocumentUpload
+from .transitions import MAX_BULK_TRANSITIONS, allowed_transitions
+
+class ApplicationDocumentSerializer(serializers.ModelSerializer):
+    # Files are only served through the permission-checked download endpoint
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ApplicationDocument
+        fields = ['id', 'name', 'document_type', 'status', 'upload_date', 'comments', 'filename', 
+                 'download_url', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'filename', 'created_at', 'updated_at']
+    
+    def get_download_url(self, obj):
+        if not obj.file:
+            return None
+        return reverse('document_download', kwargs={'pk': obj.pk}, request=self.context.get('request'))
+
+class ApplicationTimelineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ApplicationTimeline
+        fields = ['id', 'status', 'description', 'date', 'completed', 'is_current']
+        read_only_fields = fields
+
+class ApplicationSerializer(serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.full_name', read_only=True)
+    counselor_name = serializers.CharField(source='student.assigned_counselor.full_name', read_only=True,
+                                           default=None)
+    university_name = serializers.CharField(source='university.name', read_only=True)
+    university_country = serializers.CharField(source='university.country', read_only=True)
+    # Annotated in SQL by with_progress() so the list can filter and order on it
+    progress = serializers.FloatField(read_only=True)
+    documents = ApplicationDocumentSerializer(many=True, read_only=True)
+    timeline = ApplicationTimelineSerializer(many=True, read_only=True)
+    allowed_transitions = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Application
+        fields = ['id', 'application_id', 'student', 'student_name', 'counselor_name', 'university', 
+                 'university_name', 'university_country', 'program', 'level', 'intake', 'status', 
+                 'priority', 'current_step', 'total_steps', 'progress', 'application_date', 
+                 'estimated_decision', 'last_update', 'application_fee', 'documents', 'timeline', 
+                 'allowed_transitions', 'created_at', 'updated_at']
+        read_only_fields = fields
+    
+    def get_allowed_transitions(self, obj):
+        return allowed_transitions(obj.status)
+
+class ApplicationCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Application
+        fields = ['id', 'application_id', 'student', 'university', 'program', 'level', 'intake', 'status', 
+                 'priority', 'current_step', 'total_steps', 'application_date', 'estimated_decision', 
+                 'application_fee', 'created_at', 'updated_at']
+        # Status and step only move through the transition endpoints (see applications.transitions)
+        read_only_fields = ['id', 'status', 'current_step', 'created_at', 'updated_at']
+    
+    def validate_student(self, value):
+        if not scoped_students(self.context['request'].user).filter(pk=value.pk).exists():
+            raise serializers.ValidationError('Student not found.')
+        return value
+    
+    def validate(self, attrs):
+        current_step = attrs.get('current_step', getattr(self.instance, 'current_step', 1))
+        total_steps = attrs.get('total_steps', getattr(self.instance, 'total_steps', 8))
+        if total_steps < 1:
+            raise serializers.ValidationError({'total_steps': 'Must be at least 1.'})
+        if not 0 <= current_step <= total_steps:
+            raise serializers.ValidationError({'current_step': f'Must be between 0 and {total_steps}.'})
+        return attrs
+
+class TransitionSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Application.STATUS_CHOICES)
+    note = serializers.CharField(required=False, allow_blank=True, default='')
+
+class BulkTransitionSerializer(TransitionSerializer):
+    applications = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False,
+                                         max_length=MAX_BULK_TRANSITIONS)
+
+class DocumentUploadSerializer(serializers.ModelSerializer):
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True)
+    
+    class Meta:
+        model = DocumentUpload
+        fields = ['id', 'application', 'document', 'name', 'document_type', 'filename', 'size', 'offset', 
+                 'sha256', 'status', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'application', 'offset', 'status', 'created_at', 'updated_at']
+        extra_kwargs = {'size': {'min_value': 1}}
+    
+    def validate_document(self, value):
+        if value is not None and value.application_id != self.context['application'].pk:
+            raise serializers.ValidationError('Document not found.')
+        return value
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Application, ApplicationDocument, ApplicationTimeline
+
+@receiver(post_save, sender=ApplicationDocument)
+@receiver(post_delete, sender=ApplicationDocument)
+@receiver(post_save, sender=ApplicationTimeline)
+@receiver(post_delete, sender=ApplicationTimeline)
+def touch_application(sender, instance, raw=False, **kwargs):
+    # The application payload embeds documents and timeline, so its ETag must change with them. Runs in the
+    # caller's transaction; bulk writes skip it and bump updated_at themselves (see applications.transitions)
+    if raw:
+        return
+    Application.objects.filter(pk=instance.application_id).update(updated_at=timezone.now())
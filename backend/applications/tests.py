@@ -0,0 +1,455 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection, transaction
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from students.models import Student
+from universities.models import University
+
+from . import views
+from .ids import ApplicationIdAllocator
+from .models import (Application, ApplicationDocument, ApplicationIdSequence, ApplicationTimeline, DocumentUpload,
+                     StoredFile)
+from .serializers import ApplicationSerializer
+from .uploads import UploadError, abort_upload, partial_path, purge_stored_files, write_chunk
+
+# Queries each path may issue, whatever the number of rows: the page with student, counselor and
+# university joined in (preceded by the validators on the detail), then one each for documents and timeline
+BUDGETS = {
+    'list': 3,
+    'list by progress': 3,
+    'detail': 4,
+    'serialize all rows': 3,
+}
+SIZES = [10, 100, 1000]
+DOCUMENTS_PER_APPLICATION = 3
+TIMELINE_PER_APPLICATION = 4
+
+
+def seed_applications(counselor, size):
+    students = Student.objects.bulk_create([
+        Student(first_name='Query', last_name=f'Check {index}', email=f'query-check-{size}-{index}@example.com',
+                phone='0000000000', address='Query Check', date_of_birth=date(2000, 1, 1), gender='other',
+                current_education='bachelor', field_of_study='Computer Science', institution='Query Check College',
+                gpa='3.5/4', graduation_year=2022, preferred_country='Canada', intended_program='master',
+                preferred_field='Computer Science', intake_year='2025', assigned_counselor=counselor)
+        for index in range(max(size // 10, 1))
+    ])
+    universities = University.objects.bulk_create([
+        University(name=f'Query Check University {size}-{index}', country='Canada', city='Toronto',
+                   website='https://example.com', type='public', established_year=1900, ranking=index + 1,
+                   world_ranking=index + 1, acceptance_rate=50, tuition_fee_range='$20,000', application_fee='$100')
+        for index in range(max(size // 20, 1))
+    ])
+    # bulk_create skips save(), so the ids are set here rather than allocated
+    applications = Application.objects.bulk_create([
+        Application(application_id=f'QC-{size}-{index:06d}', student=students[index % len(students)],
+                    university=universities[index % len(universities)], program='Computer Science',
+                    level='master', intake='Fall', current_step=index % 9, total_steps=8,
+                    application_date=date.today() - timedelta(days=index % 30), application_fee='$100')
+        for index in range(size)
+    ])
+    now = timezone.now()
+    ApplicationDocument.objects.bulk_create([
+        ApplicationDocument(application=application, name=f'Document {index}', document_type='academic')
+        for application in applications for index in range(DOCUMENTS_PER_APPLICATION)
+    ])
+    ApplicationTimeline.objects.bulk_create([
+        ApplicationTimeline(application=application, status=f'Step {index}', description='Query check',
+                            date=now + timedelta(minutes=index), completed=True)
+        for application in applications for index in range(TIMELINE_PER_APPLICATION)
+    ])
+
+
+class ApplicationQueryBudgetTests(APITestCase):
+    """The list and detail endpoints stay within a fixed query budget at 10, 100 and 1000 applications."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counselor = get_user_model().objects.create_user(
+            username='counselor', email='counselor@example.com', password='pw', role='counselor',
+            first_name='Query', last_name='Check',
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.counselor)
+
+    def test_query_budgets(self):
+        for size in SIZES:
+            with self.subTest(size=size), transaction.atomic():
+                seed_applications(self.counselor, size)
+                self._check_budgets(size)
+                transaction.set_rollback(True)
+
+    def _check_budgets(self, size):
+        first = Application.objects.order_by('id').first()
+        requests = [
+            ('list', '/api/applications/', {'page_size': 100}),
+            ('list by progress', '/api/applications/', {'page_size': 100, 'ordering': '-progress', 'progress_min': 25}),
+            ('detail', f'/api/applications/{first.pk}/', {}),
+        ]
+        for label, path, params in requests:
+            with self.assertNumQueries(BUDGETS[label]):
+                response = self.client.get(path, params)
+            self.assertEqual(response.status_code, 200, label)
+
+        response = self.client.get('/api/applications/', {'page_size': 100})
+        self.assertEqual(len(response.data['results']), min(size, 100))
+        self.assertEqual(len(response.data['results'][0]['documents']), DOCUMENTS_PER_APPLICATION)
+        self.assertEqual(len(response.data['results'][0]['timeline']), TIMELINE_PER_APPLICATION)
+
+        with self.assertNumQueries(BUDGETS['serialize all rows']):
+            data = ApplicationSerializer(views.application_read_queryset(self.counselor), many=True).data
+        self.assertEqual(len(data), size)
+
+    def test_progress_is_computed_in_sql(self):
+        seed_applications(self.counselor, 10)
+        response = self.client.get('/api/applications/', {'ordering': '-progress'})
+        progress = [row['progress'] for row in response.data['results']]
+        self.assertEqual(progress, sorted(progress, reverse=True))
+        self.assertEqual(progress[0], 100.0)
+
+
+def make_application(counselor, index=0):
+    student = Student.objects.create(
+        first_name='Upload', last_name=f'Check {index}', email=f'upload-check-{index}@example.com',
+        phone='0000000000', date_of_birth=date(2000, 1, 1), gender='other', address='Upload Check',
+        current_education='bachelor', field_of_study='Computer Science', institution='Upload Check College',
+        gpa='3.5/4', graduation_year=2022, preferred_country='Canada', intended_program='master',
+        preferred_field='Computer Science', intake_year='2025', assigned_counselor=counselor,
+    )
+    university = University.objects.create(
+        name=f'Upload Check University {index}', country='Canada', city='Toronto', website='https://example.com',
+        type='public', established_year=1900, ranking=1, world_ranking=1, acceptance_rate=50,
+        tuition_fee_range='$20,000', application_fee='$100',
+    )
+    return Application.objects.create(student=student, university=university, program='Computer Science',
+                                      level='master', intake='Fall', application_date=date.today(),
+                                      application_fee='$100')
+
+
+class UploadTestCase(APITestCase):
+    """Runs with MEDIA_ROOT and the upload temp dir in a scratch directory."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counselor = get_user_model().objects.create_user(
+            username='counselor', email='counselor@example.com', password='pw', role='counselor',
+        )
+        cls.application = make_application(cls.counselor)
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        overrides = self.settings(MEDIA_ROOT=media, DOCUMENT_UPLOADS={'TEMP_DIR': f'{media}/partial',
+                                                                      'MAX_CHUNK_SIZE': 1024})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client.force_authenticate(self.counselor)
+
+    def start(self, content, **fields):
+        data = {'name': 'Transcript', 'document_type': 'academic', 'filename': 'transcript.pdf',
+                'size': len(content), **fields}
+        response = self.client.post(f'/api/applications/{self.application.pk}/uploads/', data)
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def put(self, upload_id, offset, chunk):
+        return self.client.put(f'/api/applications/uploads/{upload_id}/', chunk,
+                               content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def upload(self, content, **fields):
+        upload_id = self.start(content, **fields)
+        response = self.put(upload_id, 0, content)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+
+class ApplicationConditionalGetTests(UploadTestCase):
+    """Validators change with the documents and timeline the payload embeds."""
+
+    def test_completed_upload_changes_detail_etag(self):
+        path = f'/api/applications/{self.application.pk}/'
+        etag = self.client.get(path)['ETag']
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.upload(b'transcript')
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([document['name'] for document in response.data['documents']], ['Transcript'])
+
+    def test_completed_upload_changes_list_etag(self):
+        etag = self.client.get('/api/applications/')['ETag']
+        self.upload(b'transcript')
+        response = self.client.get('/api/applications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results'][0]['documents']), 1)
+
+    def test_list_304_skips_the_prefetches(self):
+        etag = self.client.get('/api/applications/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/applications/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_document_change_changes_detail_etag(self):
+        document = ApplicationDocument.objects.create(application=self.application, name='Essay',
+                                                      document_type='essay')
+        path = f'/api/applications/{self.application.pk}/'
+        etag = self.client.get(path)['ETag']
+        document.status = 'approved'
+        document.save()
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(path)['ETag']
+        document.delete()
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class DocumentUploadTests(UploadTestCase):
+    content = bytes(range(256)) * 10
+
+    def test_chunks_resume_from_the_reported_offset(self):
+        upload_id = self.start(self.content)
+        self.assertEqual(self.put(upload_id, 0, self.content[:1024]).status_code, 200)
+        response = self.client.get(f'/api/applications/uploads/{upload_id}/')
+        self.assertEqual(response.data['offset'], 1024)
+        self.assertEqual(self.put(upload_id, 1024, self.content[1024:2048]).data['status'], 'uploading')
+        response = self.put(upload_id, 2048, self.content[2048:])
+        self.assertEqual(response.data['status'], 'complete')
+        document = ApplicationDocument.objects.get(pk=response.data['document'])
+        with default_storage.open(document.file.name) as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertEqual(document.stored_file.size, len(self.content))
+
+    def test_cut_short_chunk_resumes_from_what_arrived(self):
+        upload_id = self.start(self.content)
+        upload = write_chunk(DocumentUpload.objects.all(), upload_id, 0, io.BytesIO(self.content[:300]), 1024)
+        self.assertEqual(upload.offset, 300)
+        self.assertEqual(self.put(upload_id, 300, self.content[300:1324]).status_code, 200)
+        self.assertEqual(self.put(upload_id, 1324, self.content[1324:2348]).status_code, 200)
+        self.assertEqual(self.put(upload_id, 2348, self.content[2348:]).data['status'], 'complete')
+
+    def test_chunk_at_the_wrong_offset_is_a_conflict(self):
+        upload_id = self.start(self.content)
+        self.put(upload_id, 0, self.content[:1024])
+        response = self.put(upload_id, 0, self.content[:1024])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '1024')
+        self.assertEqual(response.data['offset'], 1024)
+        self.assertEqual(DocumentUpload.objects.get(pk=upload_id).offset, 1024)
+
+    def test_checksum_mismatch_restarts_the_upload(self):
+        upload_id = self.start(b'transcript', sha256='0' * 64)
+        self.assertEqual(self.put(upload_id, 0, b'transcript').status_code, 400)
+        self.assertEqual(DocumentUpload.objects.get(pk=upload_id).offset, 0)
+        self.assertFalse(ApplicationDocument.objects.exists())
+
+    def test_same_content_is_stored_once(self):
+        first = self.upload(self.content[:1000])
+        second = self.upload(self.content[:1000], name='Transcript copy')
+        self.assertNotEqual(first['document'], second['document'])
+        self.assertEqual(StoredFile.objects.count(), 1)
+        self.assertEqual(ApplicationDocument.objects.filter(stored_file=StoredFile.objects.get()).count(), 2)
+
+    def test_abort_removes_the_upload_and_its_partial_file(self):
+        upload_id = self.start(self.content)
+        self.put(upload_id, 0, self.content[:1024])
+        upload = DocumentUpload.objects.get(pk=upload_id)
+        self.assertTrue(os.path.exists(partial_path(upload)))
+        self.assertEqual(self.client.delete(f'/api/applications/uploads/{upload_id}/').status_code, 204)
+        self.assertFalse(DocumentUpload.objects.filter(pk=upload_id).exists())
+        self.assertFalse(os.path.exists(partial_path(upload)))
+
+    def test_completed_upload_cannot_be_aborted(self):
+        upload_id = self.upload(b'transcript')['id']
+        self.assertEqual(self.client.delete(f'/api/applications/uploads/{upload_id}/').status_code, 400)
+        with self.assertRaises(UploadError):
+            abort_upload(DocumentUpload.objects.get(pk=upload_id))
+
+    def test_purge_removes_only_unreferenced_content(self):
+        first = self.upload(b'transcript')
+        second = self.upload(b'transcript', name='Transcript copy')
+        stored = StoredFile.objects.get()
+        ApplicationDocument.objects.filter(pk=first['document']).delete()
+        self.assertEqual(purge_stored_files(), 0)
+        self.assertTrue(default_storage.exists(stored.file.name))
+
+        ApplicationDocument.objects.filter(pk=second['document']).delete()
+        self.assertEqual(purge_stored_files(), 1)
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertFalse(default_storage.exists(stored.file.name))
+
+        # Content uploaded again after a purge is stored afresh
+        document = ApplicationDocument.objects.get(pk=self.upload(b'transcript')['document'])
+        with default_storage.open(document.file.name) as content:
+            self.assertEqual(content.read(), b'transcript')
+
+
+class DocumentDownloadTests(UploadTestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.document = ApplicationDocument.objects.get(pk=self.upload(self.content)['document'])
+        self.url = f'/api/applications/documents/{self.document.pk}/download/'
+        self.etag = f'"{self.document.stored_file.sha256}"'
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+
+    def test_single_range(self):
+        for header, expected, content_range in [('bytes=2-5', self.content[2:6], 'bytes 2-5/1024'),
+                                                ('bytes=1000-', self.content[1000:], 'bytes 1000-1023/1024'),
+                                                ('bytes=-3', self.content[-3:], 'bytes 1021-1023/1024')]:
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(expected)))
+                self.assertEqual(self.body(response), expected)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1024-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_several_ranges_get_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MATCH='"other"').status_code, 412)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MATCH=self.etag).status_code, 200)
+
+    def test_stream_mode(self):
+        with self.settings(PROTECTED_DOWNLOADS={'MODE': 'stream', 'CHUNK_SIZE': 100}):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Length'], '1024')
+            self.assertEqual(self.body(response), self.content)
+            response = self.client.get(self.url, HTTP_RANGE='bytes=150-349')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(self.body(response), self.content[150:350])
+
+    def test_x_accel_redirect_mode(self):
+        with self.settings(PROTECTED_DOWNLOADS={'MODE': 'x-accel-redirect'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.document.file.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_documents_outside_the_users_scope_are_not_found(self):
+        other = get_user_model().objects.create_user(username='other', email='other@example.com', password='pw',
+                                                     role='counselor')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class ApplicationIdAllocatorTests(TransactionTestCase):
+    """Allocators in concurrent workers never hand out the same id."""
+
+    def test_parallel_allocators_hand_out_unique_ordered_ids(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Shared-cache in-memory SQLite fails concurrent writers instead of making them wait')
+        workers, per_worker = 8, 100
+        # One allocator per thread, as in separate processes, with blocks small enough to contend
+        allocators = [ApplicationIdAllocator(prefix='TST', block_size=7) for _ in range(workers)]
+        results = [None] * workers
+        errors = []
+        barrier = threading.Barrier(workers)
+
+        def work(index):
+            try:
+                barrier.wait()
+                results[index] = [allocators[index].allocate() for _ in range(per_worker)]
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(index,)) for index in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        ids = [application_id for worker_ids in results for application_id in worker_ids]
+        self.assertEqual(len(ids), workers * per_worker)
+        self.assertEqual(len(set(ids)), len(ids))
+        for worker_ids in results:
+            self.assertEqual(worker_ids, sorted(worker_ids))
+        self.assertTrue(all(application_id.startswith('TST-') for application_id in ids))
+
+    def test_allocate_many_spans_blocks(self):
+        allocator = ApplicationIdAllocator(prefix='TST', block_size=5)
+        ids = allocator.allocate_many(12)
+        self.assertEqual(ids, [f'TST-{number:07d}' for number in range(1, 13)])
+        self.assertEqual(allocator.allocate(), 'TST-0000013')
+
+    def test_numbering_continues_after_existing_ids(self):
+        student = Student.objects.create(
+            first_name='Id', last_name='Check', email='id-check@example.com', phone='0000000000',
+            date_of_birth=date(2000, 1, 1), gender='other', address='Id Check', current_education='bachelor',
+            field_of_study='Computer Science', institution='Id Check College', gpa='3.5/4', graduation_year=2022,
+            preferred_country='Canada', intended_program='master', preferred_field='Computer Science',
+            intake_year='2025',
+        )
+        university = University.objects.create(
+            name='Id Check University', country='Canada', city='Toronto', website='https://example.com',
+            type='public', established_year=1900, ranking=1, world_ranking=1, acceptance_rate=50,
+            tuition_fee_range='$20,000', application_fee='$100',
+        )
+        # Ids of another shape, e.g. entered by hand, are skipped; 'TST-ABCDEFG' sorts after every number
+        Application.objects.bulk_create([Application(
+            application_id=application_id, student=student, university=university, program='Computer Science',
+            level='master', intake='Fall', application_date=date.today(), application_fee='$100',
+        ) for application_id in ['TST-0000500', 'TST-0000499', 'TST-99', 'TST-ABCDEFG', 'TSTX-0000900']])
+        self.assertEqual(ApplicationIdAllocator(prefix='TST').allocate(), 'TST-0000501')
+
+    def test_losing_the_race_to_create_the_sequence_retries(self):
+        allocator = ApplicationIdAllocator(prefix='TST', block_size=3)
+        reserve = allocator._reserve
+        attempts = []
+
+        def lose_first_race(connection, cursor, size):
+            # As if another process had created the row between the UPDATE and the INSERT
+            numbers = reserve(connection, cursor, size)
+            attempts.append(numbers)
+            if len(attempts) == 1:
+                raise IntegrityError('Duplicate prefix')
+            return numbers
+
+        with mock.patch.object(allocator, '_reserve', side_effect=lose_first_race), transaction.atomic():
+            self.assertEqual(allocator.allocate_many(3), ['TST-0000001', 'TST-0000002', 'TST-0000003'])
+            # The caller's transaction is still usable
+            self.assertEqual(Application.objects.count(), 0)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(ApplicationIdSequence.objects.get(prefix='TST').next_value, 4)
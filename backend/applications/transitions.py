@@ -0,0 +1,166 @@
+"""
+Application status transitions.
+
+transition_applications() moves any number of applications to a new status
+in one transaction, with a fixed number of queries whatever the batch size:
+
+- the applications, then their students, are locked with SELECT ... FOR
+  UPDATE in primary key order, so concurrent transitions queue instead of
+  interleaving or deadlocking
+- every requested move is checked against TRANSITIONS; one invalid move
+  rejects the whole batch
+- one UPDATE sets the status, ``current_step`` and timestamps, one UPDATE
+  closes the current timeline rows (``is_current=False, completed=True``) and
+  one bulk INSERT appends the new current rows
+- each student's status is rederived from all of their applications (see
+  student_status()) with one UPDATE per resulting status, and the
+  StudentStatusCount counters are adjusted by the same deltas, since
+  QuerySet.update() skips the signals that usually maintain them
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from students.models import Student, StudentStatusCount
+
+from .models import Application, ApplicationTimeline
+
+# The main pipeline, in order; a status's position is its step (capped at the application's total_steps)
+PIPELINE = [
+    'inquiry_received', 'document_review', 'application_submitted', 'university_review', 'decision_received',
+    'visa_processing', 'visa_approved', 'enrolled',
+]
+FINAL_STATUSES = {'enrolled', 'rejected', 'withdrawn'}
+TRANSITIONS = {
+    'inquiry_received': {'document_review', 'withdrawn'},
+    'document_review': {'application_submitted', 'withdrawn'},
+    'application_submitted': {'university_review', 'rejected', 'withdrawn'},
+    'university_review': {'decision_received', 'rejected', 'withdrawn'},
+    'decision_received': {'visa_processing', 'rejected', 'withdrawn'},
+    'visa_processing': {'visa_approved', 'rejected', 'withdrawn'},
+    'visa_approved': {'enrolled', 'withdrawn'},
+    'enrolled': set(),
+    'rejected': set(),
+    'withdrawn': set(),
+}
+LABELS = dict(Application.STATUS_CHOICES)
+MAX_BULK_TRANSITIONS = 500
+
+# Student.status that each application status implies, and how far along each of those is
+STUDENT_STATUSES = {
+    'inquiry_received': 'inquiry',
+    'document_review': 'document_review',
+    'application_submitted': 'applied',
+    'university_review': 'applied',
+    'decision_received': 'applied',
+    'visa_processing': 'applied',
+    'visa_approved': 'visa_approved',
+    'enrolled': 'enrolled',
+    'rejected': 'rejected',
+    'withdrawn': 'withdrawn',
+}
+STUDENT_STATUS_RANK = ['withdrawn', 'rejected', 'inquiry', 'document_review', 'applied', 'visa_approved', 'enrolled']
+
+
+class TransitionError(ValueError):
+    """Raised with ``errors``, a {application id: message} dict, when any requested move is not allowed."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(f'{pk}: {message}' for pk, message in errors.items()))
+        self.errors = errors
+
+
+def allowed_transitions(status):
+    return sorted(TRANSITIONS.get(status, ()))
+
+
+def student_status(application_statuses):
+    """The status of the student's most advanced application, or None without applications."""
+    statuses = [STUDENT_STATUSES[status] for status in application_statuses]
+    return max(statuses, key=STUDENT_STATUS_RANK.index, default=None)
+
+
+def transition_applications(applications, application_ids, status, note=''):
+    """
+    Move the applications ``application_ids`` to ``status`` and return how
+    many were moved. ``applications`` is the queryset the ids are looked up
+    in, e.g. the user's scoped applications. Raises TransitionError, and
+    changes nothing, if any of them is missing or cannot move to ``status``
+    from where it is.
+    """
+    application_ids = sorted(set(application_ids))
+    with transaction.atomic():
+        rows = list(applications.select_for_update().filter(pk__in=application_ids).order_by('pk').values(
+            'pk', 'status', 'student_id'
+        ))
+        errors = {pk: 'Application not found.' for pk in set(application_ids) - {row['pk'] for row in rows}}
+        for row in rows:
+            if status not in TRANSITIONS.get(row['status'], ()):
+                allowed = ', '.join(allowed_transitions(row['status'])) or 'none'
+                errors[row['pk']] = f'Cannot move from {row["status"]} to {status} (allowed: {allowed}).'
+        if errors:
+            raise TransitionError(dict(sorted(errors.items())))
+        if not rows:
+            return 0
+
+        now = timezone.now()
+        changes = {'status': status, 'last_update': now, 'updated_at': now}
+        if status == 'enrolled':
+            changes['current_step'] = F('total_steps')
+        elif status in PIPELINE:
+            changes['current_step'] = Least(Value(PIPELINE.index(status) + 1), F('total_steps'))
+        Application.objects.filter(pk__in=application_ids).update(**changes)
+
+        ApplicationTimeline.objects.filter(application__in=application_ids, is_current=True).update(
+            is_current=False, completed=True
+        )
+        ApplicationTimeline.objects.bulk_create([
+            ApplicationTimeline(application_id=pk, status=LABELS[status], description=note or LABELS[status],
+                                date=now, completed=status in FINAL_STATUSES, is_current=True)
+            for pk in application_ids
+        ])
+
+        sync_student_statuses({row['student_id'] for row in rows}, now)
+    return len(rows)
+
+
+def sync_student_statuses(student_ids, now=None):
+    """Rederive Student.status for ``student_ids`` from their applications; call inside a transaction."""
+    students = list(Student.objects.select_for_update().filter(pk__in=student_ids).order_by('pk').values_list(
+        'pk', 'assigned_counselor_id', 'status'
+    ))
+    application_statuses = {}
+    for student_id, application_status in Application.objects.filter(student__in=student_ids).values_list(
+        'student_id', 'status'
+    ):
+        application_statuses.setdefault(student_id, []).append(application_status)
+
+    moves = {}
+    deltas = Counter()
+    for pk, counselor_id, current in students:
+        derived = student_status(application_statuses.get(pk, []))
+        if derived is None or derived == current:
+            continue
+        moves.setdefault(derived, []).append(pk)
+        deltas[(counselor_id, current)] -= 1
+        deltas[(counselor_id, derived)] += 1
+
+    now = now or timezone.now()
+    for derived, pks in moves.items():
+        Student.objects.filter(pk__in=pks).update(status=derived, updated_at=now)
+    for (counselor_id, counted_status), delta in deltas.items():
+        if delta:
+            StudentStatusCount.adjust(counselor_id, counted_status, delta)
+
+
+def start_application(application):
+    """Open the timeline of a newly created ``application`` and bring its student's status in line."""
+    with transaction.atomic():
+        ApplicationTimeline.objects.create(
+            application=application, status=LABELS[application.status], description=LABELS[application.status],
+            date=application.created_at, completed=application.status in FINAL_STATUSES, is_current=True,
+        )
+        sync_student_statuses([application.student_id])
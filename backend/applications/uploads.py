@@ -0,0 +1,305 @@
+"""
+Chunked, resumable uploads of application documents.
+
+A client opens a DocumentUpload with the file's name and size, then PUTs
+the bytes in chunks of at most MAX_CHUNK_SIZE, each with an
+``Upload-Offset`` header saying where it starts. A chunk is streamed from
+the request to a spool file in TEMP_DIR in READ_SIZE reads, so a worker
+never holds more than one read of it in memory, and is then appended to
+the upload's partial file under the row lock. The offset stored after
+each chunk is the number of bytes on disk, so an interrupted upload resumes
+from the ``offset`` that GET returns, even when a chunk was cut short.
+
+The SHA-256 is updated as the bytes arrive. Each process keeps the hash
+state of the uploads it is receiving. When consecutive chunks land on
+different workers, the digest is instead computed from the partial file,
+one read at a time, when the upload completes.
+
+Completed files are content-addressed. Each distinct content is stored once
+at ``application_documents/sha256/<ab>/<cd>/<digest>`` (StoredFile) and
+shared by every ApplicationDocument that has it. purge_document_uploads
+removes abandoned uploads and content no document uses any more.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ApplicationDocument, DocumentUpload, StoredFile
+
+DEFAULTS = {
+    'TEMP_DIR': os.path.join(settings.BASE_DIR, 'partial_uploads'),
+    'MAX_FILE_SIZE': 200 * 1024 * 1024,
+    'MAX_CHUNK_SIZE': 8 * 1024 * 1024,
+    'EXPIRE_AFTER': timedelta(days=1),
+}
+READ_SIZE = 64 * 1024
+# Uploads whose hash state this process keeps; older ones are rehashed from disk on completion
+MAX_TRACKED_HASHES = 256
+
+
+def get_upload_setting(name):
+    return getattr(settings, 'DOCUMENT_UPLOADS', {}).get(name, DEFAULTS[name])
+
+
+class UploadError(ValueError):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    """The chunk does not start where the upload stands; ``offset`` is where it does."""
+
+    def __init__(self, offset):
+        super().__init__(f'The upload is at offset {offset}.')
+        self.offset = offset
+
+
+class HashStates:
+    """Per-process SHA-256 state of uploads in progress, keyed by upload id."""
+
+    def __init__(self, size):
+        self.size = size
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, upload_id, offset):
+        """The hash of the first ``offset`` bytes of the upload, if this process has it."""
+        with self._lock:
+            state = self._states.pop(upload_id, None)
+        if offset == 0:
+            return hashlib.sha256()
+        if state is not None and state[0] == offset:
+            return state[1]
+        return None
+
+    def put(self, upload_id, offset, sha):
+        with self._lock:
+            self._states[upload_id] = (offset, sha)
+            while len(self._states) > self.size:
+                self._states.popitem(last=False)
+
+
+_hashes = HashStates(MAX_TRACKED_HASHES)
+
+
+def partial_path(upload):
+    return os.path.join(get_upload_setting('TEMP_DIR'), f'{upload.pk}.part')
+
+
+def start_upload(application, user, **fields):
+    """Open a DocumentUpload of ``application`` and its empty partial file."""
+    if fields['size'] > get_upload_setting('MAX_FILE_SIZE'):
+        raise UploadError(f'Files may be at most {get_upload_setting("MAX_FILE_SIZE")} bytes.')
+    upload = DocumentUpload.objects.create(application=application, created_by=user, **fields)
+    os.makedirs(get_upload_setting('TEMP_DIR'), exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(uploads, upload_id, offset, stream, length):
+    """
+    Append ``length`` bytes read from ``stream`` at ``offset`` to the upload
+    ``upload_id``, looked up in ``uploads``, and complete it once every byte
+    is in. Returns the upload. An empty chunk at the end retries a
+    completion that failed.
+
+    The body is first spooled to a file of its own with no lock held, since
+    reading it takes as long as the client does. The row is only locked to
+    recheck the offset, copy the spool into the partial file and store the
+    new offset, so of two chunks sent for the same offset the second gets
+    OffsetMismatch.
+    """
+    if length < 0 or length > get_upload_setting('MAX_CHUNK_SIZE'):
+        raise UploadError(f'Chunks may be at most {get_upload_setting("MAX_CHUNK_SIZE")} bytes long.')
+    upload = uploads.get(pk=upload_id)
+    _check_chunk(upload, offset, length)
+    sha = _hashes.take(upload.pk, offset)
+    spool = f'{partial_path(upload)}.{uuid.uuid4().hex}'
+    try:
+        received = _receive(stream, length, spool, sha)
+        with transaction.atomic():
+            upload = uploads.select_for_update().get(pk=upload_id)
+            _check_chunk(upload, offset, length)
+            with open(partial_path(upload), 'r+b') as partial, open(spool, 'rb') as chunk:
+                partial.seek(offset)
+                shutil.copyfileobj(chunk, partial, READ_SIZE)
+                # Bytes past the new offset are leftovers of an earlier, interrupted attempt
+                partial.truncate()
+            upload.offset = offset + received
+            upload.save(update_fields=['offset', 'updated_at'])
+    finally:
+        os.remove(spool)
+    if sha is not None:
+        _hashes.put(upload.pk, upload.offset, sha)
+    if upload.offset == upload.size:
+        upload = finish_upload(upload)
+    return upload
+
+
+def _check_chunk(upload, offset, length):
+    if upload.status != 'uploading':
+        raise UploadError('The upload is already complete.')
+    if offset != upload.offset:
+        raise OffsetMismatch(upload.offset)
+    if offset + length > upload.size:
+        raise UploadError(f'The chunk ends past the declared size of {upload.size} bytes.')
+    if not length and offset != upload.size:
+        raise UploadError('The chunk is empty.')
+
+
+def _receive(stream, length, path, sha):
+    """Write up to ``length`` bytes of ``stream`` to ``path``; returns how many arrived."""
+    received = 0
+    with open(path, 'wb') as spool:
+        while received < length:
+            try:
+                data = stream.read(min(READ_SIZE, length - received))
+            except OSError:
+                # The client went away; what arrived is kept for the resume
+                break
+            if not data:
+                break
+            spool.write(data)
+            if sha is not None:
+                sha.update(data)
+            received += len(data)
+    return received
+
+
+def finish_upload(upload):
+    """
+    Store the completed upload's content and attach it to a new or the
+    replaced document; returns the upload. The row is locked again and
+    rechecked, so of concurrent completions of the same upload, e.g. an
+    empty retry racing the last chunk, only the first stores anything.
+    """
+    with transaction.atomic():
+        upload = DocumentUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != 'uploading' or upload.offset != upload.size:
+            return upload
+        path = partial_path(upload)
+        sha = _hashes.take(upload.pk, upload.size) or _hash_file(path)
+        digest = sha.hexdigest()
+        mismatch = upload.sha256 and upload.sha256.lower() != digest
+        if mismatch:
+            # Start over rather than store content the client did not mean to send
+            open(path, 'wb').close()
+            upload.offset = 0
+            upload.save(update_fields=['offset', 'updated_at'])
+        else:
+            stored = store_content(path, digest, upload.size)
+            document = upload.document or ApplicationDocument(application=upload.application)
+            document.name = upload.name
+            document.document_type = upload.document_type
+            document.filename = upload.filename
+            document.stored_file = stored
+            document.file = stored.file.name
+            document.upload_date = timezone.now()
+            document.status = 'pending'
+            document.save()
+
+            upload.document = document
+            upload.status = 'complete'
+            upload.save(update_fields=['document', 'status', 'updated_at'])
+    if mismatch:
+        # Raised after the commit, which keeps the reset
+        raise UploadError(f'The received file has SHA-256 {digest}, not {upload.sha256}.')
+    return upload
+
+
+def _hash_file(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as partial:
+        for block in iter(lambda: partial.read(READ_SIZE), b''):
+            sha.update(block)
+    return sha
+
+
+def content_name(digest):
+    return f'application_documents/sha256/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def store_content(path, digest, size):
+    """The StoredFile of ``digest``, moving the file at ``path`` into storage unless the content is already there."""
+    # Locked until the caller's transaction commits the document that uses it, so purge_stored_files(),
+    # which takes the same lock, cannot delete the content in between
+    stored = StoredFile.objects.select_for_update().filter(sha256=digest).first()
+    if stored is None:
+        name = content_name(digest)
+        if not default_storage.exists(name):
+            _move_to_storage(path, name)
+        try:
+            with transaction.atomic():
+                stored = StoredFile.objects.create(sha256=digest, size=size, file=name)
+        except IntegrityError:
+            # Stored by a concurrent upload of the same content
+            stored = StoredFile.objects.select_for_update().get(sha256=digest)
+    if os.path.exists(path):
+        os.remove(path)
+    return stored
+
+
+def _move_to_storage(path, name):
+    if isinstance(default_storage, FileSystemStorage):
+        # A rename when the temp dir is on the same filesystem as MEDIA_ROOT
+        target = default_storage.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        file_move_safe(path, target, allow_overwrite=True)
+    else:
+        with open(path, 'rb') as content:
+            default_storage.save(name, File(content))
+
+
+def abort_upload(upload):
+    """Delete the unfinished ``upload`` and its partial file; UploadError if it completed in the meantime."""
+    with transaction.atomic():
+        # The lock makes an abort wait for a completion in progress, and then refuse
+        upload = DocumentUpload.objects.select_for_update().filter(pk=upload.pk).first()
+        if upload is None:
+            return
+        if upload.status == 'complete':
+            raise UploadError('The upload is already complete.')
+        path = partial_path(upload)
+        upload.delete()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def expire_uploads(now=None):
+    """Delete uploads left unfinished for EXPIRE_AFTER, with their partial files; returns how many."""
+    cutoff = (now or timezone.now()) - get_upload_setting('EXPIRE_AFTER')
+    removed = 0
+    for upload in DocumentUpload.objects.filter(status='uploading', updated_at__lt=cutoff):
+        try:
+            abort_upload(upload)
+        except UploadError:
+            continue
+        removed += 1
+    return removed
+
+
+def purge_stored_files():
+    """Delete content that no document references any more; returns how many files were removed."""
+    removed = 0
+    for pk in StoredFile.objects.filter(documents__isnull=True).values_list('pk', flat=True):
+        with transaction.atomic():
+            # Under the lock store_content() takes, rechecked: an upload may have attached the content since
+            stored = StoredFile.objects.select_for_update().filter(pk=pk).first()
+            if stored is None or ApplicationDocument.objects.filter(stored_file=stored).exists():
+                continue
+            stored.delete()
+            # Before the commit releases the lock, so a store_content() waiting on it finds neither
+            # the row nor the file and stores the content afresh
+            default_storage.delete(stored.file.name)
+        removed += 1
+    return removed
@@ -1,5 +1,12 @@
 from django.urls import path
+from . import views
 
 urlpatterns = [
-    # Application URLs will be implemented
+    path('', views.ApplicationListCreateView.as_view(), name='application_list_create'),
+    path('transition/', views.application_bulk_transition, name='application_bulk_transition'),
+    path('<int:pk>/', views.ApplicationDetailView.as_view(), name='application_detail'),
+    path('<int:pk>/transition/', views.application_transition, name='application_transition'),
+    path('<int:pk>/uploads/', views.document_upload_start, name='document_upload_start'),
+    path('uploads/<uuid:upload_id>/', views.document_upload, name='document_upload'),
+    path('documents/<int:pk>/download/', views.document_download, name='document_download'),
 ]
@@ -0,0 +1,193 @@
+import os
+from rest_framework import generics, status
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.db.models import F, FloatField, Prefetch, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from django_filters.rest_framework import DjangoFilterBackend
+from study_abroad_crm.conditional import ConditionalGetMixin
+from study_abroad_crm.downloads import DownloadRenderer, file_response
+from study_abroad_crm.pagination import KeysetPagination
+from .filters import ApplicationFilter
+from .models import Application, ApplicationDocument, ApplicationTimeline, DocumentUpload
+from .serializers import (ApplicationSerializer, ApplicationCreateSerializer, TransitionSerializer,
+                          BulkTransitionSerializer, DocumentUploadSerializer)
+from .transitions import TransitionError, start_application, sync_student_statuses, transition_applications
+from .uploads import (OffsetMismatch, UploadError, abort_upload, get_upload_setting, start_upload,
+                      write_chunk)
+
+def scoped_applications(user):
+    if user.role == 'admin':
+        return Application.objects.all()
+    elif user.role in ['counselor', 'employee']:
+        return Application.objects.filter(student__assigned_counselor=user)
+    return Application.objects.none()
+
+def with_progress(queryset):
+    # Same value as Application.progress_percentage, computed in SQL so it can be filtered and
+    # ordered on; never NULL, as keyset pagination requires
+    progress = Cast('current_step', FloatField()) * 100 / NullIf(F('total_steps'), 0)
+    return queryset.annotate(progress=Coalesce(Round(progress, 2), Value(0.0), output_field=FloatField()))
+
+# Rows whose fields ApplicationSerializer renders by name, for the conditional GET validators
+APPLICATION_RELATED_MODIFIED = ('student__updated_at', 'student__assigned_counselor__updated_at',
+                                'university__updated_at')
+
+def application_read_queryset(user):
+    """Scoped applications with everything ApplicationSerializer renders: 3 queries for any number of rows."""
+    return with_progress(scoped_applications(user)).select_related(
+        'student__assigned_counselor', 'university'
+    ).prefetch_related(
+        Prefetch('documents', queryset=ApplicationDocument.objects.order_by('name', 'id')),
+        Prefetch('timeline', queryset=ApplicationTimeline.objects.order_by('date', 'id')),
+    )
+
+class ApplicationListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
+    permission_classes = [IsAuthenticated]
+    related_modified_fields = APPLICATION_RELATED_MODIFIED
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_class = ApplicationFilter
+    search_fields = ['application_id', 'program', 'student__first_name', 'student__last_name', 'university__name']
+    ordering_fields = ['created_at', 'updated_at', 'application_date', 'progress']
+    ordering = ['-created_at']
+    
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return ApplicationCreateSerializer
+        return ApplicationSerializer
+    
+    def get_queryset(self):
+        if self.request.method == 'POST':
+            return scoped_applications(self.request.user)
+        return application_read_queryset(self.request.user)
+    
+    def perform_create(self, serializer):
+        start_application(serializer.save())
+
+class ApplicationDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    permission_classes = [IsAuthenticated]
+    related_modified_fields = APPLICATION_RELATED_MODIFIED
+    
+    def get_serializer_class(self):
+        if self.request.method in ['PUT', 'PATCH']:
+            return ApplicationCreateSerializer
+        return ApplicationSerializer
+    
+    def get_queryset(self):
+        if self.request.method == 'GET':
+            return application_read_queryset(self.request.user)
+        return scoped_applications(self.request.user)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            sync_student_statuses([instance.student_id])
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def application_transition(request, pk):
+    serializer = TransitionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        transition_applications(scoped_applications(request.user), [pk], **serializer.validated_data)
+    except TransitionError as exc:
+        if exc.errors[pk] == 'Application not found.':
+            raise NotFound()
+        return Response({'status': [exc.errors[pk]]}, status=status.HTTP_400_BAD_REQUEST)
+    application = application_read_queryset(request.user).get(pk=pk)
+    return Response(ApplicationSerializer(application, context={'request': request}).data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def application_bulk_transition(request):
+    """Moves every listed application to one status, or none of them if any move is not allowed."""
+    serializer = BulkTransitionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    try:
+        moved = transition_applications(scoped_applications(request.user), data['applications'], data['status'],
+                                        data['note'])
+    except TransitionError as exc:
+        return Response({'applications': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'status': data['status'], 'updated': moved})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([DownloadRenderer])
+def document_download(request, pk):
+    """The document's file, as an attachment unless ``?inline=true``."""
+    documents = ApplicationDocument.objects.filter(application__in=scoped_applications(request.user))
+    document = get_object_or_404(documents.select_related('stored_file'), pk=pk)
+    if not document.file:
+        raise NotFound()
+    # Content-addressed files have their hash as a strong ETag
+    etag = f'"{document.stored_file.sha256}"' if document.stored_file else None
+    inline = request.query_params.get('inline', '').lower() in ('1', 'true')
+    return file_response(request, document.file, document.filename or os.path.basename(document.file.name),
+                         etag=etag, as_attachment=not inline)
+
+def scoped_uploads(user):
+    return DocumentUpload.objects.filter(application__in=scoped_applications(user))
+
+def upload_response(upload, status_code=status.HTTP_200_OK):
+    response = Response(DocumentUploadSerializer(upload).data, status=status_code)
+    response['Upload-Offset'] = upload.offset
+    response['Upload-Length'] = upload.size
+    response['Upload-Max-Chunk-Size'] = get_upload_setting('MAX_CHUNK_SIZE')
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def document_upload_start(request, pk):
+    """Opens a chunked upload of a new document of the application, or of a replacement for one of its documents."""
+    application = get_object_or_404(scoped_applications(request.user), pk=pk)
+    serializer = DocumentUploadSerializer(data=request.data, context={'application': application})
+    serializer.is_valid(raise_exception=True)
+    try:
+        upload = start_upload(application, request.user, **serializer.validated_data)
+    except UploadError as exc:
+        return Response({'size': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+    return upload_response(upload, status.HTTP_201_CREATED)
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def document_upload(request, upload_id):
+    """
+    GET reports how far the upload got. PUT appends the raw request body
+    at the ``Upload-Offset`` header, which must be the current offset.
+    DELETE abandons the upload.
+    """
+    uploads = scoped_uploads(request.user)
+    if request.method == 'GET':
+        return upload_response(get_object_or_404(uploads, pk=upload_id))
+    if request.method == 'DELETE':
+        try:
+            abort_upload(get_object_or_404(uploads, pk=upload_id))
+        except UploadError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return Response({'detail': 'An integer Upload-Offset header is required.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    # The body is read straight from the request stream, never loaded whole
+    try:
+        upload = write_chunk(uploads, upload_id, offset, request.stream, length)
+    except DocumentUpload.DoesNotExist:
+        raise NotFound()
+    except OffsetMismatch as exc:
+        response = Response({'detail': str(exc), 'offset': exc.offset}, status=status.HTTP_409_CONFLICT)
+        response['Upload-Offset'] = exc.offset
+        return response
+    except UploadError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return upload_response(upload)
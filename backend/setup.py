@@ -20,7 +20,10 @@ def run_migrations():
     """Run database migrations"""
     print("🔄 Running database migrations...")
     execute_from_command_line(['manage.py', 'makemigrations'])
+    # Stops here if existing users would violate the unique User.email
+    execute_from_command_line(['manage.py', 'check_user_emails'])
     execute_from_command_line(['manage.py', 'migrate'])
+    execute_from_command_line(['manage.py', 'createcachetable'])
     print("✅ Database migrations completed!")
 
 def create_superuser():
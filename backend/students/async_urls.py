@@ -0,0 +1,11 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('', async_views.StudentListView.as_view(), name='async_student_list'),
+    path('<int:pk>/', async_views.StudentDetailView.as_view(), name='async_student_detail'),
+    path('<int:pk>/remarks/', async_views.StudentRemarksView.as_view(), name='async_student_remarks'),
+    path('remarks/', async_views.StudentRemarkListView.as_view(), name='async_remark_list'),
+    path('remarks/<int:pk>/', async_views.StudentRemarkDetailView.as_view(), name='async_remark_detail'),
+    path('stats/', async_views.StudentStatsView.as_view(), name='async_student_stats'),
+]
@@ -0,0 +1,32 @@
+"""
+Async read endpoints for students, mounted under /api/async/students/.
+
+Each one serves the same data as its DRF counterpart in students.views (see
+study_abroad_crm.async_views); writes stay on the sync endpoints.
+"""
+from rest_framework.response import Response
+from study_abroad_crm.async_views import AsyncAPIView, AsyncListView, AsyncRetrieveView
+from . import views
+
+class StudentListView(AsyncListView):
+    view_class = views.StudentListCreateView
+
+class StudentDetailView(AsyncRetrieveView):
+    view_class = views.StudentDetailView
+
+class StudentRemarksView(AsyncListView):
+    view_class = views.StudentRemarksView
+
+class StudentRemarkListView(AsyncListView):
+    view_class = views.StudentRemarkListCreateView
+
+class StudentRemarkDetailView(AsyncRetrieveView):
+    view_class = views.StudentRemarkDetailView
+
+class StudentStatsView(AsyncAPIView):
+    # The APIView class that @api_view built for student_stats, for its permissions
+    view_class = views.student_stats.cls
+    
+    async def handle(self, view, request, *args, **kwargs):
+        totals = {status_value: total async for status_value, total in views.status_totals(request.user)}
+        return Response(views.stats_payload(totals))
@@ -0,0 +1,79 @@
+"""
+Streaming CSV / NDJSON export of students and remarks.
+
+Rows are pulled with study_abroad_crm.pagination.iterate_keyset, one bounded
+keyset query per batch, and encoded one line at a time into a
+StreamingHttpResponse, so the first bytes go out after the first batch and
+memory does not grow with the size of the export.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from study_abroad_crm.pagination import iterate_keyset
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+STUDENT_EXPORT_FIELDS = [
+    'id', 'first_name', 'last_name', 'email', 'phone', 'date_of_birth', 'gender', 'address',
+    'current_education', 'field_of_study', 'institution', 'gpa', 'graduation_year',
+    'english_proficiency', 'test_score', 'preferred_country', 'intended_program', 'preferred_field',
+    'intake_year', 'budget', 'assigned_counselor', 'status', 'additional_notes', 'created_at', 'updated_at',
+]
+
+REMARK_EXPORT_FIELDS = [
+    'id', 'student', 'counselor', 'contact_type', 'content', 'next_follow_up', 'priority', 'created_at',
+]
+
+# Joined columns, renamed on the way out: {output column: (lookup, ...)}
+STUDENT_EXPORT_RELATED = {
+    'counselor_name': ('assigned_counselor__first_name', 'assigned_counselor__last_name'),
+}
+
+REMARK_EXPORT_RELATED = {
+    'student_name': ('student__first_name', 'student__last_name'),
+    'counselor_name': ('counselor__first_name', 'counselor__last_name'),
+}
+
+
+class _Echo:
+    """File-like object whose write() hands the encoded line straight back."""
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, ordering, fields, related, batch_size=2000):
+    lookups = [lookup for parts in related.values() for lookup in parts]
+    extra = [field.lstrip('-') for field in ordering if field.lstrip('-') not in fields]
+    for row in iterate_keyset(queryset.values(*fields, *lookups, *extra), ordering, batch_size):
+        record = {field: row[field] for field in fields}
+        for column, parts in related.items():
+            record[column] = ' '.join(row[part] for part in parts if row[part]) or None
+        yield record
+
+
+def streaming_export(records, columns, file_format, filename):
+    if file_format == 'csv':
+        writer = csv.DictWriter(_Echo(), fieldnames=columns)
+        header = writer.writeheader()
+        lines = (writer.writerow(record) for record in records)
+        body = _prepend(header, lines)
+    else:
+        body = (json.dumps(record, cls=DjangoJSONEncoder) + '\n' for record in records)
+    
+    extension = 'csv' if file_format == 'csv' else 'ndjson'
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+    response = StreamingHttpResponse(body, content_type=EXPORT_FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}-{stamp}.{extension}"'
+    return response
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
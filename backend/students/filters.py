@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+import django_filters
+from rest_framework.filters import SearchFilter, OrderingFilter
+from .models import Student
+from .search import search_students
+
+class StudentFilter(django_filters.FilterSet):
+    """
+    Budget and GPA range filters over the numeric shadow columns (see
+    study_abroad_crm.numeric). A student matches a budget range when their
+    budget range overlaps it. GPAs are compared as a percentage of their own
+    scale, so ``gpa_min=3.2`` (out of ``gpa_scale``, default 4) also matches
+    an 8.5/10.
+    """
+    budget_min = django_filters.NumberFilter(field_name='budget_max', lookup_expr='gte')
+    budget_max = django_filters.NumberFilter(field_name='budget_min', lookup_expr='lte')
+    budget_currency = django_filters.CharFilter(field_name='budget_currency', lookup_expr='iexact')
+    gpa_min = django_filters.NumberFilter(method='filter_gpa')
+    gpa_max = django_filters.NumberFilter(method='filter_gpa')
+    gpa_scale = django_filters.NumberFilter(method='filter_nothing', min_value=1)
+    
+    class Meta:
+        model = Student
+        fields = ['status', 'preferred_country', 'assigned_counselor']
+    
+    def filter_gpa(self, queryset, name, value):
+        scale = self.form.cleaned_data.get('gpa_scale') or Decimal(4)
+        lookup = 'gpa_percent__gte' if name == 'gpa_min' else 'gpa_percent__lte'
+        return queryset.filter(**{lookup: value * 100 / scale})
+    
+    def filter_nothing(self, queryset, name, value):
+        # gpa_scale only qualifies gpa_min/gpa_max
+        return queryset
+
+class StudentSearchFilter(SearchFilter):
+    """SearchFilter backed by the StudentSearchToken index instead of icontains scans."""
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return search_students(queryset, query)
+
+class RankedOrderingFilter(OrderingFilter):
+    """Orders search results by relevance unless the client picks an ordering."""
+    
+    def get_default_ordering(self, view):
+        ordering = super().get_default_ordering(view)
+        if ordering and view.request.query_params.get(StudentSearchFilter.search_param, '').strip():
+            return ['-search_rank'] + list(ordering)
+        return ordering
@@ -0,0 +1,85 @@
+"""
+Follow-up queue built on StudentRemark.next_follow_up.
+
+The follow-up date of a student's most recent remark is copied onto the
+student (next_follow_up / follow_up_priority / follow_up_remark). Logging a
+newer remark without a date therefore clears the pending follow-up. The queue
+then becomes one range scan on the (assigned_counselor, next_follow_up) index
+instead of a scan over every remark.
+"""
+from datetime import timedelta
+
+from django.db.models import Case, Count, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+from .models import Student, StudentRemark
+
+PRIORITY_RANK = Case(
+    When(follow_up_priority='high', then=Value(0)),
+    When(follow_up_priority='medium', then=Value(1)),
+    When(follow_up_priority='low', then=Value(2)),
+    default=Value(1),
+    output_field=IntegerField(),
+)
+
+
+def refresh_follow_up(student_id):
+    latest = StudentRemark.objects.filter(student_id=student_id).order_by('-created_at', '-id').values(
+        'id', 'next_follow_up', 'priority'
+    ).first()
+    if latest is None or latest['next_follow_up'] is None:
+        values = {'next_follow_up': None, 'follow_up_priority': None, 'follow_up_remark': None}
+    else:
+        values = {
+            'next_follow_up': latest['next_follow_up'],
+            'follow_up_priority': latest['priority'],
+            'follow_up_remark': latest['id'],
+        }
+    Student.objects.filter(pk=student_id).update(updated_at=timezone.now(), **values)
+
+
+def rebuild_follow_ups():
+    """Recompute every student's pending follow-up with correlated subqueries."""
+    latest = StudentRemark.objects.filter(student=OuterRef('pk')).order_by('-created_at', '-id')
+    updated = Student.objects.update(
+        next_follow_up=Subquery(latest.values('next_follow_up')[:1]),
+        follow_up_priority=Subquery(latest.values('priority')[:1]),
+        follow_up_remark=Subquery(latest.values('id')[:1]),
+    )
+    Student.objects.filter(next_follow_up__isnull=True).exclude(follow_up_remark=None).update(
+        follow_up_priority=None, follow_up_remark=None
+    )
+    return updated
+
+
+def week_bounds(today):
+    # A rolling week (tomorrow through seven days out) so the bucket is never empty on weekends
+    return today + timedelta(days=1), today + timedelta(days=7)
+
+
+def follow_up_queue(queryset, today=None, limit=100):
+    today = today or timezone.localdate()
+    week_start, week_end = week_bounds(today)
+    pending = queryset.filter(next_follow_up__isnull=False)
+
+    counts = pending.aggregate(
+        overdue=Count('pk', filter=Q(next_follow_up__lt=today)),
+        today=Count('pk', filter=Q(next_follow_up=today)),
+        this_week=Count('pk', filter=Q(next_follow_up__gte=week_start, next_follow_up__lte=week_end)),
+    )
+
+    ranked = pending.select_related('assigned_counselor', 'follow_up_remark').annotate(
+        priority_rank=PRIORITY_RANK
+    )
+    buckets = {
+        # The most overdue calls first, then by priority
+        'overdue': ranked.filter(next_follow_up__lt=today).order_by('next_follow_up', 'priority_rank', 'id'),
+        'today': ranked.filter(next_follow_up=today).order_by('priority_rank', 'id'),
+        'this_week': ranked.filter(next_follow_up__gte=week_start, next_follow_up__lte=week_end).order_by(
+            'next_follow_up', 'priority_rank', 'id'
+        ),
+    }
+    return {
+        name: {'count': counts[name], 'results': list(bucket[:limit])}
+        for name, bucket in buckets.items()
+    }
@@ -0,0 +1,209 @@
+"""
+Bulk student import from CSV or JSON Lines.
+
+Rows are read one at a time from the (already streamed-to-disk) upload,
+validated in chunks and written with bulk_create/bulk_update, one
+transaction per chunk, so memory use depends on the chunk size rather than
+the file size. bulk_create skips model signals and save(), so the status
+counters, search tokens and numeric shadow columns are maintained here
+explicitly.
+
+Only students in the importer's ``students`` queryset (the uploader's scope)
+are updated. A row whose email belongs to a student outside it fails rather
+than taking that student over.
+"""
+import codecs
+import csv
+import json
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Student, StudentStatusCount
+from .search import index_students
+from .serializers import StudentCreateSerializer
+
+DUPLICATE_SKIP = 'skip'
+DUPLICATE_UPDATE = 'update'
+DUPLICATE_POLICIES = [DUPLICATE_SKIP, DUPLICATE_UPDATE]
+
+FILE_FORMATS = ['csv', 'jsonl']
+
+
+class StudentImportRowSerializer(StudentCreateSerializer):
+    """
+    Row validation without per-row queries: email uniqueness is resolved per
+    chunk by the importer and counselors are checked against a preloaded set.
+    """
+    email = serializers.EmailField(max_length=254)
+    assigned_counselor = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate_assigned_counselor(self, value):
+        if value is not None and value not in self.context['counselor_ids']:
+            raise serializers.ValidationError(f'Invalid counselor "{value}".')
+        return value
+
+
+def detect_format(filename, requested=None):
+    if requested:
+        file_format = requested.lower()
+    elif filename.lower().endswith('.csv'):
+        file_format = 'csv'
+    else:
+        file_format = 'jsonl'
+    if file_format in ('ndjson', 'json'):
+        file_format = 'jsonl'
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f'Unsupported import format "{file_format}"')
+    return file_format
+
+
+def iter_rows(binary_file, file_format):
+    """Yield (row_number, dict) pairs without reading the whole file."""
+    text = codecs.getreader('utf-8-sig')(binary_file)
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            yield number, {key: value for key, value in row.items() if key and value != ''}
+    else:
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+                continue
+            yield number, row if isinstance(row, dict) else ValueError('Expected a JSON object')
+
+
+class StudentImporter:
+    def __init__(self, on_duplicate=DUPLICATE_SKIP, batch_size=500, counselor=None, on_error=None, students=None):
+        if on_duplicate not in DUPLICATE_POLICIES:
+            raise ValueError(f'on_duplicate must be one of {DUPLICATE_POLICIES}')
+        self.on_duplicate = on_duplicate
+        self.batch_size = batch_size
+        # Forces assigned_counselor for every row, e.g. when a counselor imports their own leads
+        self.counselor = counselor
+        # Existing students rows may match and update; by default every student
+        self.students = Student.objects.all() if students is None else students
+        self.on_error = on_error
+        self.counselor_ids = set(get_user_model().objects.values_list('id', flat=True))
+        self.totals = Counter(created=0, updated=0, skipped=0, failed=0)
+
+    def run(self, rows):
+        chunk = []
+        for number, row in rows:
+            chunk.append((number, row))
+            if len(chunk) >= self.batch_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+        return dict(self.totals)
+
+    def _error(self, number, errors):
+        self.totals['failed'] += 1
+        if self.on_error:
+            self.on_error({'row': number, 'errors': errors})
+
+    def _import_chunk(self, chunk):
+        valid = {}
+        for number, row in chunk:
+            if isinstance(row, Exception):
+                self._error(number, {'non_field_errors': [str(row)]})
+                continue
+            if self.counselor is not None:
+                row = dict(row, assigned_counselor=self.counselor.pk)
+            serializer = StudentImportRowSerializer(data=row, context={'counselor_ids': self.counselor_ids})
+            if not serializer.is_valid():
+                self._error(number, serializer.errors)
+                continue
+            data = serializer.validated_data
+            email = data['email'].lower()
+            if email in valid:
+                self._error(number, {'email': [f'Duplicate of row {valid[email][0]} in this file.']})
+                continue
+            valid[email] = (number, data)
+
+        if not valid:
+            return
+
+        for attempt in range(2):
+            try:
+                created, updated, skipped, out_of_scope = self._write_chunk(valid)
+                break
+            except IntegrityError:
+                # An email was inserted concurrently; the retry sees it as an existing student
+                if attempt:
+                    for number, data in valid.values():
+                        self._error(number, {'email': ['Could not be saved because of a concurrent change.']})
+                    return
+
+        for number in out_of_scope:
+            self._error(number, {'email': ['A student with this email already exists.']})
+        self.totals['created'] += created
+        self.totals['updated'] += updated
+        self.totals['skipped'] += skipped
+
+    def _write_chunk(self, valid):
+        """Write one chunk in a transaction; returns (created, updated, skipped, out-of-scope row numbers)."""
+        with transaction.atomic():
+            emails = [data['email'] for number, data in valid.values()]
+            existing = {
+                student.email.lower(): student
+                for student in Student.objects.select_for_update().filter(email__in=emails)
+            }
+            in_scope = set(self.students.filter(pk__in=[student.pk for student in existing.values()])
+                           .values_list('pk', flat=True)) if existing else set()
+            to_create = []
+            to_update = []
+            skipped = 0
+            out_of_scope = []
+            now = timezone.now()
+            count_changes = Counter()
+            update_fields = set()
+
+            for email, (number, data) in valid.items():
+                data = dict(data)
+                if 'assigned_counselor' in data:
+                    data['assigned_counselor_id'] = data.pop('assigned_counselor')
+                student = existing.get(email)
+                if student is None:
+                    student = Student(**data)
+                    student.fill_numeric_columns()
+                    to_create.append(student)
+                    count_changes[(student.assigned_counselor_id, student.status)] += 1
+                elif student.pk not in in_scope:
+                    out_of_scope.append(number)
+                elif self.on_duplicate == DUPLICATE_UPDATE:
+                    count_changes[(student.assigned_counselor_id, student.status)] -= 1
+                    for field, value in data.items():
+                        setattr(student, field, value)
+                    student.fill_numeric_columns(data)
+                    student.updated_at = now
+                    update_fields.update(data)
+                    update_fields.update(Student.numeric_column_names(data))
+                    count_changes[(student.assigned_counselor_id, student.status)] += 1
+                    to_update.append(student)
+                else:
+                    skipped += 1
+
+            Student.objects.bulk_create(to_create, batch_size=self.batch_size)
+            if to_update:
+                Student.objects.bulk_update(to_update, sorted(update_fields | {'updated_at'}),
+                                            batch_size=self.batch_size)
+
+            for (counselor_id, status), delta in count_changes.items():
+                if delta:
+                    StudentStatusCount.adjust(counselor_id, status, delta)
+
+            # MySQL does not return primary keys from bulk_create, so reload the rows to index them
+            written = [student.email for student in to_create] + [student.email for student in to_update]
+            if written:
+                index_students(list(
+                    Student.objects.filter(email__in=written).only('id', 'first_name', 'last_name', 'email', 'phone')
+                ))
+        return len(to_create), len(to_update), skipped, out_of_scope
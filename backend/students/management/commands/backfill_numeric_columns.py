@@ -0,0 +1,82 @@
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from applications.models import Application
+from students.models import Student
+from universities.cache import invalidate_catalogue
+from universities.models import University, UniversityProgram
+
+MODELS = {
+    'student': Student,
+    'university': University,
+    'program': UniversityProgram,
+    'application': Application,
+}
+
+class Command(BaseCommand):
+    help = ('Fill the numeric shadow columns of the fee, budget, GPA and test-score text fields in primary key '
+            'batches. Only rows whose parsed values changed are written, so it is safe to interrupt and rerun')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', choices=list(MODELS),
+                            help='Only backfill this model (repeatable; default: all)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint',
+                            help='JSON file recording the last primary key done per model; a rerun resumes from it. '
+                                 'Removed once every model is done')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the beginning')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches to spare the database')
+    
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        checkpoint_path = options['checkpoint']
+        checkpoint = {}
+        if checkpoint_path and not options['restart'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        
+        catalogue_changed = False
+        for label in options['model'] or list(MODELS):
+            updated = self._backfill(label, MODELS[label], checkpoint, checkpoint_path, options)
+            catalogue_changed = catalogue_changed or (updated and label in ('university', 'program'))
+        
+        if catalogue_changed:
+            # bulk_update skips the signals that invalidate the catalogue cache and the matching catalogue
+            invalidate_catalogue()
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+    
+    def _backfill(self, label, model, checkpoint, checkpoint_path, options):
+        batch_size = options['batch_size']
+        columns = model.numeric_column_names()
+        sources = {source for spec in model.numeric_columns for source in spec.sources}
+        last_id = checkpoint.get(label, 0)
+        if last_id:
+            self.stdout.write(f'{label}: resuming after id {last_id}')
+        scanned = 0
+        updated = 0
+        
+        while True:
+            batch = list(model.objects.filter(id__gt=last_id).order_by('id').only('id', *sources, *columns)[:batch_size])
+            if not batch:
+                break
+            changed = [row for row in batch if row.fill_numeric_columns()]
+            if changed:
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, columns, batch_size=batch_size)
+            last_id = batch[-1].id
+            scanned += len(batch)
+            updated += len(changed)
+            if checkpoint_path:
+                checkpoint[label] = last_id
+                with open(checkpoint_path, 'w') as checkpoint_file:
+                    json.dump(checkpoint, checkpoint_file)
+            self.stdout.write(f'{label}: scanned {scanned}, updated {updated} (last id {last_id})')
+            if options['pause']:
+                time.sleep(options['pause'])
+        
+        self.stdout.write(self.style.SUCCESS(f'{label}: {updated} of {scanned} rows updated'))
+        return updated
@@ -0,0 +1,143 @@
+import asyncio
+import io
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from accounts.tokens import UserClaimsRefreshToken
+from students.views import scoped_students
+
+class Command(BaseCommand):
+    help = ('Compare requests/sec and latency of the sync student read endpoints served by the WSGI handler '
+            'with their /api/async/ versions served by the ASGI handler, at the same concurrency')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='User the requests are authenticated as')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument('--wsgi-threads', type=int, default=8,
+                            help='Requests the WSGI deployment serves at once (workers x threads); the rest queue')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint and handler')
+        parser.add_argument('--query-delay', type=float, default=0,
+                            help='Milliseconds added to every SQL query, to simulate a slow database')
+    
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f'User "{options["username"]}" does not exist')
+        student = scoped_students(user).order_by('-created_at').first()
+        if student is None:
+            raise CommandError('The user cannot see any students')
+        token = str(UserClaimsRefreshToken.for_user(user).access_token)
+        
+        if options['query_delay']:
+            delay = options['query_delay'] / 1000
+            
+            def slow_query(execute, sql, params, many, context):
+                time.sleep(delay)
+                return execute(sql, params, many, context)
+            
+            def add_delay(sender, connection, **kwargs):
+                # Fired again on every reconnect of the same connection object
+                if slow_query not in connection.execute_wrappers:
+                    connection.execute_wrappers.append(slow_query)
+            
+            connection_created.connect(add_delay, weak=False)
+            # Connections opened before the receiver was connected are reopened with it
+            connections.close_all()
+        
+        paths = [
+            'students/',
+            f'students/{student.pk}/',
+            f'students/{student.pk}/remarks/',
+            'students/remarks/',
+            'students/stats/',
+        ]
+        self.stdout.write(
+            f'{options["requests"]} requests per endpoint, {options["concurrency"]} in flight, '
+            f'{options["wsgi_threads"]} WSGI threads'
+        )
+        for path in paths:
+            wsgi = self._run_wsgi(f'/api/{path}', token, options)
+            asgi = asyncio.run(self._run_asgi(f'/api/async/{path}', token, options))
+            self.stdout.write(f'{path}\n  WSGI (sync):  {self._summary(*wsgi)}\n  ASGI (async): {self._summary(*asgi)}')
+    
+    def _run_wsgi(self, path, token, options):
+        handler = WSGIHandler()
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+            'HTTP_AUTHORIZATION': f'Bearer {token}', 'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.url_scheme': 'http', 'wsgi.errors': io.StringIO(), 'wsgi.multithread': True,
+            'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        statuses = []
+        workers = threading.BoundedSemaphore(options['wsgi_threads'])
+        
+        def request(_):
+            status = []
+            # Latency includes the wait for a free worker, as a client would see it
+            started = time.perf_counter()
+            with workers:
+                response = handler(dict(environ, **{'wsgi.input': io.BytesIO()}),
+                                   lambda s, h, e=None: status.append(s))
+                b''.join(response)
+                response.close()
+            statuses.append(int(status[0].split()[0]))
+            return time.perf_counter() - started
+        
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            latencies = list(pool.map(request, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        connections.close_all()
+        return latencies, elapsed, statuses
+    
+    async def _run_asgi(self, path, token, options):
+        handler = ASGIHandler()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        statuses = []
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        
+        async def request():
+            async with semaphore:
+                sent = []
+                
+                async def receive():
+                    if not sent:
+                        sent.append(True)
+                        return {'type': 'http.request', 'body': b'', 'more_body': False}
+                    # Never disconnect; the handler cancels this once the response is sent
+                    await asyncio.Event().wait()
+                
+                messages = []
+                
+                async def send(message):
+                    messages.append(message)
+                
+                started = time.perf_counter()
+                await handler(dict(scope), receive, send)
+                statuses.append(messages[0]['status'])
+                return time.perf_counter() - started
+        
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        return latencies, elapsed, statuses
+    
+    def _summary(self, latencies, elapsed, statuses):
+        latencies = sorted(latency * 1000 for latency in latencies)
+        failed = sum(1 for status in statuses if status >= 400)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return (f'{len(latencies) / elapsed:7.1f} req/s, p50 {statistics.median(latencies):6.1f} ms, '
+                f'p99 {p99:6.1f} ms' + (f', {failed} failed' if failed else ''))
@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from students.models import Student
+from students.search import search_students
+
+class Command(BaseCommand):
+    help = 'Compare the token search index against the icontains filter on the current database'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='+', help='Search queries to time')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=20, help='Page size fetched per query')
+    
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        limit = options['limit']
+        
+        for query in options['terms']:
+            icontains = Q()
+            for term in query.split():
+                icontains &= (Q(first_name__icontains=term) | Q(last_name__icontains=term) |
+                              Q(email__icontains=term) | Q(phone__icontains=term))
+            
+            scan = self._time(lambda: list(Student.objects.filter(icontains).order_by('-created_at')[:limit]), repeat)
+            indexed = self._time(
+                lambda: list(search_students(Student.objects.all(), query).order_by('-search_rank', '-created_at')[:limit]),
+                repeat,
+            )
+            self.stdout.write(
+                f'{query!r}: icontains {scan * 1000:.2f} ms, token index {indexed * 1000:.2f} ms '
+                f'({scan / indexed if indexed else 0:.1f}x)'
+            )
+    
+    def _time(self, run, repeat):
+        run()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        return (time.perf_counter() - started) / repeat
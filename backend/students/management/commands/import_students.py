@@ -0,0 +1,47 @@
+import json
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from students.importer import DUPLICATE_POLICIES, FILE_FORMATS, StudentImporter, detect_format, iter_rows
+
+class Command(BaseCommand):
+    help = 'Import students from a CSV or JSON Lines file in batched transactions'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=FILE_FORMATS)
+        parser.add_argument('--on-duplicate', choices=DUPLICATE_POLICIES, default='skip',
+                            help='What to do when a row\'s email already exists')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--counselor', help='Username to assign every imported student to')
+        parser.add_argument('--errors', help='Write the per-row error report to this JSON Lines file')
+    
+    def handle(self, *args, **options):
+        counselor = None
+        if options['counselor']:
+            try:
+                counselor = get_user_model().objects.get(username=options['counselor'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'Unknown user "{options["counselor"]}"')
+        
+        file_format = detect_format(options['path'], options['file_format'])
+        error_file = open(options['errors'], 'w') if options['errors'] else None
+        
+        def report(error):
+            line = json.dumps(error)
+            if error_file:
+                error_file.write(line + '\n')
+            else:
+                self.stderr.write(line)
+        
+        try:
+            importer = StudentImporter(on_duplicate=options['on_duplicate'], batch_size=options['batch_size'],
+                                       counselor=counselor, on_error=report)
+            with open(options['path'], 'rb') as source:
+                totals = importer.run(iter_rows(source, file_format))
+        finally:
+            if error_file:
+                error_file.close()
+        
+        self.stdout.write(self.style.SUCCESS(
+            'Created {created}, updated {updated}, skipped {skipped}, failed {failed}'.format(**totals)
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from students.followups import rebuild_follow_ups
+
+class Command(BaseCommand):
+    help = 'Recompute every student\'s pending follow-up from their latest remark'
+    
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = rebuild_follow_ups()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed follow-ups for {updated} students'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from students.models import Student
+from students.search import index_students
+
+class Command(BaseCommand):
+    help = 'Rebuild the StudentSearchToken index in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = ['id', 'first_name', 'last_name', 'email', 'phone']
+        last_id = 0
+        indexed = 0
+        
+        while True:
+            batch = list(Student.objects.filter(id__gt=last_id).order_by('id').only(*fields)[:batch_size])
+            if not batch:
+                break
+            index_students(batch, batch_size=batch_size)
+            last_id = batch[-1].id
+            indexed += len(batch)
+            self.stdout.write(f'Indexed {indexed} students')
+        
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {indexed} students'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from students.models import StudentStatusCount
+
+class Command(BaseCommand):
+    help = 'Recompute the per-counselor student status counters used by /api/students/stats/'
+    
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = StudentStatusCount.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} status counters'))
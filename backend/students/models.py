@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings
+from django.db.models.functions import Coalesce
+from study_abroad_crm.numeric import MoneyColumns, NumericColumnsMixin, ScoreColumns, parse_gpa, parse_test_score
 
-class Student(models.Model):
+class Student(NumericColumnsMixin, models.Model):
     GENDER_CHOICES = [
         ('male', 'Male'),
         ('female', 'Female'),
@@ -51,21 +53,66 @@ class Student(models.Model):
     intake_year = models.CharField(max_length=20)
     budget = models.CharField(max_length=50, blank=True, null=True)
     
+    # Parsed from gpa, test_score and budget by study_abroad_crm.numeric, for range filters
+    gpa_value = models.DecimalField(max_digits=7, decimal_places=2, blank=True, null=True,
+                                    editable=False)
+    gpa_scale = models.DecimalField(max_digits=7, decimal_places=2, blank=True, null=True,
+                                    editable=False)
+    gpa_percent = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True,
+                                      editable=False, db_index=True)
+    test_score_value = models.DecimalField(max_digits=7, decimal_places=2, blank=True, null=True,
+                                           editable=False)
+    test_score_scale = models.DecimalField(max_digits=7, decimal_places=2, blank=True, null=True,
+                                           editable=False)
+    test_score_percent = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True,
+                                             editable=False, db_index=True)
+    budget_min = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                     editable=False, db_index=True)
+    budget_max = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                     editable=False, db_index=True)
+    budget_currency = models.CharField(max_length=3, blank=True, null=True, editable=False)
+    
     # CRM Information
     assigned_counselor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='inquiry')
     additional_notes = models.TextField(blank=True, null=True)
     
+    # Pending follow-up, copied from the latest remark by students.followups
+    next_follow_up = models.DateField(blank=True, null=True)
+    follow_up_priority = models.CharField(max_length=10, blank=True, null=True)
+    follow_up_remark = models.ForeignKey('StudentRemark', on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='+')
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['assigned_counselor', 'created_at'], name='student_counselor_created_idx'),
+            models.Index(fields=['created_at'], name='student_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='student_status_created_idx'),
+            models.Index(fields=['assigned_counselor', 'next_follow_up'], name='student_counselor_followup_idx'),
+            models.Index(fields=['next_follow_up'], name='student_followup_idx'),
+        ]
+    
+    numeric_columns = [
+        ScoreColumns(parse_gpa, 'gpa', 'gpa'),
+        ScoreColumns(parse_test_score, 'test_score', 'test_score', 'english_proficiency'),
+        MoneyColumns('budget', 'budget'),
+    ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
     
+    def save(self, *args, **kwargs):
+        # students.signals adjusts the status counters and search tokens from pre/post_save; one
+        # transaction keeps them from drifting from the row when either write fails. Deletes already
+        # send their signals inside the deletion's transaction.
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Student, instance=self)):
+            super().save(*args, **kwargs)
+    
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -91,9 +138,67 @@ class StudentRemark(models.Model):
     next_follow_up = models.DateField(blank=True, null=True)
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['counselor', 'created_at'], name='remark_counselor_created_idx'),
+            models.Index(fields=['student', 'created_at'], name='remark_student_created_idx'),
+        ]
     
     def __str__(self):
         return f"Remark for {self.student.full_name} by {self.counselor.full_name}"
+
+class StudentStatusCount(models.Model):
+    """Per-counselor student counts by status, kept current by students.signals."""
+    counselor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True,
+                                  related_name='student_status_counts')
+    status = models.CharField(max_length=20, choices=Student.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['counselor', 'status']
+        constraints = [
+            # NULLs never collide in unique_together, so the unassigned counters need their own
+            # constraint; a functional one, since MySQL has no partial (conditional) unique indexes
+            models.UniqueConstraint(Coalesce('counselor', models.Value(0)), 'status',
+                                    name='status_count_counselor_status_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.counselor_id or 'unassigned'} - {self.status}: {self.count}"
+    
+    @classmethod
+    def adjust(cls, counselor_id, status, delta):
+        updated = cls.objects.filter(counselor_id=counselor_id, status=status).update(
+            count=models.F('count') + delta
+        )
+        if not updated:
+            counter, created = cls.objects.get_or_create(counselor_id=counselor_id, status=status)
+            cls.objects.filter(pk=counter.pk).update(count=models.F('count') + delta)
+    
+    @classmethod
+    def rebuild(cls):
+        """Recompute every counter from a single GROUP BY over students."""
+        rows = Student.objects.values('assigned_counselor', 'status').annotate(
+            total=models.Count('id')
+        ).order_by()
+        counters = [cls(counselor_id=row['assigned_counselor'], status=row['status'], count=row['total'])
+                    for row in rows]
+        cls.objects.all().delete()
+        cls.objects.bulk_create(counters)
+        return len(counters)
+
+class StudentSearchToken(models.Model):
+    """Normalized name/email/phone tokens used by students.search for indexed prefix lookups."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=100)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'student'], name='student_search_token_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.token} -> {self.student_id}"
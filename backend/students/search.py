@@ -0,0 +1,124 @@
+"""
+Token index for student search.
+
+Names, emails and phone numbers are broken into normalized tokens stored in
+StudentSearchToken. A query term matches a token by prefix, which MySQL can
+serve from the (token, student) index instead of scanning every student with
+LIKE '%term%'.
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+
+from .models import StudentSearchToken
+
+MAX_TOKEN_LENGTH = 100
+MAX_QUERY_TERMS = 5
+MIN_PHONE_SUFFIX = 4
+
+EXACT_MATCH_SCORE = 3
+PREFIX_MATCH_SCORE = 1
+
+_WORD_PARTS = re.compile(r"[\-'’]+")
+_EMAIL_SPLIT = re.compile(r'[._+\-]+')
+_PHONE_TERM = re.compile(r'^[\d\s\-+().]+$')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return text.lower().strip()
+
+
+def digits(text):
+    return re.sub(r'\D', '', text or '')
+
+
+def student_tokens(student):
+    tokens = set()
+    
+    for name in (student.first_name, student.last_name):
+        for word in normalize(name).split():
+            tokens.add(word)
+            tokens.update(_WORD_PARTS.split(word))
+    
+    email = normalize(student.email)
+    if email:
+        tokens.add(email)
+        local, _, domain = email.partition('@')
+        local_parts = _EMAIL_SPLIT.split(local)
+        tokens.add(local)
+        tokens.update(local_parts)
+        if domain:
+            tokens.add(domain)
+            tokens.update(domain.split('.'))
+            # Lets "smith@gma" match john.smith@gmail.com
+            tokens.update(f'{part}@{domain}' for part in local_parts if part)
+    
+    # Every digit suffix is stored so "last four digits" searches are prefix lookups too
+    phone_digits = digits(student.phone)
+    for start in range(max(len(phone_digits) - MIN_PHONE_SUFFIX + 1, 1)):
+        tokens.add(phone_digits[start:])
+    
+    return {token[:MAX_TOKEN_LENGTH] for token in tokens if token}
+
+
+def query_terms(query):
+    terms = []
+    for raw in normalize(query).split()[:MAX_QUERY_TERMS]:
+        term = digits(raw) if _PHONE_TERM.match(raw) and digits(raw) else raw
+        term = term[:MAX_TOKEN_LENGTH]
+        if term and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def index_student(student):
+    index_students([student])
+
+
+def index_students(students, batch_size=1000):
+    """Replace the tokens of saved ``students``; used for bulk writes that skip signals."""
+    with transaction.atomic():
+        StudentSearchToken.objects.filter(student__in=[student.pk for student in students]).delete()
+        StudentSearchToken.objects.bulk_create([
+            StudentSearchToken(student=student, token=token)
+            for student in students
+            for token in student_tokens(student)
+        ], batch_size=batch_size)
+
+
+def search_students(queryset, query):
+    """
+    Restrict ``queryset`` to students matching every term of ``query`` and
+    annotate ``search_rank``: 3 per exact token match, 1 per prefix match.
+
+    The tokens are joined to ``queryset`` and grouped per student, so only
+    the tokens of students in it are read and the rank is an aggregate of
+    the same join rather than a subquery per row. ``queryset`` must not
+    carry other aggregates over multi-valued relations, which the join
+    would multiply.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return queryset
+    
+    term_scores = {
+        f'term_{index}': Max(Case(
+            When(search_tokens__token=term, then=Value(EXACT_MATCH_SCORE)),
+            When(search_tokens__token__startswith=term, then=Value(PREFIX_MATCH_SCORE)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        for index, term in enumerate(terms)
+    }
+    any_term = Q()
+    for term in terms:
+        any_term |= Q(search_tokens__token__startswith=term)
+    
+    # Filtering before annotating makes the aggregates use the filtered join
+    return queryset.filter(any_term).annotate(**term_scores).filter(
+        **{f'{name}__gt': 0 for name in term_scores}
+    ).annotate(search_rank=sum((F(name) for name in term_scores), Value(0)))
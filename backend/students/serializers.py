@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from .models import Student, StudentRemark
 from accounts.serializers import UserSerializer
 
@@ -13,7 +14,10 @@ class StudentRemarkSerializer(serializers.ModelSerializer):
 
 class StudentSerializer(serializers.ModelSerializer):
     counselor_name = serializers.CharField(source='assigned_counselor.full_name', read_only=True)
-    remarks = StudentRemarkSerializer(many=True, read_only=True)
+    # Only the latest remarks are embedded; the full history is paginated at remarks_url
+    remarks = StudentRemarkSerializer(source='recent_remarks', many=True, read_only=True)
+    remarks_count = serializers.IntegerField(read_only=True)
+    remarks_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Student
@@ -23,8 +27,33 @@ class StudentSerializer(serializers.ModelSerializer):
                  'english_proficiency', 'test_score', 'preferred_country', 
                  'intended_program', 'preferred_field', 'intake_year', 'budget', 
                  'assigned_counselor', 'counselor_name', 'status', 'additional_notes', 
-                 'created_at', 'updated_at', 'remarks']
-        read_only_fields = ['id', 'full_name', 'created_at', 'updated_at']
+                 'next_follow_up', 'follow_up_priority', 'created_at', 'updated_at', 'remarks', 
+                 'remarks_count', 'remarks_url']
+        read_only_fields = ['id', 'full_name', 'next_follow_up', 'follow_up_priority', 'created_at', 'updated_at']
+    
+    def get_remarks_url(self, obj):
+        return reverse('student_remarks', kwargs={'pk': obj.pk}, request=self.context.get('request'))
+
+class StudentListSerializer(serializers.ModelSerializer):
+    counselor_name = serializers.CharField(source='assigned_counselor.full_name', read_only=True)
+    
+    class Meta:
+        model = Student
+        fields = ['id', 'first_name', 'last_name', 'full_name', 'email', 'phone', 
+                 'current_education', 'preferred_country', 'intended_program', 
+                 'preferred_field', 'intake_year', 'assigned_counselor', 
+                 'counselor_name', 'status', 'next_follow_up', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class FollowUpSerializer(serializers.ModelSerializer):
+    counselor_name = serializers.CharField(source='assigned_counselor.full_name', read_only=True)
+    follow_up_note = serializers.CharField(source='follow_up_remark.content', read_only=True, default=None)
+    
+    class Meta:
+        model = Student
+        fields = ['id', 'full_name', 'email', 'phone', 'status', 'assigned_counselor', 'counselor_name', 
+                 'next_follow_up', 'follow_up_priority', 'follow_up_remark', 'follow_up_note']
+        read_only_fields = fields
 
 class StudentCreateSerializer(serializers.ModelSerializer):
     class Meta:
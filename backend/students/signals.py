@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import Student, StudentRemark, StudentStatusCount
+from .followups import refresh_follow_up
+from .search import index_student
+
+SEARCH_FIELDS = ('first_name', 'last_name', 'email', 'phone')
+
+@receiver(pre_save, sender=Student)
+def remember_counted_state(sender, instance, **kwargs):
+    # Compare against the stored row so only real status/counselor changes move counts and
+    # only real name/email/phone changes rebuild the search tokens
+    instance._counted_state = None
+    instance._indexed_state = None
+    if instance.pk:
+        stored = Student.objects.filter(pk=instance.pk).values_list(
+            'assigned_counselor_id', 'status', *SEARCH_FIELDS
+        ).first()
+        if stored is not None:
+            instance._counted_state = stored[:2]
+            instance._indexed_state = stored[2:]
+
+@receiver(post_save, sender=Student)
+def update_status_counts_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.assigned_counselor_id, instance.status)
+    previous = getattr(instance, '_counted_state', None)
+    if previous == current:
+        return
+    if previous is not None:
+        StudentStatusCount.adjust(*previous, -1)
+    StudentStatusCount.adjust(*current, 1)
+    instance._counted_state = current
+
+@receiver(post_save, sender=Student)
+def update_search_tokens(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not set(SEARCH_FIELDS) & set(update_fields):
+        return
+    current = tuple(getattr(instance, field) for field in SEARCH_FIELDS)
+    if getattr(instance, '_indexed_state', None) == current:
+        return
+    index_student(instance)
+    instance._indexed_state = current
+
+@receiver(post_delete, sender=Student)
+def update_status_counts_on_delete(sender, instance, **kwargs):
+    StudentStatusCount.adjust(instance.assigned_counselor_id, instance.status, -1)
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def move_status_counts_to_unassigned(sender, instance, **kwargs):
+    # Student.assigned_counselor is SET_NULL, which bypasses the Student signals
+    for counter in StudentStatusCount.objects.filter(counselor=instance):
+        StudentStatusCount.adjust(None, counter.status, counter.count)
+
+@receiver(post_save, sender=StudentRemark)
+@receiver(post_delete, sender=StudentRemark)
+def refresh_student_on_remark_change(sender, instance, raw=False, **kwargs):
+    # Also bumps updated_at: the student detail payload embeds remarks, so its ETag must change with them
+    if raw:
+        return
+    refresh_follow_up(instance.student_id)
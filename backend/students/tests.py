@@ -0,0 +1,357 @@
+from datetime import date
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from applications.models import Application
+
+from .models import Student, StudentRemark, StudentSearchToken, StudentStatusCount
+
+
+def make_student(index, counselor, **fields):
+    values = dict(
+        first_name=f'Student{index}', last_name='Test', email=f'student{index}@example.com',
+        phone=f'+1-555-{index:04d}', date_of_birth=date(2000, 1, 1), gender='other', address='Test',
+        current_education='bachelor', field_of_study='Computer Science', institution='Test College',
+        gpa='3.5/4', graduation_year=2022, preferred_country='Canada', intended_program='master',
+        preferred_field='Computer Science', intake_year='2025', assigned_counselor=counselor,
+    )
+    values.update(fields)
+    return Student.objects.create(**values)
+
+
+class StudentListQueryCountTests(APITestCase):
+    """The list and detail endpoints issue a fixed number of queries, whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counselor = get_user_model().objects.create_user(
+            username='counselor', email='counselor@example.com', password='pw', role='counselor',
+            first_name='Sarah', last_name='Johnson',
+        )
+        cls.students = [make_student(index, cls.counselor) for index in range(60)]
+        for student in cls.students[:5]:
+            for index in range(3):
+                StudentRemark.objects.create(student=student, counselor=cls.counselor, contact_type='call',
+                                             content=f'Remark {index}')
+
+    def setUp(self):
+        self.client.force_authenticate(self.counselor)
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        for page_size in (1, 10, 50):
+            with self.subTest(page_size=page_size):
+                # The page with the counselor joined in; the list validators come from it
+                with self.assertNumQueries(1):
+                    response = self.client.get('/api/students/', {'page_size': page_size})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), page_size)
+                self.assertEqual(response.data['results'][0]['counselor_name'], 'Sarah Johnson')
+                self.assertNotIn('remarks', response.data['results'][0])
+
+    def test_list_query_count_with_filters(self):
+        for page_size in (5, 50):
+            with self.subTest(page_size=page_size):
+                with self.assertNumQueries(1):
+                    response = self.client.get('/api/students/', {'page_size': page_size, 'status': 'inquiry'})
+                self.assertEqual(response.status_code, 200)
+
+    def test_detail_query_count(self):
+        # Validators, the student with its remark count, then the latest remarks with their counselors
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/students/{self.students[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['remarks']), 3)
+
+
+class ConditionalGetTests(APITestCase):
+    """ETags change with what the payload shows, and a 304 skips the work of building it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counselor = get_user_model().objects.create_user(
+            username='counselor', email='counselor@example.com', password='pw', role='counselor',
+            first_name='Sarah', last_name='Johnson',
+        )
+        cls.students = [make_student(index, cls.counselor) for index in range(3)]
+
+    def setUp(self):
+        self.client.force_authenticate(self.counselor)
+
+    def assertChanged(self, path, etag):
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_304_until_a_row_is_deleted(self):
+        etag = self.client.get('/api/students/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/students/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.students[1].delete()
+        self.assertChanged('/api/students/', etag)
+
+    def test_list_etag_changes_on_insert_and_edit(self):
+        etag = self.client.get('/api/students/')['ETag']
+        make_student(3, self.counselor)
+        self.assertChanged('/api/students/', etag)
+        etag = self.client.get('/api/students/')['ETag']
+        self.students[0].first_name = 'Renamed'
+        self.students[0].save()
+        self.assertChanged('/api/students/', etag)
+
+    def test_etags_change_when_the_counselor_is_renamed(self):
+        detail = f'/api/students/{self.students[0].pk}/'
+        list_etag = self.client.get('/api/students/')['ETag']
+        detail_etag = self.client.get(detail)['ETag']
+        self.counselor.first_name = 'Sara'
+        self.counselor.save()
+        self.assertChanged('/api/students/', list_etag)
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['counselor_name'], 'Sara Johnson')
+
+    def test_detail_304_skips_the_remarks(self):
+        detail = f'/api/students/{self.students[0].pk}/'
+        response = self.client.get(detail)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        StudentRemark.objects.create(student=self.students[0], counselor=self.counselor, contact_type='call',
+                                     content='Called')
+        self.assertChanged(detail, response['ETag'])
+
+
+class StudentStatusCountTests(APITestCase):
+    """The counters behind /stats/ follow every write that moves a student between counselors or statuses."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pw',
+                                             role='admin')
+        cls.counselor = User.objects.create_user(username='counselor', email='counselor@example.com',
+                                                 password='pw', role='counselor')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='pw',
+                                             role='counselor')
+
+    def assertCountsMatchStudents(self):
+        counted = {(counter.counselor_id, counter.status): counter.count
+                   for counter in StudentStatusCount.objects.exclude(count=0)}
+        actual = {}
+        for student in Student.objects.all():
+            key = (student.assigned_counselor_id, student.status)
+            actual[key] = actual.get(key, 0) + 1
+        self.assertEqual(counted, actual)
+
+    def stats(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/students/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts_follow_create_status_change_reassignment_and_delete(self):
+        students = [make_student(index, self.counselor) for index in range(3)]
+        self.assertCountsMatchStudents()
+        self.assertEqual(self.stats(self.counselor)['inquiry'], 3)
+
+        students[0].status = 'applied'
+        students[0].save()
+        students[1].assigned_counselor = self.other
+        students[1].save()
+        self.assertCountsMatchStudents()
+        self.assertEqual(self.stats(self.counselor)['applied'], 1)
+        self.assertEqual(self.stats(self.counselor)['inquiry'], 1)
+        self.assertEqual(self.stats(self.other)['inquiry'], 1)
+
+        # A save that changes neither leaves the counts alone
+        students[2].first_name = 'Renamed'
+        students[2].save()
+        students[2].delete()
+        self.assertCountsMatchStudents()
+        self.assertEqual(self.stats(self.admin)['total_students'], 2)
+
+    def test_counselor_delete_moves_counts_to_unassigned(self):
+        make_student(0, self.counselor)
+        make_student(1, self.counselor, status='applied')
+        make_student(2, self.other)
+        self.counselor.delete()
+        self.assertCountsMatchStudents()
+        self.assertEqual(StudentStatusCount.objects.get(counselor=None, status='applied').count, 1)
+        self.assertEqual(self.stats(self.admin)['total_students'], 3)
+
+    def test_failed_counter_update_rolls_back_the_student_write(self):
+        student = make_student(0, self.counselor)
+        student.status = 'applied'
+        with mock.patch.object(StudentStatusCount, 'adjust', side_effect=RuntimeError('counter write failed')):
+            with self.assertRaises(RuntimeError):
+                student.save()
+            with self.assertRaises(RuntimeError):
+                make_student(1, self.counselor)
+        self.assertEqual(Student.objects.get(pk=student.pk).status, 'inquiry')
+        self.assertEqual(Student.objects.count(), 1)
+        self.assertCountsMatchStudents()
+
+
+class StudentSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.counselor = User.objects.create_user(username='counselor', email='counselor@example.com',
+                                                 password='pw', role='counselor')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='pw',
+                                             role='counselor')
+        cls.john = make_student(1, cls.counselor, first_name='John', last_name='Smith',
+                                email='john.smith@gmail.com', phone='+1 555-0101')
+        cls.johanna = make_student(2, cls.counselor, first_name='Johanna', last_name='Smithers',
+                                   email='jo@example.com', phone='+1 555-0102')
+        cls.hidden = make_student(3, cls.other, first_name='John', last_name='Smith', email='john@other.com')
+
+    def setUp(self):
+        self.client.force_authenticate(self.counselor)
+
+    def search(self, query):
+        response = self.client.get('/api/students/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_exact_matches_rank_above_prefix_matches(self):
+        self.assertEqual(self.search('joh smith'), [self.john.pk, self.johanna.pk])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('johanna smith'), [self.johanna.pk])
+        self.assertEqual(self.search('john nobody'), [])
+
+    def test_phone_suffix_and_email_prefix(self):
+        self.assertEqual(self.search('0102'), [self.johanna.pk])
+        self.assertEqual(self.search('smith@gma'), [self.john.pk])
+
+    def test_only_students_in_scope_match(self):
+        self.assertNotIn(self.hidden.pk, self.search('john'))
+
+    def test_tokens_are_rebuilt_only_when_indexed_fields_change(self):
+        tokens = set(StudentSearchToken.objects.filter(student=self.john).values_list('pk', flat=True))
+        self.john.status = 'applied'
+        self.john.save()
+        self.assertEqual(set(StudentSearchToken.objects.filter(student=self.john).values_list('pk', flat=True)),
+                         tokens)
+        self.john.last_name = 'Jones'
+        self.john.save()
+        self.assertEqual(self.search('jones'), [self.john.pk])
+
+
+# (label, path, query params); {pk} is one of the counselor's students
+HOT_PATHS = [
+    ('student list', '/api/students/', {}),
+    ('student list by status', '/api/students/', {'status': 'inquiry'}),
+    ('student detail', '/api/students/{pk}/', {}),
+    ('remark list', '/api/students/remarks/', {}),
+    ('remark list by student', '/api/students/remarks/', {'student': '{pk}'}),
+    ('student stats', '/api/students/stats/', {}),
+]
+
+
+# Indexes the keyset-paginated, per-counselor lists rely on, by model and name
+EXPECTED_INDEXES = [
+    (Student, 'student_counselor_created_idx', ['assigned_counselor', 'created_at']),
+    (Student, 'student_created_idx', ['created_at']),
+    (Student, 'student_status_created_idx', ['status', 'created_at']),
+    (StudentRemark, 'remark_counselor_created_idx', ['counselor', 'created_at']),
+    (StudentRemark, 'remark_student_created_idx', ['student', 'created_at']),
+    (Application, 'app_created_idx', ['created_at']),
+    (Application, 'app_status_created_idx', ['status', 'created_at']),
+    (Application, 'app_student_created_idx', ['student', 'created_at']),
+]
+
+
+class SchemaIndexTests(TestCase):
+    """The indexes and constraints exist in the database, whatever the backend."""
+
+    def get_constraints(self, model):
+        with connection.cursor() as cursor:
+            return connection.introspection.get_constraints(cursor, model._meta.db_table)
+
+    def test_indexes_exist(self):
+        for model, name, fields in EXPECTED_INDEXES:
+            with self.subTest(name):
+                self.assertIn(name, [index.name for index in model._meta.indexes])
+                constraint = self.get_constraints(model).get(name)
+                self.assertIsNotNone(constraint, f'{name} is missing from {model._meta.db_table}')
+                self.assertTrue(constraint['index'])
+                self.assertEqual(constraint['columns'], [model._meta.get_field(field).column for field in fields])
+
+    def test_status_count_constraints_exist(self):
+        constraints = self.get_constraints(StudentStatusCount)
+        self.assertTrue(constraints['status_count_counselor_status_uniq']['unique'])
+        self.assertIn(['counselor_id', 'status'],
+                      [constraint['columns'] for constraint in constraints.values() if constraint['unique']])
+
+    def test_unassigned_status_counts_are_unique(self):
+        # NULL counselors never collide in unique_together; the functional constraint covers them
+        StudentStatusCount.objects.create(counselor=None, status='inquiry', count=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            StudentStatusCount.objects.create(counselor=None, status='inquiry', count=1)
+
+
+@skipUnless(connection.vendor == 'mysql', 'EXPLAIN plans are only checked on MySQL, the production database')
+class QueryPlanTests(APITransactionTestCase):
+    """The queries behind the hot student/remark endpoints use indexes: no full table scans or filesorts."""
+    counselors = 20
+    students_per_counselor = 100
+
+    def setUp(self):
+        # Enough rows over enough counselors that the optimizer prefers the indexes to a scan
+        User = get_user_model()
+        counselors = [
+            User.objects.create_user(username=f'counselor{index}', email=f'counselor{index}@example.com',
+                                     password='pw', role='counselor')
+            for index in range(self.counselors)
+        ]
+        Student.objects.bulk_create([
+            Student(first_name=f'Student{index}', last_name='Test', email=f'student{index}@example.com',
+                    phone='0000000000', date_of_birth=date(2000, 1, 1), gender='other', address='Test',
+                    current_education='bachelor', field_of_study='Computer Science', institution='Test College',
+                    gpa='3.5/4', graduation_year=2022, preferred_country='Canada', intended_program='master',
+                    preferred_field='Computer Science', intake_year='2025',
+                    assigned_counselor=counselors[index % self.counselors])
+            for index in range(self.counselors * self.students_per_counselor)
+        ])
+        StudentRemark.objects.bulk_create([
+            StudentRemark(student=student, counselor_id=student.assigned_counselor_id, contact_type='call',
+                          content=f'Remark {index}')
+            for student in Student.objects.all() for index in range(2)
+        ])
+        with connection.cursor() as cursor:
+            for model in (Student, StudentRemark):
+                cursor.execute(f'ANALYZE TABLE {connection.ops.quote_name(model._meta.db_table)}')
+                cursor.fetchall()
+        self.counselor = counselors[0]
+        self.student = Student.objects.filter(assigned_counselor=self.counselor).first()
+        self.client.force_authenticate(self.counselor)
+
+    def test_hot_paths_use_indexes(self):
+        for label, path, params in HOT_PATHS:
+            with self.subTest(label):
+                path = path.format(pk=self.student.pk)
+                params = {key: value.format(pk=self.student.pk) for key, value in params.items()}
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(path, params)
+                self.assertEqual(response.status_code, 200)
+                problems = [
+                    f'{issue}: {query["sql"]}'
+                    for query in queries.captured_queries if query['sql'].lstrip().upper().startswith('SELECT')
+                    for issue in self._explain(query['sql'])
+                ]
+                self.assertEqual(problems, [])
+
+    def _explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql)
+            columns = [column[0] for column in cursor.description]
+            for row in cursor.fetchall():
+                plan = dict(zip(columns, row))
+                if plan.get('type') == 'ALL':
+                    yield f"full scan on {plan.get('table')}"
+                if 'Using filesort' in (plan.get('Extra') or ''):
+                    yield f"filesort on {plan.get('table')}"
@@ -3,8 +3,14 @@ from . import views
 
 urlpatterns = [
     path('', views.StudentListCreateView.as_view(), name='student_list_create'),
+    path('export/', views.StudentExportView.as_view(), name='student_export'),
     path('<int:pk>/', views.StudentDetailView.as_view(), name='student_detail'),
+    path('<int:pk>/remarks/', views.StudentRemarksView.as_view(), name='student_remarks'),
+    path('<int:pk>/matches/', views.student_matches, name='student_matches'),
     path('remarks/', views.StudentRemarkListCreateView.as_view(), name='remark_list_create'),
+    path('remarks/export/', views.StudentRemarkExportView.as_view(), name='remark_export'),
     path('remarks/<int:pk>/', views.StudentRemarkDetailView.as_view(), name='remark_detail'),
     path('stats/', views.student_stats, name='student_stats'),
+    path('follow-ups/', views.student_follow_ups, name='student_follow_ups'),
+    path('import/', views.student_import, name='student_import'),
 ]
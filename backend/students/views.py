@@ -1,16 +1,46 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes, throttle_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.db.models import Count, Prefetch, Sum
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import Student, StudentRemark
-from .serializers import StudentSerializer, StudentCreateSerializer, StudentRemarkSerializer
+from rest_framework.filters import OrderingFilter
+from study_abroad_crm.conditional import ConditionalGetMixin
+from study_abroad_crm.pagination import KeysetPagination
+from study_abroad_crm.throttling import ImportRateThrottle, UserWriteRateThrottle
+from universities.matching import match_student
+from .filters import StudentFilter, StudentSearchFilter, RankedOrderingFilter
+from .followups import follow_up_queue
+from .importer import DUPLICATE_POLICIES, StudentImporter, detect_format, iter_rows
+from .export import (EXPORT_FORMATS, STUDENT_EXPORT_FIELDS, STUDENT_EXPORT_RELATED, REMARK_EXPORT_FIELDS,
+                     REMARK_EXPORT_RELATED, export_rows, streaming_export)
+from .models import Student, StudentRemark, StudentStatusCount
+from .serializers import (StudentSerializer, StudentListSerializer, StudentCreateSerializer,
+                          StudentRemarkSerializer, FollowUpSerializer)
 
-class StudentListCreateView(generics.ListCreateAPIView):
+RECENT_REMARKS_LIMIT = 5
+
+def scoped_students(user):
+    if user.role == 'admin':
+        return Student.objects.all()
+    elif user.role in ['counselor', 'employee']:
+        return Student.objects.filter(assigned_counselor=user)
+    return Student.objects.none()
+
+def scoped_remarks(user):
+    if user.role == 'admin':
+        return StudentRemark.objects.all()
+    return StudentRemark.objects.filter(counselor=user)
+
+class StudentListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['status', 'preferred_country', 'assigned_counselor']
+    related_modified_fields = ('assigned_counselor__updated_at',)
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, StudentSearchFilter, RankedOrderingFilter]
+    filterset_class = StudentFilter
     search_fields = ['first_name', 'last_name', 'email', 'phone']
     ordering_fields = ['created_at', 'updated_at', 'first_name', 'last_name']
     ordering = ['-created_at']
@@ -18,18 +48,15 @@ class StudentListCreateView(generics.ListCreateAPIView):
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return StudentCreateSerializer
-        return StudentSerializer
+        return StudentListSerializer
     
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'admin':
-            return Student.objects.all()
-        elif user.role in ['counselor', 'employee']:
-            return Student.objects.filter(assigned_counselor=user)
-        return Student.objects.none()
-
-class StudentDetailView(generics.RetrieveUpdateDestroyAPIView):
+        # The summary representation only renders the counselor's name
+        return scoped_students(self.request.user).select_related('assigned_counselor')
+
+class StudentDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    related_modified_fields = ('assigned_counselor__updated_at',)
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -37,56 +64,183 @@ class StudentDetailView(generics.RetrieveUpdateDestroyAPIView):
         return StudentSerializer
     
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'admin':
-            return Student.objects.all()
-        elif user.role in ['counselor', 'employee']:
-            return Student.objects.filter(assigned_counselor=user)
-        return Student.objects.none()
-
-class StudentRemarkListCreateView(generics.ListCreateAPIView):
+        queryset = scoped_students(self.request.user).select_related('assigned_counselor')
+        if self.request.method == 'GET':
+            # Sliced prefetch: one ROW_NUMBER() query keeps the latest N remarks per student
+            remarks = StudentRemark.objects.select_related('counselor').order_by('-created_at', '-id')
+            queryset = queryset.annotate(remarks_count=Count('remarks')).prefetch_related(
+                Prefetch('remarks', queryset=remarks[:RECENT_REMARKS_LIMIT], to_attr='recent_remarks')
+            )
+        return queryset
+
+class StudentExportView(StudentListCreateView):
+    """Streams every student matching the list view's scoping, filters, search and ordering."""
+    http_method_names = ['get', 'options']
+    throttle_scope = 'export'
+    
+    def get(self, request, *args, **kwargs):
+        return export_response(self, STUDENT_EXPORT_FIELDS, STUDENT_EXPORT_RELATED, 'students')
+
+class StudentRemarksView(ConditionalGetMixin, generics.ListAPIView):
+    """Full, paginated remark history of one student the user can see."""
+    serializer_class = StudentRemarkSerializer
+    permission_classes = [IsAuthenticated]
+    related_modified_fields = ('counselor__updated_at',)
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['contact_type', 'priority']
+    ordering_fields = ['created_at', 'contact_type', 'priority']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        student = get_object_or_404(scoped_students(self.request.user).only('pk'), pk=self.kwargs['pk'])
+        return StudentRemark.objects.filter(student=student).select_related('counselor')
+
+class StudentRemarkListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = StudentRemarkSerializer
     permission_classes = [IsAuthenticated]
+    related_modified_fields = ('counselor__updated_at',)
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['student', 'contact_type', 'priority']
+    ordering_fields = ['created_at', 'contact_type', 'priority']
     ordering = ['-created_at']
     
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'admin':
-            return StudentRemark.objects.all()
-        return StudentRemark.objects.filter(counselor=user)
+        return scoped_remarks(self.request.user).select_related('counselor')
     
     def perform_create(self, serializer):
         serializer.save(counselor=self.request.user)
 
-class StudentRemarkDetailView(generics.RetrieveUpdateDestroyAPIView):
+class StudentRemarkExportView(StudentRemarkListCreateView):
+    """Streams every remark matching the list view's scoping, filters and ordering."""
+    http_method_names = ['get', 'options']
+    throttle_scope = 'export'
+    
+    def get(self, request, *args, **kwargs):
+        return export_response(self, REMARK_EXPORT_FIELDS, REMARK_EXPORT_RELATED, 'remarks')
+
+class StudentRemarkDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = StudentRemarkSerializer
     permission_classes = [IsAuthenticated]
+    related_modified_fields = ('counselor__updated_at',)
     
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'admin':
-            return StudentRemark.objects.all()
-        return StudentRemark.objects.filter(counselor=user)
+        return scoped_remarks(self.request.user).select_related('counselor')
+
+def export_response(view, fields, related, filename):
+    file_format = view.request.query_params.get('file_format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        return Response({'file_format': [f'Must be one of {list(EXPORT_FORMATS)}.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+    queryset = view.filter_queryset(view.get_queryset())
+    # Same ordering, including the primary-key tiebreak, as the paginated list
+    ordering = KeysetPagination().get_ordering(view.request, queryset, view)
+    columns = fields + list(related)
+    return streaming_export(export_rows(queryset, ordering, fields, related), columns, file_format, filename)
+
+def status_totals(user):
+    """(status, total) rows from the per-counselor counters maintained by students.signals."""
+    if user.role == 'admin':
+        counters = StudentStatusCount.objects.all()
+    elif user.role in ['counselor', 'employee']:
+        counters = StudentStatusCount.objects.filter(counselor=user)
+    else:
+        counters = StudentStatusCount.objects.none()
+    return counters.values('status').annotate(total=Sum('count')).values_list('status', 'total')
+
+def stats_payload(totals):
+    stats = {'total_students': sum(totals.values())}
+    for status_value, _ in Student.STATUS_CHOICES:
+        stats[status_value] = totals.get(status_value, 0)
+    return stats
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def student_stats(request):
-    user = request.user
+    return Response(stats_payload(dict(status_totals(request.user))))
+
+MAX_FOLLOW_UPS_PER_BUCKET = 500
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def student_follow_ups(request):
+    queryset = scoped_students(request.user)
+    counselor = request.query_params.get('counselor')
+    if counselor and request.user.role == 'admin':
+        try:
+            queryset = queryset.filter(assigned_counselor=int(counselor))
+        except ValueError:
+            return Response({'counselor': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
     
-    if user.role == 'admin':
-        queryset = Student.objects.all()
-    else:
-        queryset = Student.objects.filter(assigned_counselor=user)
-    
-    stats = {
-        'total_students': queryset.count(),
-        'inquiry': queryset.filter(status='inquiry').count(),
-        'document_review': queryset.filter(status='document_review').count(),
-        'applied': queryset.filter(status='applied').count(),
-        'visa_approved': queryset.filter(status='visa_approved').count(),
-        'enrolled': queryset.filter(status='enrolled').count(),
-    }
-    
-    return Response(stats)
+    try:
+        limit = min(int(request.query_params.get('limit', 100)), MAX_FOLLOW_UPS_PER_BUCKET)
+    except ValueError:
+        return Response({'limit': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        return Response({'limit': ['Must be at least 1.']}, status=status.HTTP_400_BAD_REQUEST)
+    
+    today = timezone.localdate()
+    queue = follow_up_queue(queryset, today=today, limit=limit)
+    response = {'date': today}
+    for bucket, entries in queue.items():
+        response[bucket] = {
+            'count': entries['count'],
+            'results': FollowUpSerializer(entries['results'], many=True).data,
+        }
+    return Response(response)
+
+MAX_MATCHES = 50
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def student_matches(request, pk):
+    student = get_object_or_404(scoped_students(request.user), pk=pk)
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), MAX_MATCHES)
+    except ValueError:
+        return Response({'limit': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        return Response({'limit': ['Must be at least 1.']}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Every program in the catalogue is scored in one vectorized pass (see universities.matching)
+    return Response({'student': student.pk, 'matches': match_student(student, limit=limit)})
+
+MAX_REPORTED_IMPORT_ERRORS = 1000
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+@throttle_classes([UserWriteRateThrottle, ImportRateThrottle])
+def student_import(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'file': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+    
+    on_duplicate = request.query_params.get('on_duplicate', 'skip')
+    if on_duplicate not in DUPLICATE_POLICIES:
+        return Response({'on_duplicate': [f'Must be one of {DUPLICATE_POLICIES}.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        file_format = detect_format(upload.name, request.query_params.get('file_format'))
+    except ValueError as exc:
+        return Response({'file_format': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+    
+    errors = []
+    
+    def collect(error):
+        if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+            errors.append(error)
+    
+    # Non-admins can only import leads for themselves
+    counselor = None if request.user.role == 'admin' else request.user
+    importer = StudentImporter(on_duplicate=on_duplicate, counselor=counselor, on_error=collect,
+                               students=scoped_students(request.user))
+    # Django has already spooled large uploads to a temporary file; rows are read from it lazily
+    totals = importer.run(iter_rows(upload, file_format))
+    
+    return Response({
+        **totals,
+        'errors': errors,
+        'errors_truncated': totals['failed'] > len(errors),
+    })
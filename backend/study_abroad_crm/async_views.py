@@ -0,0 +1,141 @@
+"""
+Async, read-only counterparts of DRF views, for ASGI deployments.
+
+DRF 3.14 views are synchronous, so under ASGI each request runs entirely in
+a worker thread. These views are native ``async def`` Django views that wrap
+an existing DRF view class and reuse its scoping, filters, pagination,
+serializer and conditional-GET validators:
+
+- authentication goes through ``aauthenticate`` (see
+  accounts.authentication.CachedJWTAuthentication), so a cached or
+  claims-based user needs no thread or query;
+- the queries run through Django's async ORM;
+- permissions and throttles are checked on the event loop. The default
+  throttles never touch the cache for safe methods.
+
+Building the queryset (``get_queryset`` / ``filter_queryset``) can itself
+query, e.g. to check that a filter value exists, so that step runs in
+``sync_to_async``.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import prefetch_related_objects
+from django.http import Http404, HttpResponseNotModified
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.response import Response
+
+from .conditional import ConditionalGetMixin
+
+
+class AsyncAPIView(View):
+    view_class = None
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, *args, **kwargs):
+        view = self.view_class()
+        view.args = args
+        view.kwargs = kwargs
+        request = view.initialize_request(request, *args, **kwargs)
+        view.request = request
+        view.headers = view.default_response_headers
+
+        try:
+            await self.initial(view, request, *args, **kwargs)
+            response = await self.handle(view, request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+
+        response = view.finalize_response(request, response, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    async def initial(self, view, request, *args, **kwargs):
+        # APIView.initial() with authentication awaited
+        view.format_kwarg = view.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = view.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = view.determine_version(request, *args, **kwargs)
+        await self.authenticate(request)
+        view.check_permissions(request)
+        view.check_throttles(request)
+
+    async def authenticate(self, request):
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def handle(self, view, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def get_queryset(self, view):
+        return await sync_to_async(lambda: view.filter_queryset(view.get_queryset()))()
+
+    async def conditional(self, view, request, validators, build_response):
+        """ConditionalGetMixin._conditional() for an async ``build_response``."""
+        if validators is None:
+            return await build_response()
+        response = view.precondition_response(request, validators)
+        if response is None:
+            response = await build_response()
+        elif not isinstance(response, HttpResponseNotModified):
+            return response
+        return view.set_validators(response, validators)
+
+
+class AsyncListView(AsyncAPIView):
+    async def handle(self, view, request, *args, **kwargs):
+        queryset = await self.get_queryset(view)
+        paginator = view.paginator
+        page = None
+        if paginator is not None:
+            # As in ConditionalGetMixin.list(), the prefetches wait until the page is serialized
+            page = await paginator.apaginate_queryset(queryset.prefetch_related(None), request, view=view)
+        if page is None:
+            serializer = view.get_serializer([row async for row in queryset], many=True)
+            return Response(serializer.data)
+        validators = None
+        if isinstance(view, ConditionalGetMixin):
+            validators = view.list_validators(request, page)
+
+        async def build_response():
+            await sync_to_async(prefetch_related_objects)(page, *queryset._prefetch_related_lookups)
+            serializer = view.get_serializer(page, many=True)
+            return view.get_paginated_response(serializer.data)
+
+        return await self.conditional(view, request, validators, build_response)
+
+
+class AsyncRetrieveView(AsyncAPIView):
+    async def handle(self, view, request, *args, **kwargs):
+        queryset = await self.get_queryset(view)
+        validators = None
+        if isinstance(view, ConditionalGetMixin):
+            validators = await view.aretrieve_validators(request, queryset, kwargs)
+            if validators is None:
+                raise Http404
+
+        async def build_response():
+            instance = await self.get_object(view, queryset)
+            return Response(view.get_serializer(instance).data)
+
+        return await self.conditional(view, request, validators, build_response)
+
+    async def get_object(self, view, queryset):
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            instance = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError):
+            raise Http404
+        view.check_object_permissions(view.request, instance)
+        return instance
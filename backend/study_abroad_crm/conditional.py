@@ -0,0 +1,124 @@
+"""
+Conditional GET (ETag / Last-Modified) for DRF list and detail views.
+
+Detail validators come from a one-row query on the view's
+``last_modified_field`` and ``related_modified_fields``, so a matching
+If-None-Match or If-Modified-Since returns 304 before the row is loaded
+with its prefetches or serialized.
+
+List validators come from the page itself: it is loaded without its
+prefetches, and the ETag is built from each row's primary key and
+timestamps plus whether there are pages before and after it. That costs
+nothing beyond the page query the response needs anyway, so no extra
+scan of the filtered queryset. Inserts, deletes and edits that change
+what the page shows change the ETag; a 304 skips the prefetches and the
+serialization. Lists have no Last-Modified, since a delete does not move
+any remaining row's timestamp.
+
+Payloads that render fields of related rows, such as the counselor's name,
+list those rows' timestamps in ``related_modified_fields`` (lookups from
+the view's model, which the queryset must select_related). Embedded
+collections are not covered this way: their writes bump the parent's own
+timestamp instead (see students.signals and applications.signals).
+"""
+import hashlib
+from calendar import timegm
+
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    last_modified_field = 'updated_at'
+    related_modified_fields = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.prefetch_related(None))
+        if page is None:
+            return super().list(request, *args, **kwargs)
+        validators = self.list_validators(request, page)
+
+        def build_response(request, *args, **kwargs):
+            prefetch_related_objects(page, *queryset._prefetch_related_lookups)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+        return self._conditional(request, validators, build_response, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        modified = self._last_modified_queryset(queryset, kwargs).first()
+        if modified is None:
+            # Missing (or out of scope): let the regular path raise the 404
+            return super().retrieve(request, *args, **kwargs)
+        validators = self._retrieve_validators(request, modified, kwargs)
+        return self._conditional(request, validators, super().retrieve, *args, **kwargs)
+
+    async def aretrieve_validators(self, request, queryset, kwargs):
+        """Validators for the detail row in async views, or None if it is missing or out of scope."""
+        modified = await self._last_modified_queryset(queryset, kwargs).afirst()
+        if modified is None:
+            return None
+        return self._retrieve_validators(request, modified, kwargs)
+
+    def list_validators(self, request, page):
+        """Validators for ``page``, the rows the paginator returned."""
+        paginator = self.paginator
+        # The page and filters come from the query string and the scoping from the user
+        parts = [request.get_full_path(), request.user.pk, paginator.has_previous, paginator.has_next,
+                 paginator.count]
+        for row in page:
+            parts.append(row.pk)
+            parts.extend(_related_value(row, field) for field in self._modified_fields())
+        # No Last-Modified: it does not change when a row is deleted
+        return _etag(parts), None
+
+    def _modified_fields(self):
+        return (self.last_modified_field, *self.related_modified_fields)
+
+    def _last_modified_queryset(self, queryset, kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return queryset.prefetch_related(None).filter(**{self.lookup_field: kwargs[lookup_url_kwarg]}).values_list(
+            *self._modified_fields()
+        )
+
+    def _retrieve_validators(self, request, modified, kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        etag = _etag([*modified, kwargs[lookup_url_kwarg], self.get_serializer_class().__name__, request.user.pk])
+        last_modified = max((value for value in modified if value is not None), default=None)
+        return etag, timegm(last_modified.utctimetuple()) if last_modified else None
+
+    def _conditional(self, request, validators, build_response, *args, **kwargs):
+        response = self.precondition_response(request, validators)
+        if response is None:
+            response = build_response(request, *args, **kwargs)
+        elif not isinstance(response, HttpResponseNotModified):
+            return response
+        return self.set_validators(response, validators)
+
+    def precondition_response(self, request, validators):
+        """The 304 or 412 response the request's conditional headers call for, if any."""
+        etag, timestamp = validators
+        return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    def set_validators(self, response, validators):
+        etag, timestamp = validators
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+def _etag(parts):
+    return quote_etag(hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+def _related_value(instance, field):
+    for attr in field.split('__'):
+        if instance is None:
+            return None
+        instance = getattr(instance, attr)
+    return instance
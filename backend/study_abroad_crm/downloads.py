@@ -0,0 +1,191 @@
+"""
+Protected file downloads.
+
+Media files have no public URL. A view checks that the user may see the row
+that owns the file, then file_response() hands the transfer to whatever can
+do it without a Python loop, per PROTECTED_DOWNLOADS['MODE']:
+
+- 'x-accel-redirect': an empty response with an X-Accel-Redirect header.
+  nginx serves the file from an ``internal`` location that maps
+  ACCEL_PREFIX to MEDIA_ROOT, and handles ranges and conditional requests.
+- 'x-sendfile': the same with X-Sendfile and the absolute path, for Apache
+  mod_xsendfile or lighttpd.
+- 'sendfile' (default): a FileResponse. WSGI servers with a
+  ``wsgi.file_wrapper`` (gunicorn, uWSGI) send it with sendfile(2).
+- 'stream': a generator reading CHUNK_SIZE blocks.
+
+In the last two modes Django answers conditional requests itself (ETag and
+Last-Modified; 304 or 412). It also answers a single HTTP Range (206 or 416)
+by streaming the range in chunks, since a file wrapper only sends whole
+files. Responses are ``private, no-cache``: they depend on the user, and
+clients revalidate them cheaply with If-None-Match.
+"""
+import hashlib
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+DEFAULTS = {
+    'MODE': 'sendfile',
+    'ACCEL_PREFIX': '/protected-media/',
+    'CHUNK_SIZE': 256 * 1024,
+}
+MODES = ['sendfile', 'stream', 'x-accel-redirect', 'x-sendfile']
+
+
+def get_download_setting(name):
+    return getattr(settings, 'PROTECTED_DOWNLOADS', {}).get(name, DEFAULTS[name])
+
+
+class DownloadRenderer(JSONRenderer):
+    """Lets download views accept any Accept header; their error responses are still JSON."""
+    media_type = '*/*'
+    format = 'download'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+def file_response(request, field_file, filename, etag=None, as_attachment=True):
+    """
+    Response sending ``field_file`` as ``filename``. ``etag`` is a quoted
+    ETag for the content, e.g. its hash; by default one is derived from the
+    name, size and modification time.
+    """
+    if not field_file:
+        raise Http404
+    storage = field_file.storage
+    name = field_file.name
+    path = _path(storage, name)
+    size, modified = _stat(storage, name, path)
+    etag = etag or quote_etag(hashlib.md5(f'{name}:{size}:{modified}'.encode()).hexdigest())
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    mode = get_download_setting('MODE')
+    if mode not in MODES:
+        raise ImproperlyConfigured(f'PROTECTED_DOWNLOADS["MODE"] must be one of {MODES}')
+
+    if mode == 'x-accel-redirect' or (mode == 'x-sendfile' and path):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = get_download_setting('ACCEL_PREFIX') + quote(name)
+        else:
+            response['X-Sendfile'] = path
+        return _finish(response, filename, as_attachment)
+
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is None:
+        byte_range = None
+        if request.headers.get('Range') and _if_range_matches(request, etag, modified):
+            byte_range = parse_range(request.headers['Range'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read(storage.open(name, 'rb'), start, end - start + 1),
+                                             status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        elif mode == 'stream':
+            response = StreamingHttpResponse(_read(storage.open(name, 'rb'), 0, size), content_type=content_type)
+            response['Content-Length'] = size
+        else:
+            response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+            response.block_size = get_download_setting('CHUNK_SIZE')
+    response['ETag'] = etag
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified)
+    response['Accept-Ranges'] = 'bytes'
+    return _finish(response, filename, as_attachment)
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, inclusive; None to send the
+    whole file instead (malformed, or several ranges); False if it cannot be
+    satisfied.
+    """
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, dash, last = spec.strip().partition('-')
+    if not dash:
+        return None
+    try:
+        if not first:
+            # "bytes=-500": the last 500 bytes
+            length = int(last)
+            return (max(size - length, 0), size - 1) if length > 0 and size else False
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request, etag, modified):
+    # A Range with a stale If-Range validator gets the whole, current file
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    if validator.startswith(('"', 'W/')):
+        return validator == etag and not etag.startswith('W/')
+    return modified is not None and parse_http_date_safe(validator) == int(modified)
+
+
+def _path(storage, name):
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def _stat(storage, name, path):
+    if path is not None:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise Http404
+        return stat.st_size, int(stat.st_mtime)
+    if not storage.exists(name):
+        raise Http404
+    try:
+        modified = int(storage.get_modified_time(name).timestamp())
+    except NotImplementedError:
+        modified = None
+    return storage.size(name), modified
+
+
+def _read(handle, start, length):
+    chunk_size = get_download_setting('CHUNK_SIZE')
+    try:
+        handle.seek(start)
+        while length > 0:
+            data = handle.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        handle.close()
+
+
+def _finish(response, filename, as_attachment):
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Authorization'])
+    return response
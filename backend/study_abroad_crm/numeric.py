@@ -0,0 +1,226 @@
+"""
+Numeric shadow columns for free-text money and score fields.
+
+Fees, budgets, GPAs and test scores are stored as the text users typed
+("$45,000 - $65,000", "3.6/4", "IELTS 7.5"). Models using
+NumericColumnsMixin keep parsed, indexed copies next to that text, refilled
+on every save(), so range filters run in SQL instead of parsing strings in
+Python:
+
+- MoneyColumns: ``<prefix>_min``, ``<prefix>_max`` and ``<prefix>_currency``
+  (an ISO code; a bare "$" is taken as USD)
+- ScoreColumns: ``<prefix>_value``, ``<prefix>_scale`` and ``<prefix>_percent``,
+  the value as a percentage of the scale, which compares GPAs given on
+  different scales
+
+Text that cannot be parsed leaves the columns NULL. bulk_create, bulk_update
+and QuerySet.update() skip save(), so callers using them call
+fill_numeric_columns() themselves; the backfill_numeric_columns command
+repairs rows written any other way.
+"""
+import re
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+Money = namedtuple('Money', ['min', 'max', 'currency'])
+Score = namedtuple('Score', ['value', 'scale'])
+
+NO_MONEY = Money(None, None, None)
+NO_SCORE = Score(None, None)
+
+# Largest values the shadow columns can hold: DecimalField(max_digits=12) and (max_digits=7), 2 decimal places
+MAX_AMOUNT = Decimal('9999999999.99')
+MAX_SCORE = Decimal('99999.99')
+CENT = Decimal('0.01')
+
+CURRENCY_CODES = {'USD', 'CAD', 'AUD', 'NZD', 'GBP', 'EUR', 'INR', 'SGD', 'CHF', 'SEK', 'JPY', 'CNY', 'AED'}
+CURRENCY_SYMBOLS = [
+    # Longest first, so "CA$" wins over "$"
+    ('NZ$', 'NZD'), ('AU$', 'AUD'), ('CA$', 'CAD'), ('US$', 'USD'), ('A$', 'AUD'), ('C$', 'CAD'),
+    ('S$', 'SGD'), ('Rs', 'INR'), ('£', 'GBP'), ('€', 'EUR'), ('₹', 'INR'), ('¥', 'JPY'), ('$', 'USD'),
+]
+CURRENCY_CODE_RE = re.compile(r'\b(' + '|'.join(sorted(CURRENCY_CODES)) + r')\b', re.IGNORECASE)
+FREE_RE = re.compile(r'\b(free|no fee|waived|none)\b', re.IGNORECASE)
+MULTIPLIERS = {
+    'k': 1000, 'm': 1000000, 'mn': 1000000, 'million': 1000000,
+    'lakh': 100000, 'lakhs': 100000, 'lac': 100000, 'lacs': 100000, 'cr': 10000000, 'crore': 10000000,
+}
+AMOUNT_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*(' + '|'.join(sorted(MULTIPLIERS, key=len, reverse=True)) + r')?\b',
+                       re.IGNORECASE)
+# What may sit between the two ends of a range: "$45,000 - $65,000", "20k to 30k", "CAD 15,000 – CAD 20,000"
+RANGE_SEPARATOR_RE = re.compile(r'^\s*(?:-|–|—|to)\s*(?:[A-Z]{2,3}\s*)?(?:[^\w\s]{1,2})?\s*$', re.IGNORECASE)
+
+NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+FRACTION_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:/|out of)\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+PERCENT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+GPA_SCALES = [4, 5, 10, 100]
+
+TEST_SCALES = {'ielts': 9, 'toefl': 120, 'pte': 90, 'duolingo': 160}
+ENGLISH_TESTS = list(TEST_SCALES)
+TEST_NAME_RE = re.compile(r'\b(ielts|toefl|pte|duolingo)\b', re.IGNORECASE)
+# A test name and the first number after it: "IELTS: 6.5", "TOEFL iBT 89"
+ENGLISH_TEST_RE = re.compile(r'\b(ielts|toefl|pte|duolingo)\b\D{0,20}?(\d+(?:\.\d+)?)', re.IGNORECASE)
+
+
+def _decimal(text):
+    try:
+        return Decimal(text.replace(',', ''))
+    except InvalidOperation:
+        return None
+
+
+def parse_currency(text):
+    match = CURRENCY_CODE_RE.search(text)
+    if match:
+        return match.group(1).upper()
+    for symbol, code in CURRENCY_SYMBOLS:
+        if symbol in text:
+            return code
+    return None
+
+
+def parse_money(text):
+    """Money(min, max, currency) from "$45,000 - $65,000", "CAD 20k", "Free"; a single amount is both min and max."""
+    text = (text or '').strip()
+    amounts = list(AMOUNT_RE.finditer(text))
+    currency = parse_currency(text)
+    if not amounts:
+        return Money(Decimal('0.00'), Decimal('0.00'), currency) if FREE_RE.search(text) else NO_MONEY
+
+    low = _decimal(amounts[0].group(1))
+    high = low
+    low_multiplier = MULTIPLIERS.get((amounts[0].group(2) or '').lower(), 1)
+    high_multiplier = low_multiplier
+    if len(amounts) > 1 and RANGE_SEPARATOR_RE.match(text[amounts[0].end():amounts[1].start()]):
+        high = _decimal(amounts[1].group(1))
+        high_multiplier = MULTIPLIERS.get((amounts[1].group(2) or '').lower(), 1)
+        if amounts[0].group(2) is None and low is not None and high is not None and low < high:
+            # "20-30k" is 20k to 30k
+            low_multiplier = high_multiplier
+    if low is None or high is None:
+        return NO_MONEY
+
+    low, high = sorted([low * low_multiplier, high * high_multiplier])
+    if high > MAX_AMOUNT:
+        return NO_MONEY
+    return Money(low.quantize(CENT), high.quantize(CENT), currency)
+
+
+def _score(value, scale):
+    value = _decimal(value) if isinstance(value, str) else value
+    if value is None or value > MAX_SCORE or (scale is not None and (scale <= 0 or value > scale)):
+        return NO_SCORE
+    return Score(value.quantize(CENT), None if scale is None else Decimal(scale).quantize(CENT))
+
+
+def parse_gpa(text):
+    """Score(value, scale) from "3.6/4", "8.2 out of 10", "85%"; a bare number gets the smallest usual scale it fits."""
+    text = text or ''
+    match = FRACTION_RE.search(text)
+    if match:
+        return _score(match.group(1), _decimal(match.group(2)))
+    match = PERCENT_RE.search(text)
+    if match:
+        return _score(match.group(1), 100)
+    match = NUMBER_RE.search(text)
+    if match is None:
+        return NO_SCORE
+    value = _decimal(match.group(0))
+    scale = next((scale for scale in GPA_SCALES if value <= scale), None)
+    return _score(value, scale) if scale else NO_SCORE
+
+
+def parse_test_score(text, test_name=''):
+    """Score(value, scale) from "IELTS 7.5" or "7.5" with ``test_name`` "IELTS"; the scale is that test's maximum."""
+    text = text or ''
+    named = TEST_NAME_RE.search(text)
+    test = english_test_name(text, test_name)
+    scale = TEST_SCALES[test] if test else None
+    # The score follows the test name: "IELTS 7.5 (2023)"
+    number = NUMBER_RE.search(text, named.end() if named else 0)
+    if number is None:
+        return NO_SCORE
+    return _score(number.group(0), scale)
+
+
+def english_test_name(*texts):
+    """The first English test named in any of ``texts`` ("ielts", "toefl", ...), or None."""
+    for text in texts:
+        match = TEST_NAME_RE.search(text or '')
+        if match:
+            return match.group(1).lower()
+    return None
+
+
+def parse_english_tests(text):
+    """{'ielts': Decimal('6.50'), 'toefl': Decimal('89.00')} from "IELTS: 6.5, TOEFL: 89"; out-of-scale scores are dropped."""
+    minimums = {}
+    for test, value in ENGLISH_TEST_RE.findall(text or ''):
+        score = _score(value, TEST_SCALES[test.lower()])
+        if score.value is not None:
+            minimums.setdefault(test.lower(), score.value)
+    return minimums
+
+
+def percent(score):
+    if score.value is None or not score.scale:
+        return None
+    return (score.value * 100 / score.scale).quantize(CENT)
+
+
+class MoneyColumns:
+    def __init__(self, source, prefix):
+        self.sources = [source]
+        self.prefix = prefix
+        self.columns = [f'{prefix}_min', f'{prefix}_max', f'{prefix}_currency']
+
+    def values(self, instance):
+        return dict(zip(self.columns, parse_money(getattr(instance, self.sources[0]))))
+
+
+class ScoreColumns:
+    def __init__(self, parser, prefix, *sources):
+        self.parser = parser
+        self.sources = list(sources)
+        self.prefix = prefix
+        self.columns = [f'{prefix}_value', f'{prefix}_scale', f'{prefix}_percent']
+
+    def values(self, instance):
+        score = self.parser(*(getattr(instance, source) for source in self.sources))
+        return dict(zip(self.columns, [score.value, score.scale, percent(score)]))
+
+
+class NumericColumnsMixin:
+    """Refills the ``numeric_columns`` shadow columns from their source fields on save()."""
+    numeric_columns = []
+
+    @classmethod
+    def numeric_column_names(cls, sources=None):
+        """Shadow columns derived from any of ``sources`` (all of them by default)."""
+        return [column for spec in cls.numeric_columns
+                if sources is None or set(spec.sources) & set(sources) for column in spec.columns]
+
+    def fill_numeric_columns(self, sources=None):
+        """Reparse the source fields and return the names of the columns whose value changed."""
+        changed = []
+        # A deferred source was neither loaded nor assigned, so its columns are still current
+        deferred = self.get_deferred_fields()
+        for spec in self.numeric_columns:
+            if sources is not None and not set(spec.sources) & set(sources):
+                continue
+            if deferred & set(spec.sources):
+                continue
+            for column, value in spec.values(self).items():
+                if getattr(self, column) != value:
+                    setattr(self, column, value)
+                    changed.append(column)
+        return changed
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.fill_numeric_columns()
+        else:
+            self.fill_numeric_columns(update_fields)
+            kwargs['update_fields'] = set(update_fields) | set(self.numeric_column_names(update_fields))
+        super().save(*args, **kwargs)
@@ -0,0 +1,198 @@
+"""
+Keyset pagination shared by the high-volume list endpoints.
+"""
+import json
+from collections import OrderedDict
+from functools import reduce
+import operator
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the full ordering plus the primary key.
+
+    DRF's CursorPagination only filters on the first ordering field and falls
+    back to an OFFSET for ties. Here the cursor stores the value of every
+    ordering field and the primary key, so each page is a single indexed range
+    scan no matter how deep it is, and rows inserted while paging neither
+    shift nor duplicate the following pages. The ordering fields must be
+    non-null.
+
+    The total count is left out by default because it needs a COUNT(*) over
+    the scoped queryset; pass ``?count=true`` to include it.
+    """
+    ordering = '-created_at'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self._prepare(queryset, request, view)
+        if page_queryset is None:
+            return None
+        if self._count_requested(request):
+            self.count = queryset.count()
+        return self._finish(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, running the queries through the async ORM."""
+        page_queryset = self._prepare(queryset, request, view)
+        if page_queryset is None:
+            return None
+        if self._count_requested(request):
+            self.count = await queryset.acount()
+        return self._finish([row async for row in page_queryset])
+
+    def _count_requested(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+    def _prepare(self, queryset, request, view):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor.reverse
+        self.position = self.cursor.position if self.cursor is not None else None
+        self.count = None
+
+        if self.reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.position is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, self.position, self.reverse))
+
+        return queryset[:self.page_size + 1]
+
+    def _finish(self, results):
+        self.page = results[:self.page_size]
+        has_more = len(results) > len(self.page)
+
+        if self.reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        pk_name = queryset.model._meta.pk.name
+        if not any(field.lstrip('-') in ('pk', pk_name) for field in ordering):
+            # Break ties on the primary key in the same direction as the
+            # leading field so the composite (field, pk) index can serve it
+            ordering.append('-' + pk_name if ordering[0].startswith('-') else pk_name)
+        return tuple(ordering)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            position = json.dumps(self.cursor.position)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = json.dumps(self.cursor.position)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+            response.move_to_end('count', last=False)
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer'}
+        return response_schema
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            value = _get_value(instance, field)
+            position.append(value if isinstance(value, int) else str(value))
+        return json.dumps(position)
+
+
+def _reverse_ordering(ordering_tuple):
+    def invert(x):
+        return x[1:] if x.startswith('-') else '-' + x
+
+    return tuple([invert(item) for item in ordering_tuple])
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """
+    Lexicographic "row comes after ``position``" predicate for ``ordering``:
+    (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+    """
+    clauses = []
+    for index, field in enumerate(ordering):
+        attr = field.lstrip('-')
+        descending = field.startswith('-')
+        lookup = '__lt' if descending != reverse else '__gt'
+        equal = {ordering[i].lstrip('-'): position[i] for i in range(index)}
+        clauses.append(Q(**equal) & Q(**{attr + lookup: position[index]}))
+    return reduce(operator.or_, clauses)
+
+
+def iterate_keyset(queryset, ordering, batch_size=2000):
+    """
+    Yield every row of ``queryset`` in ``ordering`` with one bounded keyset
+    query per batch. Unlike QuerySet.iterator(), memory stays flat on MySQL,
+    whose driver buffers the full result set of a single query. ``ordering``
+    must end in a unique field such as the primary key.
+    """
+    queryset = queryset.order_by(*ordering)
+    position = None
+    while True:
+        batch = queryset if position is None else queryset.filter(keyset_filter(ordering, position))
+        rows = list(batch[:batch_size])
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        position = [_get_value(rows[-1], field) for field in ordering]
+
+
+def _get_value(instance, field):
+    attr = field.lstrip('-')
+    return instance[attr] if isinstance(instance, dict) else getattr(instance, attr)
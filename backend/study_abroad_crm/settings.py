@@ -126,7 +126,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -137,7 +137,50 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'study_abroad_crm.throttling.UserWriteRateThrottle',
+        'study_abroad_crm.throttling.ScopedUserRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '30/min',           # per client IP
+        'login_account': '10/min',   # failed logins per email/username from one IP
+        'login_account_global': '100/min',  # failed logins per email/username across all IPs
+        'refresh': '60/min',         # per client IP
+        'write': '300/min',          # POST/PUT/PATCH/DELETE per user
+        'import': '20/hour',
+        'export': '60/hour',
+    },
+    # Client IPs come from REMOTE_ADDR unless this many proxies append X-Forwarded-For
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+}
+
+# Throttle counters must be shared by every worker: the database cache table by
+# default (python manage.py createcachetable), or e.g.
+# django.core.cache.backends.redis.RedisCache, whose increments are atomic
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': config('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('THROTTLE_CACHE_LOCATION', default='throttle_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # Read-through cache for the university catalogue (universities.cache). Entries are per
+    # process by default; they are keyed by the version below, so they need not be shared
+    'catalogue': {
+        'BACKEND': config('CATALOGUE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CATALOGUE_CACHE_LOCATION', default='catalogue'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # The catalogue version, shared by every worker so invalidation reaches them all within a second
+    'catalogue_version': {
+        'BACKEND': config('CATALOGUE_VERSION_CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('CATALOGUE_VERSION_CACHE_LOCATION', default='throttle_cache'),
+        'KEY_PREFIX': 'catalogue',
+    },
 }
 
 # JWT Configuration
@@ -149,6 +192,46 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
 }
 
+# request.user cache used by accounts.authentication.CachedJWTAuthentication. Role, name and
+# active-flag changes invalidate the cached user and token claims in every process within
+# TOKEN_REVOCATION['SYNC_INTERVAL'], so claims are trusted for the token's whole lifetime
+JWT_USER_CACHE = {
+    'TTL': 60,               # seconds a loaded user is reused by this process
+    'MAX_SIZE': 1024,        # users kept per process
+    'CLAIMS_MAX_AGE': None,  # seconds the claims in a token are trusted; None for the token's lifetime
+}
+
+# JWT revocation store used by logout and refresh rotation (accounts.revocation)
+TOKEN_REVOCATION = {
+    'BACKEND': 'accounts.revocation.DatabaseRevocationBackend',
+    'SYNC_INTERVAL': 5,          # seconds between syncs of the in-memory filter
+    'BLOOM_CAPACITY': 100000,    # revoked, unexpired tokens before the filter is resized
+    'BLOOM_ERROR_RATE': 0.01,    # false positives cost one indexed lookup
+}
+
+# Application.application_id allocation (applications.ids)
+APPLICATION_IDS = {
+    'PREFIX': 'APP',
+    'WIDTH': 7,                  # digits after the prefix, zero-padded so ids sort in order
+    'BLOCK_SIZE': 50,            # numbers each process reserves per database round trip
+}
+
+# Chunked, resumable document uploads (applications.uploads). TEMP_DIR must be shared by every
+# worker that can receive a chunk, and ideally on the same filesystem as MEDIA_ROOT
+DOCUMENT_UPLOADS = {
+    'TEMP_DIR': os.path.join(BASE_DIR, 'partial_uploads'),
+    'MAX_FILE_SIZE': 200 * 1024 * 1024,
+    'MAX_CHUNK_SIZE': 8 * 1024 * 1024,
+    'EXPIRE_AFTER': timedelta(days=1),     # unfinished uploads older than this are purged
+}
+
+# Permission-checked media downloads (see study_abroad_crm.downloads)
+PROTECTED_DOWNLOADS = {
+    'MODE': 'sendfile',                    # sendfile, stream, x-accel-redirect (nginx) or x-sendfile (Apache)
+    'ACCEL_PREFIX': '/protected-media/',   # nginx internal location aliased to MEDIA_ROOT
+    'CHUNK_SIZE': 256 * 1024,
+}
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -161,3 +244,9 @@ CORS_ALLOW_CREDENTIALS = True
 
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
+
+# Email or username login in a single lookup; replaces ModelBackend so a failed
+# login is never hashed twice
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.EmailOrUsernameBackend',
+]
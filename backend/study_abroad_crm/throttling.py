@@ -0,0 +1,224 @@
+"""
+Sliding-window rate limits whose counters live in a cache shared by all workers.
+
+DRF's SimpleRateThrottle keeps a list of request timestamps per client and
+rewrites it on every request. Concurrent workers overwrite each other's
+lists, and the list grows with the limit. Here each client has one integer
+counter per fixed window (``cache.incr``). The rate over the last ``duration``
+seconds is estimated by weighting the previous window by how much of it still
+overlaps:
+
+    previous * (duration - elapsed) / duration + current
+
+Counters are kept in the ``throttle`` cache alias (see CACHES in settings). It
+must be shared, e.g. the database cache table or Redis. The per-process
+LocMemCache only limits each worker separately. Rejected requests are not
+counted, so a client that stops is let back in after ``Retry-After`` seconds.
+``incr`` is atomic in Redis and Memcached. In DatabaseCache it is a read
+followed by a write, so concurrent requests can lose increments and the
+limits under-count under load.
+
+Per-account login limits count only failed logins (FailureRateThrottle,
+recorded by record_login_failure()). Otherwise anyone could lock a known
+user out by posting wrong passwords for their email. The strict limit is
+per account and client IP. A looser cap per account across all IPs still
+stops brute force spread over a botnet.
+"""
+import hashlib
+
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+THROTTLE_CACHE_ALIAS = 'throttle'
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    @property
+    def cache(self):
+        return caches[THROTTLE_CACHE_ALIAS]
+
+    def allow_request(self, request, view):
+        current_key = self._load_window(request, view)
+        if current_key is None:
+            return True
+        self.current = self._incr(current_key)
+
+        if self._estimate(self.elapsed) > self.num_requests:
+            self._decr(current_key)
+            self.current -= 1
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def _load_window(self, request, view):
+        """Read the previous window's count and return the current window's key, or None if not limited."""
+        if self.rate is None:
+            return None
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return None
+
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = now - window * self.duration
+        self.previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+        return f'{self.key}:{window}'
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """Seconds until the next request would fit within the limit."""
+        budget = self.num_requests - 1
+        remaining = self.duration - self.elapsed
+        if self.current <= budget:
+            if not self.previous:
+                return 0
+            # Within this window, once enough of the previous one has slid out
+            return max(0, remaining - self.duration * (budget - self.current) / self.previous)
+        # The current window becomes the previous one and has to slide out in turn
+        return remaining + self.duration * (1 - budget / self.current)
+
+    def _estimate(self, elapsed):
+        return self.previous * (self.duration - elapsed) / self.duration + self.current
+
+    def _incr(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Two windows: the counter is still read as "previous" during the next one
+            if self.cache.add(key, 1, timeout=self.duration * 2):
+                return 1
+            try:
+                return self.cache.incr(key)
+            except ValueError:
+                # The cache store failed the write (e.g. a lock timeout): let the request through
+                return 1
+
+    def _decr(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+
+class LoginRateThrottle(SlidingWindowRateThrottle):
+    """Login attempts per client IP."""
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class FailureRateThrottle(SlidingWindowRateThrottle):
+    """
+    Limits failures, not requests: allow_request() only checks whether one
+    more failure would still fit, and the view calls record_failure() when
+    the request fails.
+    """
+
+    def allow_request(self, request, view):
+        current_key = self._load_window(request, view)
+        if current_key is None:
+            return True
+        self.current = self.cache.get(current_key, 0)
+
+        if self._estimate(self.elapsed) + 1 > self.num_requests:
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def record_failure(self, request, view=None):
+        current_key = self._load_window(request, view)
+        if current_key is not None:
+            self._incr(current_key)
+
+
+class LoginAccountRateThrottle(FailureRateThrottle):
+    """Failed logins per account from one client IP."""
+    scope = 'login_account'
+
+    def get_cache_key(self, request, view):
+        login = self.get_login(request)
+        if login is None:
+            return None
+        ident = hashlib.sha256(f'{login}|{self.get_ident(request)}'.encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def get_login(self, request):
+        login = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not login or not isinstance(login, str):
+            return None
+        return login.strip().lower()
+
+
+class LoginAccountGlobalRateThrottle(LoginAccountRateThrottle):
+    """Failed logins per account across all IPs, so a botnet spread over many IPs is still limited."""
+    scope = 'login_account_global'
+
+    def get_cache_key(self, request, view):
+        login = self.get_login(request)
+        if login is None:
+            return None
+        ident = hashlib.sha256(login.encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+LOGIN_FAILURE_THROTTLES = [LoginAccountRateThrottle, LoginAccountGlobalRateThrottle]
+
+
+def record_login_failure(request):
+    for throttle_class in LOGIN_FAILURE_THROTTLES:
+        throttle_class().record_failure(request)
+
+
+class RefreshRateThrottle(LoginRateThrottle):
+    scope = 'refresh'
+
+
+class UserRateThrottle(SlidingWindowRateThrottle):
+    """Requests per user (per IP when anonymous)."""
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = f'ip-{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class UserWriteRateThrottle(UserRateThrottle):
+    """Unsafe requests per user; reads are not limited."""
+    scope = 'write'
+
+    def get_cache_key(self, request, view):
+        if request.method in SAFE_METHODS:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class ScopedUserRateThrottle(UserRateThrottle):
+    """
+    Per-user limit for views that set ``throttle_scope``, like DRF's
+    ScopedRateThrottle. Views without one are not limited.
+    """
+    scope_attr = 'throttle_scope'
+
+    def __init__(self):
+        # The scope, and so the rate, comes from the view in allow_request
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+
+class ImportRateThrottle(UserRateThrottle):
+    # Function views cannot set throttle_scope
+    scope = 'import'
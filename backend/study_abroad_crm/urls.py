@@ -10,12 +10,14 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/students/', include('students.urls')),
+    # Async read-only versions of the hot student endpoints, for ASGI deployments
+    path('api/async/students/', include('students.async_urls')),
     path('api/universities/', include('universities.urls')),
     path('api/applications/', include('applications.urls')),
     path('api/employees/', include('employees.urls')),
 ]
 
-# Serve media files during development
+# Serve static files during development; media is only served through the
+# permission-checked download endpoints (see study_abroad_crm.downloads)
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,118 @@
+"""
+Read-through cache for the university catalogue API.
+
+Serialized responses are stored under a key made of the catalogue version,
+the endpoint and the normalized query string, so ``?country=Canada&type=public``
+and ``?type=public&country=Canada`` share one entry. Any save or delete of a
+University, UniversityProgram or UniversityRequirement (see
+universities.signals) replaces the version once the transaction commits.
+Every older entry then becomes unreachable and ages out, so no key listing or
+pattern delete is needed.
+
+Entries live in the ``catalogue`` cache alias, per process by default. The
+version lives in the ``catalogue_version`` alias, which is shared by all
+workers (the database cache by default). Each process rereads the version
+at most once per VERSION_CHECK_INTERVAL, so an invalidation reaches every
+worker within that interval. Warm reads in between need no query.
+"""
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+CATALOGUE_CACHE_ALIAS = 'catalogue'
+VERSION_CACHE_ALIAS = 'catalogue_version'
+VERSION_KEY = 'catalogue:version'
+# Seconds a process reuses the shared version before reading it again
+VERSION_CHECK_INTERVAL = 1
+
+# (version, monotonic time it was read) for this process
+_version_memo = (None, 0)
+
+
+def get_catalogue_cache():
+    return caches[CATALOGUE_CACHE_ALIAS]
+
+
+def get_version_cache():
+    return caches[VERSION_CACHE_ALIAS]
+
+
+def catalogue_version():
+    global _version_memo
+    version, read_at = _version_memo
+    if version is not None and time.monotonic() - read_at < VERSION_CHECK_INTERVAL:
+        return version
+    cache = get_version_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # A fresh timestamp, never a reset counter, so evicting the version cannot resurrect old entries
+        version = time.time_ns()
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    _version_memo = (version, time.monotonic())
+    return version
+
+
+def invalidate_catalogue():
+    global _version_memo
+    version = time.time_ns()
+    get_version_cache().set(VERSION_KEY, version, timeout=None)
+    _version_memo = (version, time.monotonic())
+
+
+def normalize_query(query_params, ignore=()):
+    items = []
+    for key in sorted(query_params):
+        if key in ignore:
+            continue
+        values = sorted(value.strip() for value in query_params.getlist(key) if value.strip())
+        items.extend((key, value) for value in values)
+    return urlencode(items)
+
+
+def catalogue_key(endpoint, query_params, ignore=()):
+    query = hashlib.md5(normalize_query(query_params, ignore).encode()).hexdigest()
+    return f'catalogue:{catalogue_version()}:{endpoint}:{query}'
+
+
+def cached(key, build):
+    """Return the cached value for ``key``, building and storing it on a miss. ``build`` may return None to skip caching."""
+    cache = get_catalogue_cache()
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+
+class CatalogueSnapshot:
+    """
+    A per-process structure built from the catalogue by ``build()``, such as
+    the matching catalogue or the search facet index. It is rebuilt on first
+    use after the catalogue version changes, or at the latest after the
+    catalogue cache TIMEOUT.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self.lock = threading.Lock()
+        self.value = None
+        self.version = None
+        self.loaded_at = 0
+
+    def get(self):
+        version = catalogue_version()
+        max_age = settings.CACHES.get(CATALOGUE_CACHE_ALIAS, {}).get('TIMEOUT', 300)
+        if self.value is None or self.version != version or time.monotonic() - self.loaded_at > max_age:
+            with self.lock:
+                # Another thread may have rebuilt it while this one waited
+                if self.value is None or self.version != version or time.monotonic() - self.loaded_at > max_age:
+                    self.value = self.build()
+                    self.version = version
+                    self.loaded_at = time.monotonic()
+        return self.value
@@ -0,0 +1,157 @@
+"""
+Facet index for the university search endpoint.
+
+FacetIndex keeps every university as numpy columns: a (values x
+universities) membership matrix per facet (country, type,
+partnership_status and the program levels offered), tuition fee bounds,
+sort keys, and the lowercased name, city, country and program names that
+search terms are matched against. It is built with two queries and rebuilt
+when the catalogue changes (see universities.cache.CatalogueSnapshot).
+
+Filtering, sorting and every facet count are then array operations, with
+no query. Counts are disjunctive, as catalogue UIs expect: each facet's
+counts apply the selections of the other facets but not its own, so with
+"Canada" selected the country facet still shows what "USA" would add.
+"""
+import math
+
+import numpy as np
+
+from .cache import CatalogueSnapshot
+from .models import University, UniversityProgram
+
+FACETS = ['country', 'type', 'partnership_status', 'level']
+LABELS = {
+    'type': dict(University.TYPE_CHOICES),
+    'partnership_status': dict(University.PARTNERSHIP_CHOICES),
+    'level': dict(UniversityProgram.LEVEL_CHOICES),
+}
+ORDERING_FIELDS = ['name', 'ranking', 'world_ranking', 'rating', 'acceptance_rate']
+
+
+def to_float(value):
+    return math.nan if value is None else float(value)
+
+
+def normalize(value):
+    return (value or '').strip().lower()
+
+
+class FacetIndex:
+    def __init__(self, universities, programs):
+        # ``universities`` come in name order, so a university's position is its name rank
+        self.size = len(universities)
+        self.ids = np.array([row['id'] for row in universities], dtype=np.int64)
+        positions = {row['id']: index for index, row in enumerate(universities)}
+
+        self.values = {}
+        self.codes = {}
+        self.membership = {}
+        for facet in ['country', 'type', 'partnership_status']:
+            self._add_facet(facet, [(index, row[facet]) for index, row in enumerate(universities)])
+        self._add_facet('level', [(positions[row['university_id']], row['level']) for row in programs])
+
+        text = [[row['name'], row['city'], row['country']] for row in universities]
+        for row in programs:
+            text[positions[row['university_id']]].append(row['name'])
+        self.text = [' '.join(parts).lower() for parts in text]
+
+        self.tuition_fee_min = np.array([to_float(row['tuition_fee_min']) for row in universities])
+        self.tuition_fee_max = np.array([to_float(row['tuition_fee_max']) for row in universities])
+        self.sort_keys = {'name': np.arange(self.size, dtype=np.float64)}
+        for field in ORDERING_FIELDS[1:]:
+            self.sort_keys[field] = np.array([to_float(row[field]) for row in universities])
+
+    @classmethod
+    def load(cls):
+        universities = list(University.objects.order_by('name', 'id').values(
+            'id', 'name', 'city', 'country', 'type', 'partnership_status', 'tuition_fee_min', 'tuition_fee_max',
+            *ORDERING_FIELDS[1:],
+        ))
+        programs = list(UniversityProgram.objects.values('university_id', 'name', 'level'))
+        return cls(universities, programs)
+
+    def _add_facet(self, facet, pairs):
+        # Values are grouped case-insensitively and shown as first spelled
+        codes = {}
+        values = []
+        members = []
+        for index, value in pairs:
+            key = normalize(value)
+            if not key:
+                continue
+            if key not in codes:
+                codes[key] = len(values)
+                values.append(value.strip())
+            members.append((codes[key], index))
+        membership = np.zeros((len(values), self.size), dtype=bool)
+        if members:
+            rows, columns = zip(*members)
+            membership[list(rows), list(columns)] = True
+        self.values[facet] = values
+        self.codes[facet] = codes
+        self.membership[facet] = membership
+
+    def search(self, selected, text='', tuition_fee_min=None, tuition_fee_max=None, ordering=('name',)):
+        """
+        Return the ids of the matching universities in ``ordering`` and the
+        facet counts. ``selected`` maps a facet to the values picked in it;
+        a university matches any of the values of a facet and every facet.
+        """
+        base = np.ones(self.size, dtype=bool)
+        for term in normalize(text).split():
+            base &= np.fromiter((term in university for university in self.text), dtype=bool, count=self.size)
+        # Overlap with the requested fee range; NaN (unparsed fees) never matches
+        if tuition_fee_min is not None:
+            base &= self.tuition_fee_max >= float(tuition_fee_min)
+        if tuition_fee_max is not None:
+            base &= self.tuition_fee_min <= float(tuition_fee_max)
+
+        selections = {facet: self._selection(facet, values) for facet, values in selected.items() if values}
+        facets = {}
+        for facet in FACETS:
+            mask = base.copy()
+            for other, selection in selections.items():
+                if other != facet:
+                    mask &= selection
+            counts = np.count_nonzero(self.membership[facet] & mask, axis=1)
+            facets[facet] = self._facet_counts(facet, counts, selected.get(facet, []))
+
+        matched = base
+        for selection in selections.values():
+            matched = matched & selection
+        positions = np.flatnonzero(matched)
+        return self.ids[self._order(positions, ordering)].tolist(), facets
+
+    def _selection(self, facet, values):
+        codes = [self.codes[facet][normalize(value)] for value in values if normalize(value) in self.codes[facet]]
+        if not codes:
+            return np.zeros(self.size, dtype=bool)
+        return self.membership[facet][codes].any(axis=0)
+
+    def _facet_counts(self, facet, counts, selected):
+        selected = {normalize(value) for value in selected}
+        labels = LABELS.get(facet, {})
+        entries = [
+            {'value': value, 'label': labels.get(value, value), 'count': int(count),
+             'selected': normalize(value) in selected}
+            for value, count in zip(self.values[facet], counts)
+            if count or normalize(value) in selected
+        ]
+        entries.sort(key=lambda entry: (-entry['count'], entry['value'].lower()))
+        return entries
+
+    def _order(self, positions, ordering):
+        # np.lexsort sorts by its last key first; name rank breaks the remaining ties
+        keys = [positions]
+        for field in reversed(ordering):
+            key = self.sort_keys[field.lstrip('-')][positions]
+            keys.append(-key if field.startswith('-') else key)
+        return positions[np.lexsort(keys)]
+
+
+_index = CatalogueSnapshot(FacetIndex.load)
+
+
+def get_facet_index():
+    return _index.get()
@@ -0,0 +1,23 @@
+import django_filters
+from .models import University, UniversityProgram
+
+class UniversityFilter(django_filters.FilterSet):
+    """
+    Fee range filters over the numeric shadow columns (see
+    study_abroad_crm.numeric). A university matches when its tuition range
+    overlaps the requested one; ``annual_fee_max`` matches universities with
+    at least one program that cheap.
+    """
+    tuition_fee_min = django_filters.NumberFilter(field_name='tuition_fee_max', lookup_expr='gte')
+    tuition_fee_max = django_filters.NumberFilter(field_name='tuition_fee_min', lookup_expr='lte')
+    tuition_fee_currency = django_filters.CharFilter(field_name='tuition_fee_currency', lookup_expr='iexact')
+    application_fee_max = django_filters.NumberFilter(field_name='application_fee_min', lookup_expr='lte')
+    annual_fee_max = django_filters.NumberFilter(method='filter_annual_fee_max')
+    
+    class Meta:
+        model = University
+        fields = ['country', 'type', 'partnership_status']
+    
+    def filter_annual_fee_max(self, queryset, name, value):
+        # A subquery rather than a join, so universities are not repeated per program
+        return queryset.filter(id__in=UniversityProgram.objects.filter(annual_fee_min__lte=value).values('university_id'))
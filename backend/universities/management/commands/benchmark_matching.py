@@ -0,0 +1,136 @@
+import math
+import random
+import time
+from types import SimpleNamespace
+from django.core.management.base import BaseCommand, CommandError
+from study_abroad_crm.numeric import parse_money, parse_test_score
+from universities.matching import (ENGLISH_TESTS, NEUTRAL, WEIGHTS, ProgramCatalogue, StudentProfile,
+                                   match_students, tokenize)
+
+COUNTRIES = ['Canada', 'USA', 'UK', 'Australia', 'Germany', 'Ireland', 'New Zealand', 'France']
+LEVELS = ['bachelor', 'master', 'phd', 'diploma']
+SUBJECTS = ['Computer Science', 'Data Science', 'Business Administration', 'Mechanical Engineering',
+            'Civil Engineering', 'Finance', 'Marketing', 'Public Health', 'Psychology', 'Economics',
+            'Artificial Intelligence', 'Nursing', 'Law', 'Architecture', 'Biotechnology', 'Education']
+
+class Command(BaseCommand):
+    help = ('Time vectorized student-to-program matching, single and batched, against a per-program '
+            'Python loop, on the real catalogue or a synthetic one')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2000, help='Synthetic students to match')
+        parser.add_argument('--programs', type=int, default=0,
+                            help='Size of a synthetic catalogue; 0 loads the real one from the database')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--block-size', type=int, default=256)
+        parser.add_argument('--loop-sample', type=int, default=50, help='Students scored by the Python loop')
+        parser.add_argument('--seed', type=int, default=1)
+    
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        if options['programs']:
+            catalogue = ProgramCatalogue(*self._synthetic_catalogue(rng, options['programs']))
+        else:
+            catalogue = ProgramCatalogue.load()
+        load_time = time.perf_counter() - started
+        if not catalogue.size:
+            raise CommandError('The catalogue is empty; pass --programs to use a synthetic one')
+        self.stdout.write(f'catalogue: {catalogue.size} programs loaded in {load_time * 1000:.1f} ms')
+        
+        students = [self._synthetic_student(rng) for _ in range(options['students'])]
+        limit = options['limit']
+        
+        sample = students[:min(len(students), 200)]
+        started = time.perf_counter()
+        for student in sample:
+            list(match_students([student], limit=limit, catalogue=catalogue))
+        single = (time.perf_counter() - started) / len(sample)
+        self.stdout.write(f'one student per pass: {single * 1000:.2f} ms per student')
+        
+        started = time.perf_counter()
+        batched = list(match_students(students, limit=limit, block_size=options['block_size'], catalogue=catalogue))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'batches of {options["block_size"]}: {len(students) / elapsed:.0f} students/s '
+            f'({elapsed * 1000 / len(students):.3f} ms per student)'
+        )
+        
+        loop_sample = students[:options['loop_sample']]
+        started = time.perf_counter()
+        loop_results = [self._loop_top(catalogue, StudentProfile(student), limit) for student in loop_sample]
+        loop = (time.perf_counter() - started) / max(len(loop_sample), 1)
+        self.stdout.write(f'python loop over programs: {loop * 1000:.2f} ms per student '
+                          f'({loop / single:.1f}x the vectorized pass)')
+        
+        mismatches = sum(
+            1 for (student, matches), expected in zip(batched, loop_results)
+            if [match['score'] for match in matches] != [score for score, program_id in expected]
+        )
+        self.stdout.write(f'top-{limit} scores agree with the loop for {len(loop_results) - mismatches}/'
+                          f'{len(loop_results)} students')
+    
+    def _synthetic_catalogue(self, rng, count):
+        rows = []
+        english_minimums = {}
+        for university_id in range(1, count // 20 + 2):
+            if rng.random() < 0.9:
+                english_minimums[university_id] = dict(
+                    rng.sample([('ielts', 6.5), ('toefl', 90), ('pte', 58), ('duolingo', 110)], 2)
+                )
+        for index in range(count):
+            fee = f'${rng.randrange(8, 70) * 1000:,}'
+            rows.append({
+                'id': index + 1,
+                'name': f'{rng.choice(["MSc", "BSc", "MA", ""])} {rng.choice(SUBJECTS)}'.strip(),
+                'level': rng.choice(LEVELS),
+                'annual_fee': fee,
+                'annual_fee_min': parse_money(fee).min,
+                'university_id': index // 20 + 1,
+                'university__name': f'University {index // 20 + 1}',
+                'university__country': rng.choice(COUNTRIES),
+            })
+        return rows, english_minimums
+    
+    def _synthetic_student(self, rng):
+        test = rng.choice(ENGLISH_TESTS + [None])
+        score = {'ielts': rng.choice([5.5, 6, 6.5, 7, 7.5]), 'toefl': rng.randrange(70, 115),
+                 'pte': rng.randrange(45, 80), 'duolingo': rng.randrange(90, 140)}.get(test)
+        budget = f'{rng.randrange(10, 60)}k' if rng.random() < 0.8 else None
+        proficiency = test.upper() if test else None
+        test_score = str(score) if test else None
+        return SimpleNamespace(
+            pk=None,
+            preferred_country=rng.choice(COUNTRIES),
+            intended_program=rng.choice(LEVELS),
+            preferred_field=rng.choice(SUBJECTS),
+            budget_max=parse_money(budget).max,
+            english_proficiency=proficiency,
+            test_score=test_score,
+            test_score_value=parse_test_score(test_score, proficiency).value,
+        )
+    
+    def _loop_top(self, catalogue, profile, limit):
+        """The same scoring, one program at a time, as a reference for speed and correctness."""
+        scored = []
+        for index, program in enumerate(catalogue.rows):
+            country = (program['university__country'] or '').strip().lower() == profile.country
+            level = program['level'] == profile.level
+            tokens = tokenize(program['name'])
+            union = len(tokens | profile.tokens)
+            field = len(tokens & profile.tokens) / union if union else 0
+            fee = catalogue.fees[index]
+            if math.isnan(fee) or math.isnan(profile.budget):
+                budget = NEUTRAL
+            else:
+                budget = min(max(2 - fee / profile.budget, 0), 1)
+            english = NEUTRAL
+            if profile.test:
+                minimum = catalogue.english_minimums[profile.test][index]
+                if not math.isnan(minimum):
+                    english = float(profile.score >= minimum)
+            total = (WEIGHTS['country'] * country + WEIGHTS['level'] * level + WEIGHTS['field'] * field +
+                     WEIGHTS['budget'] * budget + WEIGHTS['english'] * english)
+            scored.append((round(total * 100, 1), program['id']))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:limit]
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from universities.cache import invalidate_catalogue
+
+class Command(BaseCommand):
+    help = 'Drop every cached catalogue response, e.g. after QuerySet.update() or raw SQL on universities'
+    
+    def handle(self, *args, **options):
+        invalidate_catalogue()
+        self.stdout.write(self.style.SUCCESS('Catalogue cache invalidated'))
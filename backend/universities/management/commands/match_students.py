@@ -0,0 +1,46 @@
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand
+from students.models import Student
+from study_abroad_crm.pagination import iterate_keyset
+from universities.matching import get_catalogue, match_students
+
+class Command(BaseCommand):
+    help = 'Score every (or every filtered) student against the program catalogue and write the top matches as JSON Lines'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='JSON Lines file to write (default: stdout)')
+        parser.add_argument('--limit', type=int, default=10, help='Matches per student')
+        parser.add_argument('--block-size', type=int, default=256, help='Students scored per matrix pass')
+        parser.add_argument('--status', action='append', help='Only students with this status (repeatable)')
+        parser.add_argument('--counselor', type=int, help='Only students assigned to this counselor id')
+    
+    def handle(self, *args, **options):
+        students = Student.objects.only(
+            'id', 'preferred_country', 'intended_program', 'preferred_field', 'budget_max',
+            'english_proficiency', 'test_score', 'test_score_value',
+        )
+        if options['status']:
+            students = students.filter(status__in=options['status'])
+        if options['counselor']:
+            students = students.filter(assigned_counselor=options['counselor'])
+        
+        catalogue = get_catalogue()
+        output = open(options['output'], 'w') if options['output'] else sys.stdout
+        started = time.perf_counter()
+        count = 0
+        try:
+            matches = match_students(iterate_keyset(students, ['id']), limit=options['limit'],
+                                     block_size=options['block_size'], catalogue=catalogue)
+            for student, student_matches in matches:
+                output.write(json.dumps({'student': student.pk, 'matches': student_matches}) + '\n')
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Matched {count} students against {catalogue.size} programs in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from universities.cache import invalidate_catalogue
+from universities.models import EnglishTestRequirement
+
+class Command(BaseCommand):
+    help = 'Reparse every UniversityRequirement.english_tests into the EnglishTestRequirement table'
+    
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = EnglishTestRequirement.rebuild()
+        # Program matching reads the minimums from the table
+        invalidate_catalogue()
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} English test minimums'))
@@ -0,0 +1,244 @@
+"""
+Student-to-program matching over the whole catalogue.
+
+ProgramCatalogue loads every UniversityProgram and English-test minimum in
+two queries and keeps them as column arrays: country and level codes,
+annual fees, the English-test minimums of the university (see
+EnglishTestRequirement), and an inverted index of the program-name tokens.
+A student is scored against every program at once with a few numpy
+operations on those columns. Batches of students are scored block by block,
+as (students x programs) matrices.
+
+Each component is a score in [0, 1]. Components whose data is missing on
+either side score NEUTRAL, so they neither help nor sink a program:
+
+- country: the university is in the student's preferred country
+- level: the program level is the student's intended program
+- field: Jaccard similarity of preferred_field and program-name tokens
+- budget: 1 while the annual fee is within budget, falling to 0 at twice it.
+  Fees and budgets come from the numeric shadow columns (see
+  study_abroad_crm.numeric); currencies are not converted.
+- english: the student's test score meets the university's minimum for it
+
+The catalogue is reloaded when the catalogue cache version changes (see
+universities.cache), or at the latest after the catalogue cache TIMEOUT.
+"""
+import math
+import re
+
+import numpy as np
+from study_abroad_crm.numeric import ENGLISH_TESTS, english_test_name, parse_english_tests
+
+from .cache import CatalogueSnapshot
+from .models import EnglishTestRequirement, UniversityProgram
+
+WEIGHTS = {
+    'country': 0.30,
+    'level': 0.25,
+    'field': 0.20,
+    'budget': 0.15,
+    'english': 0.10,
+}
+NEUTRAL = 0.5
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+# Words that say nothing about the subject of a program
+STOPWORDS = {
+    'and', 'of', 'in', 'the', 'for', 'with', 'to', 'a', 'an', 'program', 'programme', 'degree', 'studies',
+    'bachelor', 'bachelors', 'master', 'masters', 'msc', 'bsc', 'ma', 'ba', 'meng', 'beng', 'phd', 'diploma',
+}
+
+
+def to_float(value):
+    return math.nan if value is None else float(value)
+
+
+def tokenize(text):
+    return {token for token in TOKEN_RE.findall((text or '').lower()) if token not in STOPWORDS}
+
+
+class StudentProfile:
+    """The matching inputs of one student, parsed once."""
+
+    def __init__(self, student):
+        self.student = student
+        self.country = (student.preferred_country or '').strip().lower()
+        self.level = student.intended_program
+        self.tokens = tokenize(student.preferred_field)
+        self.budget = to_float(student.budget_max)
+        self.test, self.score = self._parse_test(student)
+
+    def _parse_test(self, student):
+        text = f'{student.english_proficiency or ""} {student.test_score or ""}'
+        tests = parse_english_tests(text)
+        if tests:
+            test, score = next(iter(tests.items()))
+            return test, float(score)
+        # e.g. english_proficiency="IELTS", test_score="7"
+        test = english_test_name(text)
+        if test and student.test_score_value is not None:
+            return test, float(student.test_score_value)
+        return None, math.nan
+
+
+class ProgramCatalogue:
+    def __init__(self, rows, english_minimums):
+        """``english_minimums`` maps a university id to its {test: minimum score}."""
+        self.size = len(rows)
+        self.rows = rows
+
+        self.program_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        self.country_codes = {}
+        self.countries = self._encode([(row['university__country'] or '').strip().lower() for row in rows],
+                                      self.country_codes)
+        self.level_codes = {}
+        self.levels = self._encode([row['level'] for row in rows], self.level_codes)
+        self.fees = np.array([to_float(row['annual_fee_min']) for row in rows], dtype=np.float64)
+
+        requirements = [english_minimums.get(row['university_id'], {}) for row in rows]
+        self.english_minimums = {
+            test: np.array([to_float(minimums.get(test)) for minimums in requirements], dtype=np.float64)
+            for test in ENGLISH_TESTS
+        }
+
+        # Inverted index: token -> indexes of the programs whose name contains it
+        postings = {}
+        self.name_tokens = [tokenize(row['name']) for row in rows]
+        token_counts = np.zeros(self.size)
+        for index, tokens in enumerate(self.name_tokens):
+            token_counts[index] = len(tokens)
+            for token in tokens:
+                postings.setdefault(token, []).append(index)
+        self.postings = {token: np.array(indexes, dtype=np.int64) for token, indexes in postings.items()}
+        self.token_counts = token_counts
+
+    @classmethod
+    def load(cls):
+        rows = list(UniversityProgram.objects.order_by('id').values(
+            'id', 'name', 'level', 'annual_fee', 'annual_fee_min', 'university_id', 'university__name',
+            'university__country',
+        ))
+        english_minimums = {}
+        for university_id, test, minimum in EnglishTestRequirement.objects.values_list(
+            'university_id', 'test', 'minimum_score'
+        ):
+            english_minimums.setdefault(university_id, {})[test] = minimum
+        return cls(rows, english_minimums)
+
+    def _encode(self, values, codes):
+        return np.array([codes.setdefault(value, len(codes)) for value in values], dtype=np.int32)
+
+    def score(self, profiles):
+        """Component and weighted total score matrices with one row per profile and one column per program."""
+        size = (len(profiles), self.size)
+        components = {
+            'country': self.countries[None, :] == np.array(
+                [self.country_codes.get(profile.country, -1) for profile in profiles], dtype=np.int32
+            )[:, None],
+            'level': self.levels[None, :] == np.array(
+                [self.level_codes.get(profile.level, -1) for profile in profiles], dtype=np.int32
+            )[:, None],
+        }
+
+        overlap = np.zeros(size)
+        for row, profile in enumerate(profiles):
+            for token in profile.tokens:
+                indexes = self.postings.get(token)
+                if indexes is not None:
+                    overlap[row, indexes] += 1
+        student_counts = np.array([len(profile.tokens) for profile in profiles], dtype=np.float64)
+        union = self.token_counts[None, :] + student_counts[:, None] - overlap
+        components['field'] = np.divide(overlap, union, out=np.zeros(size), where=union > 0)
+
+        budgets = np.array([profile.budget for profile in profiles], dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            budget = np.clip(2 - self.fees[None, :] / budgets[:, None], 0, 1)
+        components['budget'] = np.where(np.isnan(budget), NEUTRAL, budget)
+
+        english = np.full(size, NEUTRAL)
+        for test in ENGLISH_TESTS:
+            rows = [row for row, profile in enumerate(profiles) if profile.test == test]
+            if rows:
+                minimums = self.english_minimums[test]
+                scores = np.array([profiles[row].score for row in rows])[:, None]
+                english[rows] = np.where(np.isnan(minimums)[None, :], NEUTRAL, scores >= minimums[None, :])
+        components['english'] = english
+
+        total = sum(WEIGHTS[name] * value for name, value in components.items())
+        return components, total
+
+    def top_matches(self, profile, components, total, row, limit):
+        scores = total[row]
+        if limit < self.size:
+            candidates = np.argpartition(-scores, limit)[:limit]
+        else:
+            candidates = np.arange(self.size)
+        # Best score first, lower program id first on ties
+        order = candidates[np.lexsort((self.program_ids[candidates], -scores[candidates]))]
+        return [self.describe(profile, components, row, index, scores[index]) for index in order]
+
+    def describe(self, profile, components, row, index, score):
+        program = self.rows[index]
+        reasons = []
+        if components['country'][row, index]:
+            reasons.append(f'In {program["university__country"]}, the preferred country')
+        if components['level'][row, index]:
+            reasons.append(f'{program["level"].title()} level, as intended')
+        if components['field'][row, index] > 0:
+            shared = sorted(profile.tokens & self.name_tokens[index])
+            reasons.append(f'Name matches the preferred field ({", ".join(shared)})')
+        fee = self.fees[index]
+        if not math.isnan(fee) and not math.isnan(profile.budget):
+            if fee <= profile.budget:
+                reasons.append(f'Annual fee {fee:,.0f} is within the budget of {profile.budget:,.0f}')
+            else:
+                reasons.append(f'Annual fee {fee:,.0f} is over the budget of {profile.budget:,.0f}')
+        if profile.test:
+            minimum = self.english_minimums[profile.test][index]
+            if not math.isnan(minimum):
+                verdict = 'meets' if profile.score >= minimum else 'is below'
+                reasons.append(f'{profile.test.upper()} {profile.score:g} {verdict} the minimum of {minimum:g}')
+        return {
+            'program_id': program['id'],
+            'program': program['name'],
+            'level': program['level'],
+            'annual_fee': program['annual_fee'],
+            'university_id': program['university_id'],
+            'university': program['university__name'],
+            'country': program['university__country'],
+            'score': round(float(score) * 100, 1),
+            'reasons': reasons,
+        }
+
+
+_catalogue = CatalogueSnapshot(ProgramCatalogue.load)
+
+
+def get_catalogue():
+    return _catalogue.get()
+
+
+def match_student(student, limit=10, catalogue=None):
+    catalogue = catalogue or get_catalogue()
+    profile = StudentProfile(student)
+    components, total = catalogue.score([profile])
+    return catalogue.top_matches(profile, components, total, 0, limit)
+
+
+def match_students(students, limit=10, block_size=256, catalogue=None):
+    """Yield (student, matches) for every student, scoring ``block_size`` students per matrix pass."""
+    catalogue = catalogue or get_catalogue()
+    block = []
+    for student in students:
+        block.append(StudentProfile(student))
+        if len(block) >= block_size:
+            yield from _match_block(catalogue, block, limit)
+            block = []
+    if block:
+        yield from _match_block(catalogue, block, limit)
+
+
+def _match_block(catalogue, profiles, limit):
+    components, total = catalogue.score(profiles)
+    for row, profile in enumerate(profiles):
+        yield profile.student, catalogue.top_matches(profile, components, total, row, limit)
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from study_abroad_crm.numeric import MoneyColumns, NumericColumnsMixin, parse_english_tests
 
-class University(models.Model):
+class University(NumericColumnsMixin, models.Model):
     TYPE_CHOICES = [
         ('public', 'Public'),
         ('private', 'Private'),
@@ -35,6 +36,18 @@ class University(models.Model):
     tuition_fee_range = models.CharField(max_length=100)
     application_fee = models.CharField(max_length=50)
     
+    # Parsed from the fee text by study_abroad_crm.numeric, for range filters
+    tuition_fee_min = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                          editable=False, db_index=True)
+    tuition_fee_max = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                          editable=False, db_index=True)
+    tuition_fee_currency = models.CharField(max_length=3, blank=True, null=True, editable=False)
+    application_fee_min = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                              editable=False, db_index=True)
+    application_fee_max = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                              editable=False, db_index=True)
+    application_fee_currency = models.CharField(max_length=3, blank=True, null=True, editable=False)
+    
     # Partnership Information
     partnership_status = models.CharField(max_length=20, choices=PARTNERSHIP_CHOICES, default='standard')
     
@@ -46,6 +59,11 @@ class University(models.Model):
         ordering = ['name']
         verbose_name_plural = "Universities"
     
+    numeric_columns = [
+        MoneyColumns('tuition_fee_range', 'tuition_fee'),
+        MoneyColumns('application_fee', 'application_fee'),
+    ]
+    
     def __str__(self):
         return f"{self.name}, {self.country}"
     
@@ -55,7 +73,7 @@ class University(models.Model):
             return round((self.international_students / self.total_students) * 100, 2)
         return 0
 
-class UniversityProgram(models.Model):
+class UniversityProgram(NumericColumnsMixin, models.Model):
     LEVEL_CHOICES = [
         ('bachelor', "Bachelor's Degree"),
         ('master', "Master's Degree"),
@@ -70,9 +88,17 @@ class UniversityProgram(models.Model):
     annual_fee = models.CharField(max_length=100)
     requirements = models.TextField(blank=True, null=True)
     
+    annual_fee_min = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                         editable=False, db_index=True)
+    annual_fee_max = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True,
+                                         editable=False, db_index=True)
+    annual_fee_currency = models.CharField(max_length=3, blank=True, null=True, editable=False)
+    
     class Meta:
         ordering = ['name']
     
+    numeric_columns = [MoneyColumns('annual_fee', 'annual_fee')]
+    
     def __str__(self):
         return f"{self.name} ({self.level}) - {self.university.name}"
 
@@ -85,3 +111,51 @@ class UniversityRequirement(models.Model):
     
     def __str__(self):
         return f"Requirements for {self.university.name}"
+
+class EnglishTestRequirement(models.Model):
+    """Minimum English test scores parsed from UniversityRequirement.english_tests, kept current by universities.signals."""
+    TEST_CHOICES = [
+        ('ielts', 'IELTS'),
+        ('toefl', 'TOEFL'),
+        ('pte', 'PTE'),
+        ('duolingo', 'Duolingo'),
+    ]
+    
+    university = models.ForeignKey(University, on_delete=models.CASCADE, related_name='english_test_minimums')
+    test = models.CharField(max_length=20, choices=TEST_CHOICES)
+    minimum_score = models.DecimalField(max_digits=7, decimal_places=2)
+    
+    class Meta:
+        unique_together = ['university', 'test']
+        indexes = [
+            # "Which universities accept IELTS 6.0" is a range scan that never touches the university table
+            models.Index(fields=['test', 'minimum_score', 'university'], name='english_test_minimum_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.university_id} - {self.test} {self.minimum_score}"
+    
+    @classmethod
+    def sync(cls, university_id, english_tests):
+        """Replace a university's rows with the minimums parsed from its ``english_tests`` text."""
+        minimums = parse_english_tests(english_tests)
+        with transaction.atomic():
+            cls.objects.filter(university_id=university_id).exclude(test__in=list(minimums)).delete()
+            current = dict(cls.objects.filter(university_id=university_id).values_list('test', 'minimum_score'))
+            for test, minimum in minimums.items():
+                if test not in current:
+                    cls.objects.create(university_id=university_id, test=test, minimum_score=minimum)
+                elif current[test] != minimum:
+                    cls.objects.filter(university_id=university_id, test=test).update(minimum_score=minimum)
+    
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Reparse every requirement in one pass; returns the number of rows written."""
+        rows = [
+            cls(university_id=university_id, test=test, minimum_score=minimum)
+            for university_id, english_tests in UniversityRequirement.objects.values_list('university_id', 'english_tests')
+            for test, minimum in parse_english_tests(english_tests).items()
+        ]
+        cls.objects.all().delete()
+        cls.objects.bulk_create(rows, batch_size=batch_size)
+        return len(rows)
@@ -0,0 +1,57 @@
+from rest_framework import serializers
+from .facets import ORDERING_FIELDS
+from .models import University, UniversityProgram, UniversityRequirement
+
+class UniversityProgramSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UniversityProgram
+        fields = ['id', 'name', 'level', 'duration', 'annual_fee', 'requirements']
+
+class UniversityRequirementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UniversityRequirement
+        fields = ['english_tests', 'academic_requirements', 'documents_required', 'application_deadlines']
+
+class UniversitySerializer(serializers.ModelSerializer):
+    programs = UniversityProgramSerializer(many=True, read_only=True)
+    requirements = UniversityRequirementSerializer(read_only=True, default=None)
+    international_percentage = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = University
+        fields = ['id', 'name', 'country', 'city', 'website', 'type', 'established_year', 
+                 'ranking', 'world_ranking', 'rating', 'total_students', 'international_students', 
+                 'international_percentage', 'acceptance_rate', 'tuition_fee_range', 'application_fee', 
+                 'partnership_status', 'programs', 'requirements', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+class UniversityListSerializer(serializers.ModelSerializer):
+    programs = UniversityProgramSerializer(many=True, read_only=True)
+    english_tests = serializers.CharField(source='requirements.english_tests', read_only=True, default=None)
+    
+    class Meta:
+        model = University
+        fields = ['id', 'name', 'country', 'city', 'type', 'ranking', 'world_ranking', 'rating', 
+                 'acceptance_rate', 'tuition_fee_range', 'application_fee', 'partnership_status', 
+                 'programs', 'english_tests', 'updated_at']
+        read_only_fields = fields
+
+class EligibleUniversitySerializer(UniversityListSerializer):
+    minimum_score = serializers.DecimalField(max_digits=7, decimal_places=2, read_only=True)
+    
+    class Meta(UniversityListSerializer.Meta):
+        fields = UniversityListSerializer.Meta.fields + ['minimum_score']
+        read_only_fields = fields
+
+class UniversitySearchQuerySerializer(serializers.Serializer):
+    search = serializers.CharField(required=False, allow_blank=True, default='')
+    tuition_fee_min = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    tuition_fee_max = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    ordering = serializers.CharField(required=False, default='name')
+    
+    def validate_ordering(self, value):
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        unknown = [field for field in fields if field.lstrip('-') not in ORDERING_FIELDS]
+        if unknown:
+            raise serializers.ValidationError(f'Cannot order by {", ".join(unknown)}; use {", ".join(ORDERING_FIELDS)}.')
+        return fields or ['name']
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import invalidate_catalogue
+from .models import EnglishTestRequirement, University, UniversityProgram, UniversityRequirement
+
+@receiver(post_save, sender=UniversityRequirement)
+def sync_english_test_minimums(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    EnglishTestRequirement.sync(instance.university_id, instance.english_tests)
+
+@receiver(post_delete, sender=UniversityRequirement)
+def delete_english_test_minimums(sender, instance, **kwargs):
+    EnglishTestRequirement.objects.filter(university_id=instance.university_id).delete()
+
+@receiver(post_save, sender=University)
+@receiver(post_save, sender=UniversityProgram)
+@receiver(post_save, sender=UniversityRequirement)
+@receiver(post_delete, sender=University)
+@receiver(post_delete, sender=UniversityProgram)
+@receiver(post_delete, sender=UniversityRequirement)
+def invalidate_catalogue_cache(sender, **kwargs):
+    # After commit, so a concurrent read cannot cache the old rows under the new version
+    transaction.on_commit(invalidate_catalogue)
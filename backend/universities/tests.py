@@ -0,0 +1,222 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from . import cache
+from .cache import CatalogueSnapshot, get_catalogue_cache, invalidate_catalogue
+from .facets import FacetIndex, get_facet_index
+from students.models import Student
+
+from .matching import ProgramCatalogue, match_student
+from .models import University, UniversityProgram, UniversityRequirement
+
+
+def make_university(name, country, type, partnership_status='standard', ranking=1, tuition_fee_range='$20,000',
+                    programs=(), english_tests=None):
+    university = University.objects.create(
+        name=name, country=country, city='City', website='https://example.com', type=type,
+        established_year=1900, ranking=ranking, world_ranking=ranking, acceptance_rate=50,
+        tuition_fee_range=tuition_fee_range, application_fee='$100', partnership_status=partnership_status,
+    )
+    for program_name, level, annual_fee in programs:
+        UniversityProgram.objects.create(university=university, name=program_name, level=level, duration='2 years',
+                                         annual_fee=annual_fee)
+    if english_tests:
+        UniversityRequirement.objects.create(university=university, english_tests=english_tests,
+                                             academic_requirements='Transcripts', documents_required='Passport',
+                                             application_deadlines='March')
+    return university
+
+
+class CatalogueTestCase(APITestCase):
+    def setUp(self):
+        # Entries and snapshots of other tests' catalogues must not leak in
+        get_catalogue_cache().clear()
+        invalidate_catalogue()
+        self.user = get_user_model().objects.create_user(username='counselor', email='counselor@example.com',
+                                                         password='pw', role='counselor')
+        self.client.force_authenticate(self.user)
+
+
+class CatalogueCacheTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.university = make_university('Toronto Tech', 'Canada', 'public',
+                                          programs=[('Computer Science', 'master', '$25,000')])
+        # Keep this process's copy of the version for the whole test
+        patcher = mock.patch.object(cache, 'VERSION_CHECK_INTERVAL', 60)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_warm_reads_need_no_queries(self):
+        for path in ['/api/universities/', f'/api/universities/{self.university.pk}/',
+                     '/api/universities/search/']:
+            with self.subTest(path):
+                first = self.client.get(path, {'page_size': 10})
+                self.assertEqual(first.status_code, 200)
+                with self.assertNumQueries(0):
+                    second = self.client.get(path, {'page_size': 10})
+                self.assertEqual(second.data, first.data)
+
+    def test_equivalent_query_strings_share_an_entry(self):
+        self.client.get('/api/universities/', {'country': 'Canada', 'type': 'public'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/universities/?type=public&country=Canada')
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_etag_answers_304(self):
+        etag = self.client.get('/api/universities/')['ETag']
+        self.assertEqual(self.client.get('/api/universities/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_write_invalidates_cached_responses(self):
+        path = f'/api/universities/{self.university.pk}/'
+        etag = self.client.get(path)['ETag']
+        self.client.get('/api/universities/')
+        self.user.role = 'admin'
+        self.user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(path, {'name': 'Toronto Institute of Technology'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Toronto Institute of Technology')
+        self.assertEqual(self.client.get('/api/universities/').data['results'][0]['name'],
+                         'Toronto Institute of Technology')
+
+    def test_invalidation_by_another_worker_is_picked_up(self):
+        self.client.get('/api/universities/')
+        University.objects.filter(pk=self.university.pk).update(name='Renamed Elsewhere')
+        # Another worker bumped the shared version; this one rereads it once its copy is stale
+        cache.get_version_cache().set(cache.VERSION_KEY, cache.catalogue_version() + 1, timeout=None)
+        self.assertEqual(self.client.get('/api/universities/').data['results'][0]['name'], 'Toronto Tech')
+        cache._version_memo = (None, 0)
+        self.assertEqual(self.client.get('/api/universities/').data['results'][0]['name'], 'Renamed Elsewhere')
+
+    def test_only_admins_write(self):
+        response = self.client.patch(f'/api/universities/{self.university.pk}/', {'name': 'Nope'})
+        self.assertEqual(response.status_code, 403)
+
+
+class FacetSearchTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.toronto = make_university('Toronto Tech', 'Canada', 'public', 'direct', ranking=1,
+                                       tuition_fee_range='$20,000 - $30,000',
+                                       programs=[('Computer Science', 'master', '$25,000'),
+                                                 ('Business', 'bachelor', '$20,000')])
+        self.montreal = make_university('Montreal College', 'Canada', 'private', 'standard', ranking=2,
+                                        tuition_fee_range='$40,000',
+                                        programs=[('Data Science', 'master', '$40,000')])
+        self.boston = make_university('Boston University', 'USA', 'private', 'premium', ranking=3,
+                                      tuition_fee_range='$50,000 - $60,000',
+                                      programs=[('Computer Science', 'bachelor', '$55,000')])
+        self.berlin = make_university('Berlin University', 'Germany', 'public', ranking=4,
+                                      tuition_fee_range='$1,000', programs=[('Physics', 'phd', '$1,000')])
+
+    def counts(self, entries):
+        return [(entry['value'], entry['count'], entry['selected']) for entry in entries]
+
+    def test_counts_are_disjunctive_for_multi_value_filters(self):
+        ids, facets = FacetIndex.load().search({'country': ['Canada', 'usa'], 'type': ['private']})
+        self.assertEqual(ids, [self.boston.pk, self.montreal.pk])
+        # Each facet applies the other facets' selections but not its own
+        self.assertEqual(self.counts(facets['country']), [('Canada', 1, True), ('USA', 1, True)])
+        self.assertEqual(self.counts(facets['type']), [('private', 2, True), ('public', 1, False)])
+        self.assertEqual(self.counts(facets['partnership_status']), [('premium', 1, False), ('standard', 1, False)])
+        self.assertEqual(self.counts(facets['level']), [('bachelor', 1, False), ('master', 1, False)])
+
+    def test_text_fee_range_and_ordering(self):
+        index = FacetIndex.load()
+        ids, facets = index.search({}, text='computer science')
+        self.assertEqual(ids, [self.boston.pk, self.toronto.pk])
+        self.assertEqual(self.counts(facets['country']), [('Canada', 1, False), ('USA', 1, False)])
+        ids, _ = index.search({}, tuition_fee_min=25000, tuition_fee_max=45000, ordering=['-ranking'])
+        self.assertEqual(ids, [self.montreal.pk, self.toronto.pk])
+
+    def test_search_endpoint(self):
+        response = self.client.get('/api/universities/search/', {'country': 'Canada,USA', 'type': 'private',
+                                                                 'ordering': 'ranking'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.montreal.pk, self.boston.pk])
+        self.assertEqual(self.counts(response.data['facets']['type']), [('private', 2, True), ('public', 1, False)])
+
+    def test_catalogue_change_rebuilds_the_index(self):
+        index = get_facet_index()
+        self.assertIs(get_facet_index(), index)
+        with self.captureOnCommitCallbacks(execute=True):
+            paris = make_university('Paris University', 'France', 'public')
+        rebuilt = get_facet_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.search({'country': ['France']})[0], [paris.pk])
+
+    def test_snapshot_is_rebuilt_only_after_a_version_bump(self):
+        builds = []
+        snapshot = CatalogueSnapshot(lambda: builds.append(1) or len(builds))
+        self.assertEqual(snapshot.get(), 1)
+        self.assertEqual(snapshot.get(), 1)
+        invalidate_catalogue()
+        self.assertEqual(snapshot.get(), 2)
+
+
+class MatchingTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        toronto = make_university('Toronto Tech', 'Canada', 'public', english_tests='IELTS: 6.5, TOEFL: 90',
+                                  programs=[('Computer Science', 'master', '$25,000'),
+                                            ('Fine Arts', 'master', '$22,000')])
+        boston = make_university('Boston University', 'USA', 'private', english_tests='IELTS: 7.5',
+                                 programs=[('Computer Science', 'bachelor', '$55,000')])
+        make_university('Berlin University', 'Germany', 'public', programs=[('Physics', 'phd', 'Varies')])
+        self.toronto_cs = toronto.programs.get(name='Computer Science')
+        self.toronto_arts = toronto.programs.get(name='Fine Arts')
+        self.boston_cs = boston.programs.get()
+        self.student = Student.objects.create(
+            first_name='Asha', last_name='Rao', email='asha@example.com', phone='0000000000',
+            date_of_birth=date(2000, 1, 1), gender='female', address='Pune', current_education='bachelor',
+            field_of_study='Computer Engineering', institution='Pune College', gpa='3.6/4', graduation_year=2022,
+            english_proficiency='IELTS', test_score='7', preferred_country='Canada', intended_program='master',
+            preferred_field='Computer Science', intake_year='2025', budget='$30,000', assigned_counselor=self.user,
+        )
+
+    def test_scores_and_reasons_for_a_known_student(self):
+        matches = match_student(self.student, limit=2, catalogue=ProgramCatalogue.load())
+        self.assertEqual([match['program_id'] for match in matches], [self.toronto_cs.pk, self.toronto_arts.pk])
+        self.assertEqual([match['score'] for match in matches], [100.0, 80.0])
+        best = matches[0]
+        # Every component fully met
+        self.assertEqual(best['score'], 100.0)
+        self.assertEqual(best['reasons'], [
+            'In Canada, the preferred country',
+            'Master level, as intended',
+            'Name matches the preferred field (computer, science)',
+            'Annual fee 25,000 is within the budget of 30,000',
+            'IELTS 7 meets the minimum of 6.5',
+        ])
+
+    def test_partial_and_neutral_components(self):
+        scores = {match['program_id']: match for match in
+                  match_student(self.student, limit=10, catalogue=ProgramCatalogue.load())}
+        boston = scores[self.boston_cs.pk]
+        # field 0.20 + budget 0.15 * (2 - 55000 / 30000); wrong country and level, IELTS below 7.5
+        self.assertEqual(boston['score'], 22.5)
+        self.assertEqual(boston['reasons'], [
+            'Name matches the preferred field (computer, science)',
+            'Annual fee 55,000 is over the budget of 30,000',
+            'IELTS 7 is below the minimum of 7.5',
+        ])
+        # Unparsed fee and no English requirement score NEUTRAL (0.5) for budget and english
+        berlin = scores[UniversityProgram.objects.get(name='Physics').pk]
+        self.assertEqual(berlin['score'], 12.5)
+        self.assertEqual(berlin['reasons'], [])
+
+    def test_matches_endpoint_uses_the_current_catalogue(self):
+        response = self.client.get(f'/api/students/{self.student.pk}/matches/', {'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['matches'][0]['program_id'], self.toronto_cs.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.toronto_cs.delete()
+        response = self.client.get(f'/api/students/{self.student.pk}/matches/', {'limit': 1})
+        self.assertNotEqual(response.data['matches'][0]['program_id'], self.toronto_cs.pk)
@@ -1,5 +1,9 @@
 from django.urls import path
+from . import views
 
 urlpatterns = [
-    # University URLs will be implemented
+    path('', views.UniversityListCreateView.as_view(), name='university_list_create'),
+    path('search/', views.UniversitySearchView.as_view(), name='university_search'),
+    path('eligible/', views.UniversityEligibilityView.as_view(), name='university_eligible'),
+    path('<int:pk>/', views.UniversityDetailView.as_view(), name='university_detail'),
 ]
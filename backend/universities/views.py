@@ -0,0 +1,165 @@
+import hashlib
+from django.db.models import F, FilteredRelation, Q
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.response import Response
+from students.views import scoped_students
+from study_abroad_crm.numeric import english_test_name, parse_test_score
+from study_abroad_crm.pagination import KeysetPagination
+from .cache import cached, catalogue_key
+from .facets import FACETS, get_facet_index
+from .filters import UniversityFilter
+from .models import University
+from .serializers import (EligibleUniversitySerializer, UniversitySerializer, UniversityListSerializer,
+                          UniversitySearchQuerySerializer)
+
+class CatalogueViewMixin:
+    """
+    Reads are served from the catalogue cache (see universities.cache), so a
+    warm catalogue needs no queries; writes are limited to admins.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def check_permissions(self, request):
+        super().check_permissions(request)
+        if request.method not in SAFE_METHODS and request.user.role != 'admin':
+            self.permission_denied(request, message='Only admins can change the university catalogue.')
+    
+    def get_queryset(self):
+        # Programs and requirements in a fixed number of queries whatever the page size
+        return University.objects.select_related('requirements').prefetch_related('programs')
+    
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, 'list', super().list, *args, **kwargs)
+    
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, f'detail:{kwargs["pk"]}', super().retrieve, *args, **kwargs)
+    
+    def cache_endpoint(self, endpoint):
+        return endpoint
+    
+    def cached_response(self, request, endpoint, build_response, *args, **kwargs):
+        # Pagination links are absolute, so the host is part of the key
+        key = catalogue_key(f'{request.get_host()}:{self.cache_endpoint(endpoint)}', request.query_params)
+        response = None
+        
+        def build():
+            nonlocal response
+            response = build_response(request, *args, **kwargs)
+            return response.data if response.status_code == 200 else None
+        
+        data = cached(key, build)
+        if data is None:
+            return response
+        
+        # The key changes with the catalogue version, so it doubles as an ETag
+        etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        conditional = get_conditional_response(request, etag=etag)
+        if conditional is None:
+            conditional = response or Response(data)
+        conditional['ETag'] = etag
+        return conditional
+
+class UniversityListCreateView(CatalogueViewMixin, generics.ListCreateAPIView):
+    pagination_class = KeysetPagination
+    filterset_class = UniversityFilter
+    search_fields = ['name', 'city', 'country']
+    ordering_fields = ['name', 'ranking', 'world_ranking', 'rating', 'acceptance_rate']
+    ordering = ['name']
+    
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return UniversitySerializer
+        return UniversityListSerializer
+
+class UniversityDetailView(CatalogueViewMixin, generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = UniversitySerializer
+
+class SearchPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class UniversitySearchView(CatalogueViewMixin, generics.GenericAPIView):
+    """
+    Faceted search: a page of universities plus counts by country, type,
+    partnership status and program level. Filtering, sorting and counting
+    run on the in-memory facet index (see universities.facets); only the
+    page itself is loaded from the database.
+    """
+    serializer_class = UniversityListSerializer
+    pagination_class = SearchPagination
+    
+    def get(self, request, *args, **kwargs):
+        return self.cached_response(request, 'search', self.search, *args, **kwargs)
+    
+    def search(self, request, *args, **kwargs):
+        query = UniversitySearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        # ?country=Canada&country=USA and ?country=Canada,USA both select two values
+        selected = {
+            facet: [value for param in request.query_params.getlist(facet) for value in param.split(',') if value.strip()]
+            for facet in FACETS
+        }
+        ids, facets = get_facet_index().search(selected, query.validated_data['search'],
+                                               query.validated_data.get('tuition_fee_min'),
+                                               query.validated_data.get('tuition_fee_max'),
+                                               query.validated_data['ordering'])
+        
+        page_ids = self.paginate_queryset(ids)
+        universities = self.get_queryset().in_bulk(page_ids)
+        # Skips a university deleted after the index was built
+        page = [universities[pk] for pk in page_ids if pk in universities]
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        response.data['facets'] = facets
+        return response
+
+class UniversityEligibilityView(CatalogueViewMixin, generics.ListAPIView):
+    """
+    Universities whose stated minimum for an English test is at most the
+    given score: ``?english_proficiency=IELTS&test_score=6.5``, or
+    ``?student=<id>`` to use that student's fields. Answered by a range scan
+    on the (test, minimum_score) index of EnglishTestRequirement.
+    """
+    serializer_class = EligibleUniversitySerializer
+    pagination_class = KeysetPagination
+    filterset_class = UniversityFilter
+    search_fields = ['name', 'city', 'country']
+    ordering_fields = ['name', 'ranking', 'world_ranking']
+    ordering = ['name']
+    
+    def list(self, request, *args, **kwargs):
+        self.test, self.score = self.get_english_score(request)
+        return super().list(request, *args, **kwargs)
+    
+    def cache_endpoint(self, endpoint):
+        # A student's score can change without touching the catalogue, so it is part of the key
+        return f'eligible:{self.test}:{self.score}:{endpoint}'
+    
+    def get_english_score(self, request):
+        params = request.query_params
+        if 'student' in params:
+            if not params['student'].isdigit():
+                raise ValidationError({'student': ['A valid integer is required.']})
+            student = get_object_or_404(scoped_students(request.user), pk=params['student'])
+            test = english_test_name(student.test_score, student.english_proficiency)
+            score = student.test_score_value
+        else:
+            test = english_test_name(params.get('english_proficiency'), params.get('test_score'))
+            score = parse_test_score(params.get('test_score'), params.get('english_proficiency')).value
+        if test is None:
+            raise ValidationError({'english_proficiency': ['Name one of IELTS, TOEFL, PTE or Duolingo.']})
+        if score is None:
+            raise ValidationError({'test_score': [f'A valid {test.upper()} score is required.']})
+        return test, score
+    
+    def get_queryset(self):
+        return super().get_queryset().annotate(
+            english_minimum=FilteredRelation('english_test_minimums', condition=Q(english_test_minimums__test=self.test)),
+        ).filter(english_minimum__minimum_score__lte=self.score).annotate(
+            minimum_score=F('english_minimum__minimum_score'),
+        )